@@ -0,0 +1,186 @@
+"""Cold storage for finished classes in Learn.WA
+
+Classes from past terms (and their enrollments) are moved out of the live
+``classes``/``enrollments`` tables into a sibling archive database
+(``learn_wa.archive.db`` next to ``learn_wa.db``), attached to a
+connection as schema ``archive`` only when something asks for it. Live
+queries never see archived rows; readers that opt in union the two.
+
+A batch is copied into the archive in one transaction and deleted from
+the live tables in the next. With WAL, a transaction spanning two files is
+not atomic across a crash, so the copy is committed first and the delete
+only removes classes whose archived copy still matches the live rows
+(anything that changed in between is left for the next run). A crash in
+between leaves a class in both places; the union readers prefer the live
+copy, and the next archival run finishes the move.
+
+Functions here take an open connection or cursor; ``database`` owns the
+transactions.
+"""
+import json
+import os
+import sqlite3
+from typing import Dict, List
+
+SCHEMA = "archive"
+
+# Columns copied for each table (the archive adds archived_at)
+CLASS_COLUMNS = ("id, name, level, teacher, days, start_time, end_time, capacity, enrolled_count, "
+                 "created_at, day_mask, start_minute, end_minute")
+ENROLLMENT_COLUMNS = "id, class_id, student_id, enrolled_at"
+
+_TABLES = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {SCHEMA}.classes (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        level TEXT NOT NULL,
+        teacher TEXT NOT NULL,
+        days TEXT NOT NULL,
+        start_time TEXT NOT NULL,
+        end_time TEXT NOT NULL,
+        capacity INTEGER NOT NULL,
+        enrolled_count INTEGER DEFAULT 0,
+        created_at TIMESTAMP,
+        day_mask INTEGER,
+        start_minute INTEGER,
+        end_minute INTEGER,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {SCHEMA}.enrollments (
+        id INTEGER PRIMARY KEY,
+        class_id INTEGER NOT NULL,
+        student_id INTEGER NOT NULL,
+        enrolled_at TIMESTAMP,
+        UNIQUE(class_id, student_id)
+    )
+    """,
+    f"CREATE INDEX IF NOT EXISTS {SCHEMA}.idx_archive_classes_level ON classes (level)",
+    f"CREATE INDEX IF NOT EXISTS {SCHEMA}.idx_archive_classes_teacher ON classes (teacher)",
+    f"CREATE INDEX IF NOT EXISTS {SCHEMA}.idx_archive_enrollments_class ON enrollments (class_id, enrolled_at)",
+]
+
+
+def archive_path(path: str) -> str:
+    """Archive file for the live database at ``path``: learn_wa.db -> learn_wa.archive.db"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.archive{ext or '.db'}"
+
+
+def is_attached(conn: sqlite3.Connection) -> bool:
+    return any(row[1] == SCHEMA for row in conn.execute("PRAGMA database_list"))
+
+
+def attach(conn: sqlite3.Connection, path: str, create: bool = False) -> bool:
+    """Attach the archive for ``path`` to ``conn`` if it exists (or ``create``); True if attached
+
+    ATTACH cannot run inside a transaction, so call this first thing on a
+    fresh connection. Attachments persist for the life of a pooled connection.
+    """
+    if is_attached(conn):
+        return True
+    target = archive_path(path)
+    if not create and not os.path.exists(target):
+        return False
+    if conn.in_transaction:
+        raise RuntimeError("The archive must be attached before the transaction starts")
+    conn.execute(f"ATTACH DATABASE ? AS {SCHEMA}", (target,))
+    conn.execute(f"PRAGMA {SCHEMA}.journal_mode = WAL")
+    conn.execute(f"PRAGMA {SCHEMA}.synchronous = NORMAL")
+    if create:
+        for ddl in _TABLES:
+            conn.execute(ddl)
+    return True
+
+
+def classes_source(columns: str, alias: str = "classes") -> str:
+    """FROM-clause source of live plus archived classes
+
+    An archived copy is ignored while the class is still live.
+    """
+    return f"""(
+        SELECT {columns} FROM main.classes
+        UNION ALL
+        SELECT {columns} FROM {SCHEMA}.classes a
+        WHERE NOT EXISTS (SELECT 1 FROM main.classes m WHERE m.id = a.id)
+    ) AS {alias}"""
+
+
+def enrollments_source(alias: str = "enrollments") -> str:
+    """FROM-clause source of live plus archived enrollments"""
+    return f"""(
+        SELECT {ENROLLMENT_COLUMNS} FROM main.enrollments
+        UNION ALL
+        SELECT {ENROLLMENT_COLUMNS} FROM {SCHEMA}.enrollments a
+        WHERE NOT EXISTS (SELECT 1 FROM main.classes m WHERE m.id = a.class_id)
+    ) AS {alias}"""
+
+
+def copy_classes(cursor: sqlite3.Cursor, ids_json: str) -> None:
+    """Copy classes (a JSON id list) and their enrollments into the archive, replacing older copies"""
+    batch = "SELECT value FROM json_each(?)"
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO {SCHEMA}.classes ({CLASS_COLUMNS})
+        SELECT {CLASS_COLUMNS} FROM main.classes WHERE id IN ({batch})
+    """, (ids_json,))
+    cursor.execute(f"""
+        DELETE FROM {SCHEMA}.enrollments WHERE class_id IN ({batch})
+        AND id NOT IN (SELECT id FROM main.enrollments WHERE class_id IN ({batch}))
+    """, (ids_json, ids_json))
+    cursor.execute(f"""
+        INSERT OR IGNORE INTO {SCHEMA}.enrollments ({ENROLLMENT_COLUMNS})
+        SELECT {ENROLLMENT_COLUMNS} FROM main.enrollments WHERE class_id IN ({batch})
+    """, (ids_json,))
+
+
+# Batch ids whose archived copy matches the live class and enrollments exactly
+_UNCHANGED = f"""
+    SELECT j.value FROM json_each(?) j
+    JOIN main.classes m ON m.id = j.value
+    JOIN {SCHEMA}.classes a ON a.id = j.value
+        AND a.capacity = m.capacity AND a.enrolled_count = m.enrolled_count
+    WHERE NOT EXISTS (
+        SELECT 1 FROM main.enrollments e WHERE e.class_id = j.value
+        AND NOT EXISTS (SELECT 1 FROM {SCHEMA}.enrollments x WHERE x.id = e.id)
+    ) AND NOT EXISTS (
+        SELECT 1 FROM {SCHEMA}.enrollments x WHERE x.class_id = j.value
+        AND NOT EXISTS (SELECT 1 FROM main.enrollments e WHERE e.id = x.id)
+    )
+"""
+
+
+def delete_archived(cursor: sqlite3.Cursor, ids_json: str) -> List[sqlite3.Row]:
+    """Delete live classes (a JSON id list) that are safely in the archive; returns the deleted class rows
+
+    Waitlists of archived classes are dropped, not archived.
+    """
+    cursor.execute(_UNCHANGED, (ids_json,))
+    archived = json.dumps([row[0] for row in cursor.fetchall()])
+    batch = "SELECT value FROM json_each(?)"
+    cursor.execute(f"DELETE FROM main.waitlist WHERE class_id IN ({batch})", (archived,))
+    cursor.execute(f"DELETE FROM main.enrollments WHERE class_id IN ({batch})", (archived,))
+    cursor.execute(f"""
+        DELETE FROM main.classes WHERE id IN ({batch})
+        RETURNING id, name, level, teacher, day_mask, start_time, end_time, capacity, enrolled_count
+    """, (archived,))
+    return cursor.fetchall()
+
+
+def fill_totals(cursor: sqlite3.Cursor, dimension: str) -> Dict[str, tuple]:
+    """(classes, capacity, enrolled) of archived classes per level or teacher"""
+    cursor.execute(f"""
+        SELECT {dimension}, COUNT(*), SUM(capacity), SUM(enrolled_count)
+        FROM {SCHEMA}.classes GROUP BY {dimension}
+    """)
+    return {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+
+
+def summary(cursor: sqlite3.Cursor) -> Dict:
+    """Archived class and enrollment counts and the created_at range they cover"""
+    cursor.execute(f"SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM {SCHEMA}.classes")
+    classes, oldest, newest = cursor.fetchone()
+    cursor.execute(f"SELECT COUNT(*) FROM {SCHEMA}.enrollments")
+    return {"classes": classes, "enrollments": cursor.fetchone()[0], "oldest_created_at": oldest,
+            "newest_created_at": newest}
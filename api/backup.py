@@ -0,0 +1,212 @@
+"""Online snapshots and point-in-time exports of a Learn.WA database
+
+Snapshots use SQLite's online backup API, copying ``pages`` pages per step
+and sleeping ``pause`` seconds between steps. The source is read on a
+dedicated read-only connection inside one read transaction: under WAL that
+pins a single snapshot, so the copy is consistent and writers never wait on
+it (without the open transaction, every commit elsewhere would restart the
+backup from page one). The copy is written to ``<dest>.partial`` and
+renamed into place once complete. Only a checkpoint waits for the backup:
+the WAL keeps growing until it finishes.
+
+Exports stream every table as NDJSON rows from one read transaction in the
+same way, so the rows of all tables come from the same moment. The archive
+(see ``archive``) is attached to that transaction and its tables exported
+as ``archive.classes`` and ``archive.enrollments``; as with
+``snapshot_with_archive``, archival running meanwhile can leave a class in
+both the live and the archived tables.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import archive
+import metrics
+
+STEP_PAGES = 256
+STEP_PAUSE_SECONDS = 0.005
+EXPORT_BATCH_ROWS = 1000
+MAX_JOBS_KEPT = 20
+
+
+class BackupRunning(RuntimeError):
+    """A snapshot of this database is already being taken"""
+
+
+def _reader(path: str, with_archive: bool = False) -> sqlite3.Connection:
+    """Read-only connection holding an open read transaction (one fixed snapshot)
+
+    ``with_archive`` also attaches the archive, if there is one, read-only
+    and starts reading it in the same statement.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No database at {path}")
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, isolation_level=None, check_same_thread=False)
+    try:
+        schemas = ["main"]
+        if with_archive and os.path.exists(archive.archive_path(path)):
+            conn.execute(f"ATTACH DATABASE ? AS {archive.SCHEMA}", (f"file:{archive.archive_path(path)}?mode=ro",))
+            schemas.append(archive.SCHEMA)
+        conn.execute("BEGIN")
+        conn.execute("SELECT " + ", ".join(f"(SELECT COUNT(*) FROM {schema}.sqlite_master)"
+                                           for schema in schemas)).fetchone()
+    except sqlite3.Error:
+        conn.close()
+        raise
+    return conn
+
+
+def snapshot(path: str, dest: str, pages: int = STEP_PAGES, pause: float = STEP_PAUSE_SECONDS,
+             progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """Copy the database at ``path`` to ``dest`` while it stays in use; returns the copy's details
+
+    ``progress(copied_pages, total_pages)`` is called after every step.
+    """
+    if pages < 1 or pause < 0:
+        raise ValueError("pages must be at least 1 and pause not negative")
+    partial = dest + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    started = time.perf_counter()
+    steps = total = 0
+
+    def step(status, remaining, count):
+        nonlocal steps, total
+        steps, total = steps + 1, count
+        if progress is not None:
+            progress(count - remaining, count)
+        if remaining and pause:
+            time.sleep(pause)
+
+    source = _reader(path)
+    try:
+        target = sqlite3.connect(partial)
+        try:
+            source.backup(target, pages=pages, progress=step)
+        finally:
+            target.close()
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        source.close()
+    os.replace(partial, dest)
+    return {"source": path, "path": dest, "pages": total, "steps": steps, "size_bytes": os.path.getsize(dest),
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+def snapshot_with_archive(path: str, dest: str, **options) -> List[Dict]:
+    """``snapshot`` the database and, if there is one, its archive (see ``archive``) next to ``dest``
+
+    Each file is consistent on its own; archival between the two copies can
+    leave a class in both, which readers already tolerate.
+    """
+    copies = [snapshot(path, dest, **options)]
+    if os.path.exists(archive.archive_path(path)):
+        copies.append(snapshot(archive.archive_path(path), archive.archive_path(dest), **options))
+    return copies
+
+
+def _tables(conn: sqlite3.Connection) -> List[str]:
+    # Ordinary tables only: no SQLite internals, full-text indexes or their shadow tables.
+    # Archived tables are named archive.<table>.
+    return [row[1] if row[0] == "main" else f"{row[0]}.{row[1]}" for row in conn.execute("PRAGMA table_list")
+            if row[0] in ("main", archive.SCHEMA) and row[2] == "table" and not row[1].startswith("sqlite_")]
+
+
+def _source(name: str) -> str:
+    schema, _, table = name.rpartition(".")
+    return f'"{schema or "main"}"."{table}"'
+
+
+def table_names(path: str) -> List[str]:
+    """Tables ``iter_export`` can export from the database at ``path`` and its archive"""
+    conn = _reader(path, with_archive=True)
+    try:
+        return _tables(conn)
+    finally:
+        conn.close()
+
+
+def iter_export(path: str, tables: Optional[Iterable[str]] = None, batch: int = EXPORT_BATCH_ROWS,
+                pause: float = 0.0) -> Iterator[Dict]:
+    """Yield ``{"table": name, "row": {...}}`` for every row of ``tables`` (default all) from one snapshot
+
+    The default includes the archived tables. Sleeps ``pause`` seconds after
+    every ``batch`` rows. Closing the generator ends the read transaction.
+    """
+    conn = _reader(path, with_archive=True)
+    try:
+        available = _tables(conn)
+        names = available if tables is None else list(tables)
+        unknown = [name for name in names if name not in available]
+        if unknown:
+            raise ValueError(f"Unknown table: {unknown[0]}")
+        for name in names:
+            cursor = conn.execute(f"SELECT * FROM {_source(name)}")
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    break
+                for row in rows:
+                    yield {"table": name, "row": dict(zip(columns, row))}
+                if pause:
+                    time.sleep(pause)
+    finally:
+        conn.close()
+
+
+class BackupJobs:
+    """Background snapshots started from the admin API, one at a time per database"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: List[Dict] = []
+        self._next_id = 1
+
+    def start(self, path: str, dest: str, pages: int = STEP_PAGES, pause: float = STEP_PAUSE_SECONDS) -> Dict:
+        """Snapshot ``path`` to ``dest`` in a background thread; BackupRunning if one is in progress"""
+        if pages < 1 or pause < 0:
+            raise ValueError("pages must be at least 1 and pause not negative")
+        with self._lock:
+            if any(job["source"] == path and job["status"] == "running" for job in self._jobs):
+                raise BackupRunning(f"A backup of {path} is already running")
+            job = {"id": self._next_id, "source": path, "path": dest, "status": "running", "step_pages": pages,
+                   "pause": pause, "copied_pages": 0, "total_pages": None, "started_at": time.time()}
+            self._next_id += 1
+            self._jobs.append(job)
+            del self._jobs[:-MAX_JOBS_KEPT]
+        threading.Thread(target=self._run, args=(job,), name=f"backup-{job['id']}", daemon=True).start()
+        return dict(job)
+
+    def _run(self, job: Dict) -> None:
+        def progress(copied, total):
+            job["copied_pages"], job["total_pages"] = copied, total
+
+        try:
+            copies = snapshot_with_archive(job["source"], job["path"], pages=job["step_pages"], pause=job["pause"],
+                                           progress=progress)
+            result = {"status": "done", "files": [copy["path"] for copy in copies],
+                      "size_bytes": sum(copy["size_bytes"] for copy in copies),
+                      "seconds": round(sum(copy["seconds"] for copy in copies), 3)}
+        except Exception as exc:  # pylint: disable=broad-except
+            result = {"status": "failed", "error": str(exc)}
+        with self._lock:
+            job.update(result)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs)]
+
+    def running(self) -> int:
+        with self._lock:
+            return sum(job["status"] == "running" for job in self._jobs)
+
+
+jobs = BackupJobs()
+metrics.registry.collected("learnwa_backups_running", "Online snapshots in progress", (),
+                           lambda: [((), jobs.running())])
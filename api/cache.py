@@ -0,0 +1,95 @@
+"""Bounded in-process read cache with version-based invalidation for Learn.WA
+
+Every cached value is tagged with the versions of the scopes it depends on
+(e.g. ``("quiz", 7)`` or ``("classes",)``). Writers bump those versions, which
+makes dependent entries stale without scanning the cache, and the same
+versions double as HTTP ETags.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Tuple
+
+DEFAULT_MAXSIZE = 2048
+DEFAULT_TTL_SECONDS = 300.0
+
+
+class ReadCache:
+    """LRU + TTL cache whose entries are invalidated by scope version bumps"""
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, ttl: float = DEFAULT_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Tuple, Tuple[int, ...], Any]]" = OrderedDict()
+        self._versions: Dict[Hashable, int] = {}
+        # Distinguishes ETags across restarts, since versions start from zero
+        self._epoch = format(int(time.time() * 1000), "x")
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "stale": 0, "invalidations": 0}
+
+    def _current(self, scopes: Iterable[Hashable]) -> Tuple[int, ...]:
+        return tuple(self._versions.get(scope, 0) for scope in scopes)
+
+    def etag(self, scopes: Iterable[Hashable]) -> str:
+        """Opaque tag that changes whenever any of ``scopes`` is bumped"""
+        with self._lock:
+            versions = self._current(scopes)
+        return f"{self._epoch}-" + ".".join(map(str, versions))
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], scopes: Tuple[Hashable, ...]) -> Any:
+        """Return the cached value for ``key`` or load, cache and return it
+
+        A value is only stored if none of its scopes were bumped while it was
+        loading, so a read racing a write can never re-cache stale data.
+        """
+        now = self._clock()
+        with self._lock:
+            versions = self._current(scopes)
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, entry_scopes, entry_versions, value = entry
+                if expires < now:
+                    self._stats["expired"] += 1
+                    del self._entries[key]
+                elif entry_scopes != scopes or entry_versions != versions:
+                    self._stats["stale"] += 1
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+            self._stats["misses"] += 1
+
+        value = loader()
+
+        with self._lock:
+            if self._current(scopes) == versions:
+                self._entries[key] = (now + self.ttl, scopes, versions, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self._stats["evictions"] += 1
+        return value
+
+    def bump(self, *scopes: Hashable) -> None:
+        """Invalidate everything that depends on any of ``scopes``"""
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+            self._stats["invalidations"] += len(scopes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats["maxsize"] = self.maxsize
+        stats["ttl"] = self.ttl
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
@@ -1,106 +1,1168 @@
 """SQLite database setup and models for Learn.WA"""
+import base64
+import os
+import re
 import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
 from contextlib import contextmanager
-from typing import List, Dict, Optional
+from functools import wraps
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 import json
 
+import archive
+import metrics
+import search
+import stats
+from cache import ReadCache
+
 DB_PATH = "learn_wa.db"
 
+# Multi-tenant mode: each tenant (school) gets its own database file and pool,
+# <TENANTS_DIR>/<tenant>.db. None keeps everything in DB_PATH.
+TENANTS_DIR: Optional[str] = None
+MAX_OPEN_SHARDS = 64  # idle pools beyond this are closed, least recently used first
+# Cached reads notice commits made by other processes at most this many seconds late
+CHANGE_POLL_SECONDS = 0.05
+_TENANT_NAME = re.compile(r"[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?")
+
+# Connection tuning applied to every pooled connection
+POOL_SIZE = 8
+DB_PRAGMAS = {
+    "journal_mode": "WAL",
+    "busy_timeout": 5000,        # ms to wait on a locked database
+    "synchronous": "NORMAL",
+    "cache_size": -16000,        # negative = KiB, i.e. 16 MB page cache
+    "mmap_size": 268435456,      # 256 MB memory-mapped I/O
+    "temp_store": "MEMORY",
+}
+
+# Log statements slower than this many seconds to stderr (None disables the log)
+SLOW_QUERY_SECONDS: Optional[float] = None
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+DAY_BITS = {day: 1 << index for index, day in enumerate(WEEKDAYS)}
+# Precomputed day lists for every mask, so rows never need JSON decoding
+_DAYS_BY_MASK = [tuple(day for day, bit in DAY_BITS.items() if mask & bit) for mask in range(128)]
+
+CLASS_COLUMNS = (
+    "id, name, level, teacher, day_mask, start_time, end_time, "
+    "capacity, enrolled_count, created_at"
+)
+# Columns each serialized class field is built from, for ?fields= projection
+CLASS_FIELDS = {
+    'id': ('id',), 'name': ('name',), 'level': ('level',), 'teacher': ('teacher',), 'days': ('day_mask',),
+    'start_time': ('start_time',), 'end_time': ('end_time',), 'capacity': ('capacity',),
+    'enrolled_count': ('enrolled_count',), 'created_at': ('created_at',), 'enrolled': ('enrolled_count',),
+    'syllabus': (), 'students': (),
+}
+
+
+STREAM_PAGE_SIZE = 500
+
+
+def encode_cursor(kind: str, values: List) -> str:
+    """Opaque keyset pagination token for ``kind`` rows after ``values``"""
+    payload = json.dumps([kind, values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def _cursor_value_ok(value, expected: type) -> bool:
+    if isinstance(value, bool):
+        return False
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+def decode_cursor(kind: str, token: str, types: Optional[Tuple[type, ...]] = None) -> List:
+    """Values of a token from ``encode_cursor``; ValueError unless it is a ``kind`` token shaped like ``types``"""
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        token_kind, values = json.loads(payload)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if token_kind != kind or not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    if types is not None and (len(values) != len(types) or not all(
+            _cursor_value_ok(value, expected) for value, expected in zip(values, types))):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def days_to_mask(days: Iterable[str]) -> int:
+    mask = 0
+    for day in days:
+        mask |= DAY_BITS[day]
+    return mask
+
+
+def mask_to_days(mask: int) -> List[str]:
+    return list(_DAYS_BY_MASK[mask or 0])
+
+
+def time_to_minutes(value: str) -> int:
+    return int(value[:2]) * 60 + int(value[3:5])
+
+
+_PLACEHOLDER_RUN = re.compile(r"\?(?:\s*,\s*\?)+")
+_statement_keys: Dict[str, str] = {}
+
+
+def statement_key(sql: str) -> str:
+    """Metrics label for a statement: whitespace collapsed, ``?, ?, ?`` lists folded"""
+    key = _statement_keys.get(sql)
+    if key is None:
+        key = _PLACEHOLDER_RUN.sub("?, ...", " ".join(sql.split()))[:200]
+        if len(_statement_keys) < 4096:
+            _statement_keys[sql] = key
+    return key
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that records per-statement timing and row counts in ``metrics``
+
+    Rows read by iterating the cursor are tallied locally and recorded once
+    the iteration ends, the cursor runs another statement or it goes away.
+    """
+
+    statement = ""
+    _iterated = 0
+    _iterating = 0.0
+
+    def execute(self, sql, parameters=()):
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._timed(super().executemany, sql, seq_of_parameters)
+
+    def _timed(self, run, sql, parameters):
+        if self._iterated:
+            self._flush_iterated()
+        key = self.statement = statement_key(sql)
+        started = time.perf_counter()
+        try:
+            return run(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.db_queries.observe((key,), elapsed)
+            if self.rowcount > 0:
+                metrics.db_rows.inc((key,), self.rowcount)
+            if SLOW_QUERY_SECONDS is not None and elapsed >= SLOW_QUERY_SECONDS:
+                metrics.db_slow_queries.inc((key,))
+                print(f"Slow query ({elapsed * 1000:.1f} ms): {key}", file=sys.stderr)
+
+    def _fetched(self, started: float, rows: int) -> None:
+        self._record_fetch(time.perf_counter() - started, rows)
+
+    def _record_fetch(self, elapsed: float, rows: int) -> None:
+        metrics.db_fetch_seconds.inc((self.statement,), elapsed)
+        if rows:
+            metrics.db_rows.inc((self.statement,), rows)
+        if SLOW_QUERY_SECONDS is not None and elapsed >= SLOW_QUERY_SECONDS:
+            metrics.db_slow_queries.inc((self.statement,))
+            print(f"Slow fetch ({elapsed * 1000:.1f} ms, {rows} rows): {self.statement}", file=sys.stderr)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._iterating += time.perf_counter() - started
+            self._flush_iterated()
+            raise
+        self._iterating += time.perf_counter() - started
+        self._iterated += 1
+        return row
+
+    def _flush_iterated(self) -> None:
+        elapsed, rows = self._iterating, self._iterated
+        self._iterating, self._iterated = 0.0, 0
+        self._record_fetch(elapsed, rows)
+
+    def close(self):
+        if self._iterated:
+            self._flush_iterated()
+        super().close()
+
+    def __del__(self):
+        if self._iterated:
+            self._flush_iterated()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors (including ``execute`` shortcuts) are instrumented"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class ConnectionPool:
+    """Bounded pool of reusable SQLite connections for a single database file"""
+
+    def __init__(self, path: str, max_idle: int = POOL_SIZE):
+        self.path = path
+        self.max_idle = max_idle
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._stats = {"opened": 0, "reused": 0, "closed": 0, "in_use": 0}
+        self._ready = False  # schema checked/migrated by this process
+        self._retired = False  # evicted: nothing released to it is kept
+        self.last_used = time.monotonic()
+        self._schema_lock = threading.Lock()
+        # Notices commits by any other connection (see changed_families)
+        self._watch: Optional[sqlite3.Connection] = None
+        self._watch_lock = threading.Lock()
+        self._data_version: Optional[int] = None
+        self._counters: Dict[str, int] = {}
+        self._polled = float("-inf")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, factory=InstrumentedConnection)
+        conn.row_factory = sqlite3.Row
+        for pragma, value in DB_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Check out an idle connection, opening a new one if none are free"""
+        self.last_used = time.monotonic()
+        with self._lock:
+            self._stats["in_use"] += 1
+            if self._idle:
+                self._stats["reused"] += 1
+                return self._idle.pop()
+            self._stats["opened"] += 1
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._lock:
+                self._stats["in_use"] -= 1
+                self._stats["opened"] -= 1
+            raise
+        if not self._ready:
+            try:
+                self._migrate(conn)
+            except Exception:
+                self.release(conn, discard=True)
+                raise
+        return conn
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        # Idle connections only exist once this has succeeded, so only new ones check
+        with self._schema_lock:
+            if not self._ready:
+                migrate(conn)
+                self._ready = True
+
+    def ensure_schema(self) -> None:
+        """Migrate the database now rather than on the first connection"""
+        self.release(self.acquire())
+
+    def release(self, conn: sqlite3.Connection, discard: bool = False) -> None:
+        """Return a connection to the pool (closing it if the pool is full or retired)"""
+        with self._lock:
+            self._stats["in_use"] -= 1
+            if not discard and not self._retired and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+            self._stats["closed"] += 1
+        conn.close()
+
+    def close_all(self, retire: bool = False) -> None:
+        """Close every idle connection; ``retire`` also closes any released to the pool afterwards"""
+        with self._lock:
+            self._retired = self._retired or retire
+            idle, self._idle = self._idle, []
+            self._stats["closed"] += len(idle)
+        for conn in idle:
+            conn.close()
+        with self._watch_lock:
+            if self._watch is not None:
+                self._watch.close()
+                self._watch = self._data_version = None
+                self._polled = float("-inf")
+
+    def changed_families(self) -> List[str]:
+        """``change_counters`` families written since the last call, by this process or any other
+
+        PRAGMA data_version on a dedicated connection only moves when another
+        connection commits, so while nothing is written this costs one pragma,
+        run at most every ``CHANGE_POLL_SECONDS``. The first call reports
+        every family.
+        """
+        now = time.monotonic()
+        if now - self._polled < CHANGE_POLL_SECONDS:
+            return []
+        if not self._ready:
+            self.ensure_schema()
+        with self._watch_lock:
+            self._polled = now
+            if self._watch is None:
+                self._watch = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            version = self._watch.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return []
+            self._data_version = version
+            counters = dict(self._watch.execute("SELECT family, changes FROM change_counters"))
+            changed = [family for family, count in counters.items() if self._counters.get(family) != count]
+            self._counters = counters
+        return changed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "path": self.path,
+                "max_idle": self.max_idle,
+                "idle": len(self._idle),
+                **self._stats,
+            }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+_local = threading.local()
+
+
+class ClassFull(ValueError):
+    """Raised when an enrollment finds no free seat (the student may join the waitlist)"""
+
+
+class UnknownTenant(LookupError):
+    """Raised when a request names a tenant that has no shard"""
+
+
+class TenantExists(ValueError):
+    """Raised when creating a tenant whose shard already exists"""
+
+
+def current_path() -> str:
+    """The database this thread is routed to: its tenant's shard, else DB_PATH"""
+    return getattr(_local, "path", None) or DB_PATH
+
+
+def get_pool(path: Optional[str] = None) -> ConnectionPool:
+    """Return the connection pool for ``path`` (defaults to ``current_path()``)
+
+    Pools open lazily on first use; opening one past ``MAX_OPEN_SHARDS``
+    closes the least recently used idle pool.
+    """
+    path = path or current_path()
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = _pools[path] = ConnectionPool(path)
+                _evict_pools()
+    return pool
+
+
+def _evict_pools() -> None:
+    # Caller holds _pools_lock; pools with checked-out connections are kept. A
+    # pool handed out by get_pool but not yet used can still go: it is retired,
+    # so whatever it opens afterwards is closed on release instead of leaking.
+    idle = sorted((pool for pool in _pools.values() if not pool.stats()["in_use"]), key=lambda p: p.last_used)
+    for pool in idle[:max(0, len(_pools) - MAX_OPEN_SHARDS)]:
+        del _pools[pool.path]
+        pool.close_all(retire=True)
+
+
+@contextmanager
+def use_database(path: Optional[str]):
+    """Route this thread's database calls to ``path`` (None: back to DB_PATH) for the block"""
+    previous = getattr(_local, "path", None)
+    _local.path = path
+    try:
+        yield
+    finally:
+        _local.path = previous
+
+
+def tenant_path(tenant: str) -> str:
+    """Shard file for ``tenant``; raises ValueError for a malformed name"""
+    if TENANTS_DIR is None:
+        raise ValueError("Multi-tenant mode is off (TENANTS_DIR is not set)")
+    if not isinstance(tenant, str) or not _TENANT_NAME.fullmatch(tenant):
+        raise ValueError("Tenant names are 1-63 lowercase letters, digits and inner hyphens")
+    return os.path.join(TENANTS_DIR, f"{tenant}.db")
+
+
+def set_tenant(tenant: Optional[str]) -> None:
+    """Route this thread's database calls to ``tenant``'s shard, or back to DB_PATH for None
+
+    Raises UnknownTenant unless the shard was created with ``create_tenant``,
+    so a request can never create a database by naming one.
+    """
+    if tenant is None:
+        _local.path = None
+        return
+    path = tenant_path(tenant)
+    if path not in _pools and not os.path.exists(path):
+        raise UnknownTenant(f"Unknown tenant: {tenant}")
+    _local.path = path
+
+
+def database_path(tenant: Optional[str] = None) -> str:
+    """File of ``tenant``'s shard (UnknownTenant unless it exists), or DB_PATH for None"""
+    if tenant is None:
+        return DB_PATH
+    path = tenant_path(tenant)
+    if not os.path.exists(path):
+        raise UnknownTenant(f"Unknown tenant: {tenant}")
+    return path
+
+
+def create_tenant(tenant: str) -> Dict:
+    """Create and migrate a new tenant shard; TenantExists if it already exists"""
+    path = tenant_path(tenant)
+    os.makedirs(TENANTS_DIR, exist_ok=True)
+    try:
+        # Exclusive create, so two admins racing on one name cannot both succeed
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        raise TenantExists(f"Tenant already exists: {tenant}")
+    get_pool(path).ensure_schema()
+    return _tenant_info(tenant, path)
+
+
+def list_tenants() -> List[Dict]:
+    """Every tenant shard in TENANTS_DIR, with its size and whether its pool is open"""
+    if TENANTS_DIR is None or not os.path.isdir(TENANTS_DIR):
+        return []
+    names = sorted(name[:-3] for name in os.listdir(TENANTS_DIR) if name.endswith(".db"))
+    return [_tenant_info(name, os.path.join(TENANTS_DIR, name + ".db"))
+            for name in names if _TENANT_NAME.fullmatch(name)]
+
+
+def _tenant_info(tenant: str, path: str) -> Dict:
+    return {"tenant": tenant, "path": path, "size_bytes": os.path.getsize(path), "open": path in _pools}
+
+
+def pool_stats() -> List[Dict]:
+    """Connection statistics for every pool opened by this process"""
+    return [pool.stats() for pool in list(_pools.values())]
+
+
+def _pool_counters():
+    for pool in list(_pools.values()):
+        counts = pool.stats()
+        for event in ("opened", "reused", "closed"):
+            yield (pool.path, event), counts[event]
+
+
+def _pool_gauges():
+    for pool in list(_pools.values()):
+        counts = pool.stats()
+        for state in ("in_use", "idle"):
+            yield (pool.path, state), counts[state]
+
+
+metrics.registry.collected("learnwa_db_connections_total", "Pooled SQLite connections opened, reused and closed",
+                           ("path", "event"), _pool_counters, kind="counter")
+metrics.registry.collected("learnwa_db_connections", "Pooled SQLite connections in use or idle",
+                           ("path", "state"), _pool_gauges)
+
+
+def close_pools() -> None:
+    """Close all idle pooled connections (e.g. on shutdown or in tests)"""
+    for pool in list(_pools.values()):
+        pool.close_all()
+
+
 @contextmanager
 def get_db():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Context manager for database connections
+
+    Connections come from a per-database pool. Calls nested inside an open
+    ``get_db()``/``transaction()`` on the same thread share its connection and
+    transaction; only the outermost scope commits or rolls back.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        yield conn
+        return
+
+    pool = get_pool()
+    conn = pool.acquire()
+    _local.conn = conn
+    _local.undo = []
+    _local.after_commit = []
+    broken = False
     try:
         yield conn
         conn.commit()
     except Exception:
-        conn.rollback()
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            broken = True
+        _run_callbacks(reversed(_local.undo))
         raise
+    else:
+        _run_callbacks(_local.after_commit)
     finally:
-        conn.close()
+        _local.conn = None
+        _local.undo = _local.after_commit = None
+        pool.release(conn, discard=broken)
 
-def init_db():
-    """Initialize database schema"""
+
+def _run_callbacks(callbacks) -> None:
+    for callback in list(callbacks):
+        try:
+            callback()
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"Transaction callback {callback!r} failed: {exc}", file=sys.stderr)
+
+
+def on_rollback(callback: Callable[[], None]) -> None:
+    """Run ``callback`` if the enclosing transaction (or savepoint) is rolled back"""
+    if getattr(_local, "conn", None) is not None:
+        _local.undo.append(callback)
+
+
+def after_commit(callback: Callable[[], None]) -> None:
+    """Run ``callback`` once the enclosing transaction commits (immediately if none is open)"""
+    if getattr(_local, "conn", None) is not None:
+        _local.after_commit.append(callback)
+    else:
+        callback()
+
+
+_write_listeners: List[Callable[[str, List[Dict]], None]] = []
+
+
+def add_write_listener(listener: Callable[[str, List[Dict]], None]) -> None:
+    """Subscribe to write events such as ``("classes_created", rows)``
+
+    Listeners run synchronously inside the writing transaction, so they can
+    register ``on_rollback`` undo steps for any in-memory state they touch.
+    """
+    if listener not in _write_listeners:
+        _write_listeners.append(listener)
+
+
+def notify_write(event: str, rows: List[Dict]) -> None:
+    _invalidate_on_write(event, rows)
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        stats.apply_write(conn.cursor(), event, rows)
+    for listener in list(_write_listeners):
+        listener(event, rows)
+
+
+read_cache = ReadCache()
+metrics.registry.collected(
+    "learnwa_read_cache_events_total", "Read cache lookups and invalidations", ("event",),
+    lambda: [((event,), value) for event, value in read_cache.stats().items()
+             if event in ("hits", "misses", "evictions", "expired", "stale", "invalidations")],
+    kind="counter")
+
+# Scopes a write event invalidates; per-id scopes also drop cached "not found" results
+_INVALIDATES = {
+    "classes_created": lambda rows: [("classes",)] + [("class", row['id']) for row in rows],
+    "classes_updated": lambda rows: [("classes",)] + [("class", row['id']) for row in rows],
+    "enrollments_created": lambda rows: [("classes",)] + [("class", row['class_id']) for row in rows],
+    "enrollments_deleted": lambda rows: [("classes",)] + [("class", row['class_id']) for row in rows],
+    "classes_archived": lambda rows: [("classes",)] + [("class", row['id']) for row in rows],
+    "quizzes_created": lambda rows: [("quizzes",)] + [("quiz", row['id']) for row in rows],
+}
+
+
+# change_counters family each cache scope's data belongs to
+_SCOPE_FAMILIES = {"class": "classes", "classes": "classes", "quiz": "quizzes", "quizzes": "quizzes"}
+
+
+def _scoped(scopes) -> Tuple:
+    path = get_pool().path
+    return tuple((path,) + tuple(scope) for scope in scopes)
+
+
+def _read_scoped(scopes) -> Tuple:
+    """``_scoped`` plus the change_counters families of ``scopes``
+
+    Writes made elsewhere (another worker, a script) are picked up here: a
+    family whose counter moved is bumped before the cache is consulted. This
+    process's own writes move the counters too, so they also invalidate
+    every entry of their family, not only the scopes they name.
+    """
+    pool = get_pool()
+    path = pool.path
+    changed = pool.changed_families()
+    if changed:
+        read_cache.bump(*[(path, "changes", family) for family in changed])
+    scoped = [(path,) + tuple(scope) for scope in scopes]
+    for family in sorted({_SCOPE_FAMILIES[scope[0]] for scope in scopes}):
+        scoped.append((path, "changes", family))
+    return tuple(scoped)
+
+
+def change_counter(family: str) -> int:
+    """Current ``change_counters`` value of ``family``, read on this thread's connection"""
     with get_db() as conn:
-        cursor = conn.cursor()
-        
-        # Classes table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS classes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                level TEXT NOT NULL,
-                teacher TEXT NOT NULL,
-                days TEXT NOT NULL,
-                start_time TEXT NOT NULL,
-                end_time TEXT NOT NULL,
-                capacity INTEGER NOT NULL,
-                enrolled_count INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+        return conn.execute("SELECT changes FROM change_counters WHERE family = ?", (family,)).fetchone()[0]
+
+
+def cache_etag(*scopes: Tuple) -> str:
+    """ETag for data depending on ``scopes`` of the current database"""
+    return read_cache.etag(_read_scoped(scopes))
+
+
+def _invalidate_on_write(event: str, rows: List[Dict]) -> None:
+    scopes = _INVALIDATES.get(event)
+    if scopes is None:
+        return
+    scoped = _scoped(scopes(rows))
+    # Bump after commit too: a reader may have cached the pre-commit state meanwhile
+    read_cache.bump(*scoped)
+    after_commit(lambda: read_cache.bump(*scoped))
+
+
+def cached_read(scopes: Callable[..., List[Tuple]]):
+    """Serve a read function from ``read_cache``, keyed on its arguments
+
+    ``scopes`` maps the call arguments to the scopes the result depends on.
+    Calls inside an open transaction read through, so uncommitted data is
+    never cached. Cached results are shared: treat them as read-only.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, "conn", None) is not None:
+                return func(*args, **kwargs)
+            scoped = _read_scoped(scopes(*args, **kwargs))
+            key = (func.__name__, scoped[0][0], args, tuple(sorted(kwargs.items())))
+            return read_cache.get_or_load(key, lambda: func(*args, **kwargs), scoped)
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def transaction(immediate: bool = False):
+    """Share one connection and transaction across several database calls
+
+    With ``immediate=True`` the write lock is taken up front (BEGIN IMMEDIATE)
+    so read-then-write sequences cannot interleave with other writers. Nested
+    inside an outer scope that has not started a transaction yet, it starts
+    one; inside one already open it relies on the outer scope having the lock.
+    """
+    if getattr(_local, "conn", None) is not None:
+        with get_db() as conn:
+            if immediate and not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            yield conn
+        return
+
+    with get_db() as conn:
+        if immediate:
+            conn.execute("BEGIN IMMEDIATE")
+        yield conn
+
+@contextmanager
+def savepoint(conn: sqlite3.Connection, name: str = "sp"):
+    """Undo only the enclosed statements on error, leaving the outer transaction open"""
+    conn.execute(f"SAVEPOINT {name}")
+    undo = getattr(_local, "undo", None)
+    mark = len(undo) if undo is not None else 0
+    try:
+        yield conn
+    except Exception:
+        conn.execute(f"ROLLBACK TO {name}")
+        conn.execute(f"RELEASE {name}")
+        if undo is not None:
+            _run_callbacks(reversed(undo[mark:]))
+            del undo[mark:]
+        raise
+    conn.execute(f"RELEASE {name}")
+
+def _schema_v1(cursor: sqlite3.Cursor) -> None:
+    """Classes, students, enrollments, quizzes and questions"""
+    # Classes table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS classes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            level TEXT NOT NULL,
+            teacher TEXT NOT NULL,
+            days TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            capacity INTEGER NOT NULL,
+            enrolled_count INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            day_mask INTEGER,
+            start_minute INTEGER,
+            end_minute INTEGER
+        )
+    """)
+    migrate_schedule_columns(cursor)
+    
+    # Students table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Enrollments table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS enrollments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            class_id INTEGER NOT NULL,
+            student_id INTEGER NOT NULL,
+            enrolled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (class_id) REFERENCES classes (id),
+            FOREIGN KEY (student_id) REFERENCES students (id),
+            UNIQUE(class_id, student_id)
+        )
+    """)
+    
+    # Quizzes table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS quizzes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            topic TEXT,
+            difficulty TEXT DEFAULT 'intermediate',
+            focus_mode TEXT DEFAULT 'comprehension',
+            metadata TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Questions table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            quiz_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            options TEXT NOT NULL,
+            correct_answer TEXT NOT NULL,
+            explanation TEXT,
+            FOREIGN KEY (quiz_id) REFERENCES quizzes (id) ON DELETE CASCADE
+        )
+    """)
+    
+    migrate_student_identity(cursor)
+    
+    # Quiz listing (newest first, keyset paged) and per-quiz question lookups
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_quizzes_created
+        ON quizzes (created_at, id)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_questions_quiz
+        ON questions (quiz_id)
+    """)
+    
+    # Roster listing (newest first) and per-student lookups
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_enrollments_class_enrolled
+        ON enrollments (class_id, enrolled_at)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_enrollments_student
+        ON enrollments (student_id)
+    """)
+
+def _schema_v2(cursor: sqlite3.Cursor) -> None:
+    """Quiz attempts and their answers"""
+    # Quiz attempts, one answers row per question answered
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            quiz_id INTEGER NOT NULL,
+            student_id INTEGER,
+            score INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (quiz_id) REFERENCES quizzes (id),
+            FOREIGN KEY (student_id) REFERENCES students (id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS answers (
+            attempt_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            answer INTEGER,
+            is_correct INTEGER NOT NULL,
+            PRIMARY KEY (attempt_id, question_id),
+            FOREIGN KEY (attempt_id) REFERENCES attempts (id) ON DELETE CASCADE,
+            FOREIGN KEY (question_id) REFERENCES questions (id)
+        ) WITHOUT ROWID
+    """)
+    
+    # Attempts per quiz and per student
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_attempts_quiz
+        ON attempts (quiz_id, id)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_attempts_student
+        ON attempts (student_id)
+    """)
+
+def _schema_waitlist(cursor: sqlite3.Cursor) -> None:
+    """FIFO waitlists for full classes"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS waitlist (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            class_id INTEGER NOT NULL,
+            student_id INTEGER NOT NULL,
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (class_id) REFERENCES classes (id),
+            FOREIGN KEY (student_id) REFERENCES students (id),
+            UNIQUE(class_id, student_id)
+        )
+    """)
+    
+    # Queue order (and positions) within a class
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_waitlist_class
+        ON waitlist (class_id, id)
+    """)
+
+def _schema_weekday_indexes(cursor: sqlite3.Cursor) -> None:
+    """Per-weekday partial indexes in id order, replacing the start_minute ones
+
+    Class listings page by ``id > ? ORDER BY id``, so only an index in id
+    order lets a day filter stop after one page; the planner never used the
+    start_minute ones for that. Queries must repeat the literal
+    "day_mask & <bit>" to match.
+    """
+    for day, bit in DAY_BITS.items():
+        cursor.execute(f"DROP INDEX IF EXISTS idx_classes_{day.lower()}")
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_classes_{day.lower()}_id
+            ON classes (id) WHERE day_mask & {bit}
         """)
-        
-        # Students table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS students (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+
+# Tables whose rows each change_counters family depends on
+CHANGE_FAMILIES = {
+    "classes": ("classes", "enrollments", "students", "waitlist"),
+    "quizzes": ("quizzes", "questions"),
+}
+# Columns of classes that place a class in the teacher's schedule
+_SCHEDULE_COLUMNS = "name, teacher, day_mask, start_minute, end_minute"
+
+def _schema_change_counters(cursor: sqlite3.Cursor) -> None:
+    """Per-family write counters, bumped by triggers on every row change
+
+    Every connection bumps them, including other server processes, scripts
+    and the sqlite3 shell, so they tell this process when data it caches was
+    changed elsewhere (see ``ConnectionPool.changed_families``). "schedule"
+    counts only class inserts, deletes and changes to ``_SCHEDULE_COLUMNS``,
+    one per row, which lets the schedule index account for its own writes.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_counters (
+            family TEXT PRIMARY KEY,
+            changes INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    families = {}
+    for family, tables in CHANGE_FAMILIES.items():
+        for table in tables:
+            families.setdefault(table, []).append(family)
+    cursor.executemany("INSERT OR IGNORE INTO change_counters (family) VALUES (?)",
+                       [(family,) for family in list(CHANGE_FAMILIES) + ["schedule"]])
+
+    def trigger(name, event, table, bumped):
+        names = ", ".join(f"'{family}'" for family in bumped)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{name}_changes AFTER {event} ON {table}
+            BEGIN
+                UPDATE change_counters SET changes = changes + 1 WHERE family IN ({names});
+            END
         """)
-        
-        # Enrollments table
+
+    for table, bumped in families.items():
+        schedule = ["schedule"] if table == "classes" else []
+        trigger(f"{table}_insert", "INSERT", table, bumped + schedule)
+        trigger(f"{table}_delete", "DELETE", table, bumped + schedule)
+        trigger(f"{table}_update", "UPDATE", table, bumped)
+    trigger("classes_schedule", f"UPDATE OF {_SCHEDULE_COLUMNS}", "classes", ["schedule"])
+
+def _schema_class_filter_indexes(cursor: sqlite3.Cursor) -> None:
+    """Class filter indexes in id order, carrying the minute columns
+
+    Listings are ``ORDER BY id``, so an index only helps if it yields rows in
+    id order: level and teacher are indexed as (value, id), the weekdays by
+    the partial id indexes. The minute columns ride along so starts_after
+    and ends_before are tested inside the index, before any table row is
+    read. The (level, start_minute), (teacher, start_minute) and
+    start_minute indexes were never chosen for such queries and go.
+    """
+    for name in ("idx_classes_level_start", "idx_classes_teacher_start", "idx_classes_start"):
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    for column in ("level", "teacher"):
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_classes_{column}_id
+            ON classes ({column}, id, start_minute, end_minute)
+        """)
+    for day, bit in DAY_BITS.items():
+        cursor.execute(f"DROP INDEX IF EXISTS idx_classes_{day.lower()}_id")
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_classes_{day.lower()}_times
+            ON classes (id, start_minute, end_minute) WHERE day_mask & {bit}
+        """)
+
+# Append only: a database at version N has run exactly the first N steps.
+# Steps must also be safe on databases created before versioning (version 0
+# with some tables already present), hence IF NOT EXISTS throughout.
+MIGRATIONS: Tuple[Callable[[sqlite3.Cursor], None], ...] = (
+    _schema_v1,
+    _schema_v2,
+    stats.create_stats_tables,
+    search.create_search_index,
+    _schema_waitlist,
+    _schema_weekday_indexes,
+    _schema_change_counters,
+    _schema_class_filter_indexes,
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Bring the schema up to ``SCHEMA_VERSION`` and return the version found
+
+    A current database costs one ``PRAGMA user_version`` read. Otherwise the
+    pending steps run in one IMMEDIATE transaction, so concurrent processes
+    starting against the same file migrate it once.
+    """
+    found = conn.execute("PRAGMA user_version").fetchone()[0]
+    if found == SCHEMA_VERSION:
+        return found
+    if found > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {found} is newer than this code ({SCHEMA_VERSION})")
+    
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        found = conn.execute("PRAGMA user_version").fetchone()[0]
+        cursor = conn.cursor()
+        for version in range(found + 1, SCHEMA_VERSION + 1):
+            MIGRATIONS[version - 1](cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return found
+
+def init_db():
+    """Initialize the database schema now instead of on first use"""
+    get_pool().ensure_schema()
+
+def migrate_schedule_columns(cursor: sqlite3.Cursor) -> None:
+    """Add and backfill the weekday bitmask / minute columns (indexed by later steps)
+
+    ``days`` stays as JSON for older readers, but nothing in this module
+    parses it any more: filters and responses use ``day_mask`` and the
+    minute columns. Existing rows are converted in SQL with json_each.
+    """
+    cursor.execute("PRAGMA table_info(classes)")
+    columns = {row['name'] for row in cursor.fetchall()}
+    added = [column for column in ("day_mask", "start_minute", "end_minute") if column not in columns]
+    for column in added:
+        cursor.execute(f"ALTER TABLE classes ADD COLUMN {column} INTEGER")
+    
+    if added:
+        day_bits = " ".join(f"WHEN '{day}' THEN {bit}" for day, bit in DAY_BITS.items())
+        cursor.execute(f"""
+            UPDATE classes SET
+                day_mask = (SELECT COALESCE(SUM(DISTINCT CASE value {day_bits} ELSE 0 END), 0) FROM json_each(classes.days)),
+                start_minute = CAST(substr(start_time, 1, 2) AS INTEGER) * 60 + CAST(substr(start_time, 4, 2) AS INTEGER),
+                end_minute = CAST(substr(end_time, 1, 2) AS INTEGER) * 60 + CAST(substr(end_time, 4, 2) AS INTEGER)
+            WHERE day_mask IS NULL
+        """)
+    
+
+def migrate_student_identity(cursor: sqlite3.Cursor) -> None:
+    """Merge duplicate students by name and add the unique identity indexes
+
+    Older databases added a new ``students`` row on every enrollment. This
+    folds each name onto its lowest id, repoints enrollments, and only then
+    creates the unique indexes. It is a no-op once the indexes exist.
+    """
+    cursor.execute("""
+        SELECT 1 FROM sqlite_master
+        WHERE type = 'index' AND name = 'idx_students_name'
+    """)
+    if cursor.fetchone():
+        return
+    
+    cursor.execute("""
+        CREATE TEMP TABLE student_merge AS
+        SELECT s.id AS old_id, k.keep_id AS new_id
+        FROM students s
+        JOIN (SELECT name, MIN(id) AS keep_id FROM students GROUP BY name) k
+          ON k.name = s.name
+        WHERE s.id != k.keep_id
+    """)
+    
+    cursor.execute("SELECT COUNT(*) FROM student_merge")
+    if cursor.fetchone()[0]:
+        # Keep the first known email for the surviving row
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS enrollments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                class_id INTEGER NOT NULL,
-                student_id INTEGER NOT NULL,
-                enrolled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (class_id) REFERENCES classes (id),
-                FOREIGN KEY (student_id) REFERENCES students (id),
-                UNIQUE(class_id, student_id)
+            UPDATE students
+            SET email = (
+                SELECT d.email FROM student_merge m
+                JOIN students d ON d.id = m.old_id
+                WHERE m.new_id = students.id AND d.email IS NOT NULL
+                ORDER BY d.id LIMIT 1
             )
+            WHERE email IS NULL
+              AND id IN (SELECT new_id FROM student_merge)
         """)
-        
-        # Quizzes table
+        # Repoint enrollments; ones that would collide are true duplicates
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS quizzes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                topic TEXT,
-                difficulty TEXT DEFAULT 'intermediate',
-                focus_mode TEXT DEFAULT 'comprehension',
-                metadata TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+            UPDATE OR IGNORE enrollments
+            SET student_id = (SELECT new_id FROM student_merge WHERE old_id = enrollments.student_id)
+            WHERE student_id IN (SELECT old_id FROM student_merge)
         """)
-        
-        # Questions table
         cursor.execute("""
-            CREATE TABLE IF NOT EXISTS questions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                quiz_id INTEGER NOT NULL,
-                text TEXT NOT NULL,
-                options TEXT NOT NULL,
-                correct_answer TEXT NOT NULL,
-                explanation TEXT,
-                FOREIGN KEY (quiz_id) REFERENCES quizzes (id) ON DELETE CASCADE
-            )
+            DELETE FROM enrollments
+            WHERE student_id IN (SELECT old_id FROM student_merge)
         """)
-        
-        conn.commit()
+        if cursor.rowcount:
+            cursor.execute("""
+                UPDATE classes
+                SET enrolled_count = (SELECT COUNT(*) FROM enrollments WHERE class_id = classes.id)
+            """)
+        cursor.execute("DELETE FROM students WHERE id IN (SELECT old_id FROM student_merge)")
+    
+    cursor.execute("DROP TABLE student_merge")
+    
+    # A reused email keeps only its first owner
+    cursor.execute("""
+        UPDATE students SET email = NULL
+        WHERE email IS NOT NULL
+          AND id NOT IN (SELECT MIN(id) FROM students WHERE email IS NOT NULL GROUP BY email)
+    """)
+    cursor.execute("CREATE UNIQUE INDEX idx_students_name ON students (name)")
+    cursor.execute("""
+        CREATE UNIQUE INDEX idx_students_email ON students (email)
+        WHERE email IS NOT NULL
+    """)
+
+def upsert_student(cursor: sqlite3.Cursor, name: str, email: Optional[str] = None) -> int:
+    """Create or fetch a student by name in one statement and return its id"""
+    cursor.execute("""
+        INSERT INTO students (name, email) VALUES (?, ?)
+        ON CONFLICT (name) DO UPDATE SET email = COALESCE(excluded.email, students.email)
+        RETURNING id
+    """, (name, email))
+    return cursor.fetchone()[0]
 
-def serialize_class_row(row: sqlite3.Row) -> Dict:
-    """Normalize database row to API-friendly shape"""
-    class_dict = dict(row)
-    class_dict['days'] = json.loads(class_dict.get('days', '[]'))
-    class_dict['enrolled'] = class_dict.get('enrolled_count', 0)
-    # Provide consistent optional fields for frontend consumers
-    class_dict.setdefault('syllabus', [])
-    class_dict.setdefault('students', [])
-    return class_dict
+def upsert_students(cursor: sqlite3.Cursor, names: Iterable[str]) -> Dict[str, int]:
+    """Ids for many student names, creating the missing ones in two statements"""
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    cursor.executemany("INSERT INTO students (name) VALUES (?) ON CONFLICT(name) DO NOTHING",
+                       [(name,) for name in names])
+    cursor.execute("SELECT name, id FROM students WHERE name IN (SELECT value FROM json_each(?))",
+                   (json.dumps(names),))
+    return dict(cursor.fetchall())
+
+def class_fields(names: Iterable[str]) -> Tuple[str, ...]:
+    """Validated projection for ``serialize_class_row``; ``id`` is always included (paging needs it)"""
+    fields = tuple(dict.fromkeys(['id'] + [name.strip() for name in names if name.strip()]))
+    unknown = [name for name in fields if name not in CLASS_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown class field: {unknown[0]} (expected any of {', '.join(CLASS_FIELDS)})")
+    return fields
+
+def class_columns(fields: Optional[Tuple[str, ...]] = None) -> str:
+    """SELECT list for serializing ``fields`` (every field when None)"""
+    if fields is None:
+        return CLASS_COLUMNS
+    return ", ".join(dict.fromkeys(column for field in fields for column in CLASS_FIELDS[field]))
+
+_DERIVED_CLASS_FIELDS = {
+    'days': lambda row: mask_to_days(row['day_mask']),
+    'enrolled': lambda row: row['enrolled_count'] or 0,
+    'syllabus': lambda row: [],
+    'students': lambda row: [],
+}
+
+def serialize_class_row(row: sqlite3.Row, fields: Optional[Tuple[str, ...]] = None) -> Dict:
+    """Normalize a ``CLASS_COLUMNS`` row (or a ``class_columns(fields)`` row) to API-friendly shape"""
+    if fields is not None:
+        return {field: _DERIVED_CLASS_FIELDS[field](row) if field in _DERIVED_CLASS_FIELDS else row[field]
+                for field in fields}
+    enrolled_count = row['enrolled_count']
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'level': row['level'],
+        'teacher': row['teacher'],
+        'days': mask_to_days(row['day_mask']),
+        'start_time': row['start_time'],
+        'end_time': row['end_time'],
+        'capacity': row['capacity'],
+        'enrolled_count': enrolled_count,
+        'created_at': row['created_at'],
+        'enrolled': enrolled_count or 0,
+        # Provide consistent optional fields for frontend consumers
+        'syllabus': [],
+        'students': []
+    }
+
+def attach_rosters(cursor: sqlite3.Cursor, classes: List[Dict], archived: bool = False) -> List[Dict]:
+    """Fill in ``students`` for a list of serialized classes with one query for all of them
+
+    Each roster is newest first, as from ``get_class_students``. With
+    ``archived`` (the archive must be attached) archived rosters are read too.
+    """
+    by_id = {}
+    for class_obj in classes:
+        class_obj['students'] = []
+        by_id[class_obj['id']] = class_obj['students']
+    if not by_id:
+        return classes
+    cursor.execute(f"""
+        SELECT e.class_id, s.id, s.name, s.email, e.enrolled_at
+        FROM {archive.enrollments_source("e") if archived else "enrollments e"}
+        JOIN students s ON s.id = e.student_id
+        WHERE e.class_id IN (SELECT value FROM json_each(?))
+        ORDER BY e.class_id, e.enrolled_at DESC
+    """, (json.dumps(list(by_id)),))
+    for class_id, student_id, name, email, enrolled_at in cursor:
+        by_id[class_id].append({'id': student_id, 'name': name, 'email': email, 'enrolled_at': enrolled_at})
+    return classes
 
 def create_class(class_data: Dict) -> int:
     """Create a new class"""
@@ -109,8 +1171,9 @@ def create_class(class_data: Dict) -> int:
         days_json = json.dumps(class_data['days'])
         
         cursor.execute("""
-            INSERT INTO classes (name, level, teacher, days, start_time, end_time, capacity)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO classes (name, level, teacher, days, start_time, end_time, capacity,
+                                 day_mask, start_minute, end_minute)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             class_data['name'],
             class_data['level'],
@@ -118,17 +1181,139 @@ def create_class(class_data: Dict) -> int:
             days_json,
             class_data['start_time'],
             class_data['end_time'],
-            class_data['capacity']
+            class_data['capacity'],
+            days_to_mask(class_data['days']),
+            time_to_minutes(class_data['start_time']),
+            time_to_minutes(class_data['end_time'])
         ))
         
-        return cursor.lastrowid
+        class_id = cursor.lastrowid
+        notify_write("classes_created", [{**class_data, 'id': class_id}])
+        return class_id
+
+def create_classes(
+    class_specs: Iterable[Dict],
+    validate: Optional[Callable[[Dict], Dict]] = None,
+    chunk_size: Optional[int] = None,
+    check: Optional[Callable[[Dict], None]] = None,
+) -> Tuple[List[Dict], List[Dict]]:
+    """Create many classes with executemany and return (created, rejected)
+
+    Every spec is validated before anything is written: ``validate`` maps a
+    spec to a class row and raises ValueError/KeyError to reject it. Rows are
+    inserted in one transaction, or one transaction per ``chunk_size`` rows,
+    and the created classes are built from the input instead of re-read.
+    ``check`` runs on each row inside its chunk's write transaction, so it
+    sees every committed class and no other writer can interleave; raising
+    ValueError rejects the row. Rejections are reported as
+    ``{"index": i, "error": message}``, in input order.
+    """
+    valid = []
+    rejected = []
+    for index, spec in enumerate(class_specs):
+        try:
+            class_data = validate(spec) if validate else spec
+            valid.append((index, class_data, (
+                class_data['name'],
+                class_data['level'],
+                class_data['teacher'],
+                json.dumps(class_data['days']),
+                class_data['start_time'],
+                class_data['end_time'],
+                class_data['capacity'],
+                days_to_mask(class_data['days']),
+                time_to_minutes(class_data['start_time']),
+                time_to_minutes(class_data['end_time'])
+            )))
+        except KeyError as e:
+            rejected.append({"index": index, "error": f"Missing field: {e.args[0]}"})
+        except (ValueError, TypeError) as e:
+            rejected.append({"index": index, "error": str(e)})
+    
+    step = chunk_size or len(valid) or 1
+    created = []
+    for start in range(0, len(valid), step):
+        chunk = valid[start:start + step]
+        with transaction(immediate=True) as conn:
+            if check is not None:
+                accepted = []
+                for index, class_data, row in chunk:
+                    try:
+                        check(class_data)
+                        accepted.append((index, class_data, row))
+                    except ValueError as e:
+                        rejected.append({"index": index, "error": str(e)})
+                chunk = accepted
+                if not chunk:
+                    continue
+            cursor = conn.cursor()
+            created_at = cursor.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+            cursor.executemany("""
+                INSERT INTO classes (name, level, teacher, days, start_time, end_time, capacity,
+                                     day_mask, start_minute, end_minute, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [row + (created_at,) for _, _, row in chunk])
+            # AUTOINCREMENT ids are contiguous while we hold the write lock
+            last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+            first_id = last_id - len(chunk) + 1
+            notify_write("classes_created", [
+                {**class_data, 'id': first_id + offset} for offset, (_, class_data, _) in enumerate(chunk)
+            ])
+        
+        for offset, (_, class_data, _) in enumerate(chunk):
+            created.append({
+                'id': first_id + offset,
+                'name': class_data['name'],
+                'level': class_data['level'],
+                'teacher': class_data['teacher'],
+                'days': list(class_data['days']),
+                'start_time': class_data['start_time'],
+                'end_time': class_data['end_time'],
+                'capacity': class_data['capacity'],
+                'enrolled_count': 0,
+                'enrolled': 0,
+                'created_at': created_at,
+                'syllabus': [],
+                'students': []
+            })
+    
+    rejected.sort(key=lambda item: item["index"])
+    return created, rejected
 
-def get_all_classes(level: Optional[str] = None, teacher: Optional[str] = None) -> List[Dict]:
-    """Get all classes with optional filters"""
+@cached_read(lambda *args, **filters: [("classes",)])
+def get_all_classes(
+    level: Optional[str] = None,
+    teacher: Optional[str] = None,
+    day: Optional[str] = None,
+    starts_after: Optional[int] = None,
+    ends_before: Optional[int] = None,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    fields: Optional[Tuple[str, ...]] = None,
+    include_students: bool = False,
+    include_archived: bool = False,
+) -> List[Dict]:
+    """Get all classes with optional filters, ordered by id
+
+    ``day`` is a weekday name; ``starts_after``/``ends_before`` are minutes
+    of the day (inclusive). ``level``, ``teacher`` and ``day`` each use an
+    index in id order that also holds the minute columns, so time filters
+    combined with one of them are checked inside the index. Time filters
+    alone scan the table in id order (no index can serve both a minute range
+    and id order); with ``limit`` the scan stops once a page is full.
+    ``after_id``/``limit`` select one keyset page. ``fields`` (from
+    ``class_fields``) limits the columns read and returned;
+    ``include_students`` embeds every roster, read in one more query.
+    ``include_archived`` adds classes moved to the archive (see ``archive_classes``).
+    """
+    if include_students and fields is not None and 'students' not in fields:
+        fields += ('students',)
     with get_db() as conn:
+        archived = include_archived and archive.attach(conn, get_pool().path)
         cursor = conn.cursor()
         
-        query = "SELECT * FROM classes WHERE 1=1"
+        source = archive.classes_source(archive.CLASS_COLUMNS) if archived else "classes"
+        query = f"SELECT {class_columns(fields)} FROM {source} WHERE 1=1"
         params = []
         
         if level:
@@ -139,70 +1324,190 @@ def get_all_classes(level: Optional[str] = None, teacher: Optional[str] = None)
             query += " AND teacher = ?"
             params.append(teacher)
         
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
+        if day:
+            # Inlined literal so the planner can match the per-day partial index
+            query += f" AND day_mask & {DAY_BITS[day]}"
         
-        classes = []
-        for row in rows:
-            classes.append(serialize_class_row(row))
+        if starts_after is not None:
+            query += " AND start_minute >= ?"
+            params.append(starts_after)
         
-        return classes
+        if ends_before is not None:
+            query += " AND end_minute <= ?"
+            params.append(ends_before)
+        
+        if after_id is not None:
+            query += " AND id > ?"
+            params.append(after_id)
+        
+        query += " ORDER BY id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        cursor.execute(query, params)
+        classes = [serialize_class_row(row, fields) for row in cursor]
+        return attach_rosters(cursor, classes, archived) if include_students else classes
+
+def get_classes_page(limit: int, cursor: Optional[str] = None, **filters) -> Tuple[List[Dict], Optional[str]]:
+    """One keyset page of classes plus the opaque token for the next page"""
+    after_id = decode_cursor("classes", cursor, (int,))[0] if cursor else None
+    rows = get_all_classes(after_id=after_id, limit=limit + 1, **filters)
+    next_cursor = encode_cursor("classes", [rows[limit - 1]['id']]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def iter_classes(page_size: int = STREAM_PAGE_SIZE, **filters) -> Iterator[Dict]:
+    """Yield every matching class, reading one short keyset page at a time
 
-def get_class_by_id(class_id: int) -> Optional[Dict]:
-    """Get a specific class by ID"""
+    Pages are read around the cache so a full export does not evict hot entries.
+    """
+    after_id = None
+    while True:
+        rows = get_all_classes.uncached(after_id=after_id, limit=page_size, **filters)
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1]['id']
+
+@cached_read(lambda class_id, **options: [("class", class_id)])
+def get_class_by_id(class_id: int, fields: Optional[Tuple[str, ...]] = None,
+                    include_students: bool = False, include_archived: bool = False) -> Optional[Dict]:
+    """Get a specific class by ID (options as for ``get_all_classes``)"""
+    if include_students and fields is not None and 'students' not in fields:
+        fields += ('students',)
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM classes WHERE id = ?", (class_id,))
+        cursor.execute(f"SELECT {class_columns(fields)} FROM classes WHERE id = ?", (class_id,))
         row = cursor.fetchone()
+        archived = False
+        if row is None and include_archived and archive.attach(conn, get_pool().path):
+            cursor.execute(f"SELECT {class_columns(fields)} FROM archive.classes WHERE id = ?", (class_id,))
+            row = cursor.fetchone()
+            archived = True
         
         if row:
-            return serialize_class_row(row)
+            class_obj = serialize_class_row(row, fields)
+            return attach_rosters(cursor, [class_obj], archived)[0] if include_students else class_obj
         
         return None
 
+def enroll_in_transaction(cursor: sqlite3.Cursor, class_id: int, student_name: str) -> Dict:
+    """Enroll a student using an already-open write transaction
+
+    Capacity is claimed with a single conditional UPDATE, so concurrent
+    writers can never push ``enrolled_count`` past ``capacity``. Raises
+    ValueError on rejection; the caller must roll back (see ``savepoint``).
+    """
+    cursor.execute("""
+        UPDATE classes
+        SET enrolled_count = enrolled_count + 1
+        WHERE id = ? AND enrolled_count < capacity
+        RETURNING enrolled_count
+    """, (class_id,))
+    row = cursor.fetchone()
+    
+    if row is None:
+        cursor.execute("SELECT 1 FROM classes WHERE id = ?", (class_id,))
+        if cursor.fetchone() is None:
+            raise ValueError("Class not found")
+        raise ClassFull("Class is full")
+    
+    enrolled_count = row[0]
+    
+    student_id = upsert_student(cursor, student_name)
+    
+    # Create enrollment
+    try:
+        cursor.execute("""
+            INSERT INTO enrollments (class_id, student_id)
+            VALUES (?, ?)
+        """, (class_id, student_id))
+    except sqlite3.IntegrityError:
+        raise ValueError("Student already enrolled in this class")
+    
+    notify_write("enrollments_created", [{'class_id': class_id, 'student_id': student_id}])
+    return {
+        "message": f"Successfully enrolled {student_name}",
+        "class_id": class_id,
+        "student_name": student_name,
+        "enrolled_count": enrolled_count
+    }
+
 def enroll_student(class_id: int, student_name: str) -> Dict:
     """Enroll a student in a class"""
-    with get_db() as conn:
+    with transaction(immediate=True) as conn:
+        with savepoint(conn, "enroll"):
+            return enroll_in_transaction(conn.cursor(), class_id, student_name)
+
+def enroll_students(pairs: List[Tuple[int, str]]) -> List[Dict]:
+    """Enroll many (class_id, student_name) pairs in one transaction, one outcome per pair
+
+    Classes, existing students and existing enrollments are each read with
+    one set-based query, so the cost does not grow with round trips. Pairs
+    are granted in request order while seats remain, which is how a class
+    that fills up mid-batch is handled. Rejected pairs (unknown class, full,
+    already enrolled, repeated in the batch) write nothing, not even the
+    student row. Each outcome has ``index``, ``class_id``, ``student_name``
+    and ``status`` ("enrolled" with the class's new ``enrolled_count``, or
+    "rejected" with an ``error``).
+    """
+    if not pairs:
+        return []
+    class_ids = list(dict.fromkeys(class_id for class_id, _ in pairs))
+    names = list(dict.fromkeys(name for _, name in pairs))
+    
+    with transaction(immediate=True) as conn:
         cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, capacity - enrolled_count, enrolled_count FROM classes
+            WHERE id IN (SELECT value FROM json_each(?))
+        """, (json.dumps(class_ids),))
+        seats, counts = {}, {}
+        for class_id, free, enrolled_count in cursor.fetchall():
+            seats[class_id], counts[class_id] = free, enrolled_count
+        cursor.execute("SELECT name, id FROM students WHERE name IN (SELECT value FROM json_each(?))",
+                       (json.dumps(names),))
+        student_ids = dict(cursor.fetchall())
+        candidates = [[class_id, student_ids[name]] for class_id, name in pairs
+                      if class_id in seats and name in student_ids]
+        cursor.execute("""
+            SELECT class_id, student_id FROM enrollments
+            WHERE (class_id, student_id) IN (
+                SELECT value ->> 0, value ->> 1 FROM json_each(?)
+            )
+        """, (json.dumps(candidates),))
+        taken = {(class_id, student_id) for class_id, student_id in cursor.fetchall()}
         
-        # Check class capacity
-        cursor.execute("SELECT capacity, enrolled_count FROM classes WHERE id = ?", (class_id,))
-        row = cursor.fetchone()
-        
-        if not row:
-            raise ValueError("Class not found")
-        
-        if row['enrolled_count'] >= row['capacity']:
-            raise ValueError("Class is full")
-        
-        # Create or get student
-        cursor.execute("INSERT OR IGNORE INTO students (name) VALUES (?)", (student_name,))
-        cursor.execute("SELECT id FROM students WHERE name = ?", (student_name,))
-        student_id = cursor.fetchone()['id']
+        outcomes, accepted, seen = [], [], set()
+        for index, (class_id, name) in enumerate(pairs):
+            outcome = {'index': index, 'class_id': class_id, 'student_name': name}
+            if class_id not in seats:
+                error = "Class not found"
+            elif (class_id, name) in seen or (class_id, student_ids.get(name)) in taken:
+                error = "Student already enrolled in this class"
+            elif seats[class_id] <= 0:
+                error = "Class is full"
+            else:
+                error = None
+                seen.add((class_id, name))
+                seats[class_id] -= 1
+                counts[class_id] += 1
+                outcome.update(status='enrolled', enrolled_count=counts[class_id])
+                accepted.append(outcome)
+            if error:
+                outcome.update(status='rejected', error=error)
+            outcomes.append(outcome)
         
-        # Create enrollment
-        try:
-            cursor.execute("""
-                INSERT INTO enrollments (class_id, student_id)
-                VALUES (?, ?)
-            """, (class_id, student_id))
-            
-            # Update enrolled count
-            cursor.execute("""
-                UPDATE classes
-                SET enrolled_count = enrolled_count + 1
-                WHERE id = ?
-            """, (class_id,))
-            
-            conn.commit()
-            
-            return {
-                "message": f"Successfully enrolled {student_name}",
-                "class_id": class_id,
-                "student_name": student_name
-            }
-        except sqlite3.IntegrityError:
-            raise ValueError("Student already enrolled in this class")
+        if accepted:
+            student_ids.update(upsert_students(cursor, [o['student_name'] for o in accepted
+                                                        if o['student_name'] not in student_ids]))
+            rows = [(o['class_id'], student_ids[o['student_name']]) for o in accepted]
+            cursor.executemany("INSERT INTO enrollments (class_id, student_id) VALUES (?, ?)", rows)
+            added = Counter(class_id for class_id, _ in rows)
+            cursor.executemany("UPDATE classes SET enrolled_count = enrolled_count + ? WHERE id = ?",
+                               [(n, class_id) for class_id, n in added.items()])
+            notify_write("enrollments_created", [{'class_id': c, 'student_id': s} for c, s in rows])
+    return outcomes
 
 def get_class_students(class_id: int) -> List[Dict]:
     """Get all students enrolled in a class"""
@@ -219,54 +1524,324 @@ def get_class_students(class_id: int) -> List[Dict]:
         rows = cursor.fetchall()
         return [dict(row) for row in rows]
 
-def create_quiz(quiz_data: Dict) -> int:
-    """Create a new quiz with questions"""
+def _class_seats(cursor: sqlite3.Cursor, class_id: int) -> sqlite3.Row:
+    cursor.execute("SELECT id, level, teacher, capacity, enrolled_count FROM classes WHERE id = ?", (class_id,))
+    row = cursor.fetchone()
+    if row is None:
+        raise ValueError("Class not found")
+    return row
+
+def _waitlist_position(cursor: sqlite3.Cursor, class_id: int, student_id: Optional[int]) -> Optional[int]:
+    cursor.execute("""
+        SELECT COUNT(*) FROM waitlist
+        WHERE class_id = ?1 AND id <= (SELECT id FROM waitlist WHERE class_id = ?1 AND student_id = ?2)
+    """, (class_id, student_id))
+    return cursor.fetchone()[0] or None
+
+def promote_waitlist(cursor: sqlite3.Cursor, class_id: int) -> List[str]:
+    """Move the head of the class's waitlist into any free seats, in the caller's transaction
+
+    Every operation that frees a seat (unenroll, capacity increase) calls
+    this before committing, so a class never has both a free seat and a
+    queue. Returns the promoted students' names, in queue order.
+    """
+    cursor.execute("""
+        DELETE FROM waitlist WHERE id IN (
+            SELECT id FROM waitlist WHERE class_id = ?1 ORDER BY id
+            LIMIT (SELECT MAX(capacity - enrolled_count, 0) FROM classes WHERE id = ?1)
+        )
+        RETURNING id, student_id
+    """, (class_id,))
+    promoted = sorted(tuple(row) for row in cursor.fetchall())
+    if not promoted:
+        return []
+    rows = [{'class_id': class_id, 'student_id': student_id} for _, student_id in promoted]
+    cursor.executemany("INSERT INTO enrollments (class_id, student_id) VALUES (?, ?)",
+                       [(class_id, row['student_id']) for row in rows])
+    cursor.execute("UPDATE classes SET enrolled_count = enrolled_count + ? WHERE id = ?", (len(rows), class_id))
+    notify_write("enrollments_created", rows)
+    notify_write("waitlist_changed", [{'class_id': class_id}])
+    cursor.execute("SELECT id, name FROM students WHERE id IN (SELECT value FROM json_each(?))",
+                   (json.dumps([row['student_id'] for row in rows]),))
+    names = dict(cursor.fetchall())
+    return [names[row['student_id']] for row in rows]
+
+def join_waitlist_in_transaction(cursor: sqlite3.Cursor, class_id: int, student_name: str) -> Dict:
+    """Enroll if a seat is free, otherwise queue the student (idempotent), in an open write transaction
+
+    ``status`` is "enrolled" (with ``enrolled_count``) or "waitlisted" (with
+    the 1-based ``position``). Raises ValueError on rejection; as with
+    ``enroll_in_transaction`` the caller must roll back.
+    """
+    try:
+        return {**enroll_in_transaction(cursor, class_id, student_name), 'status': 'enrolled'}
+    except ClassFull:
+        pass
+    
+    student_id = upsert_student(cursor, student_name)
+    cursor.execute("SELECT 1 FROM enrollments WHERE class_id = ? AND student_id = ?", (class_id, student_id))
+    if cursor.fetchone():
+        raise ValueError("Student already enrolled in this class")
+    cursor.execute("""
+        INSERT INTO waitlist (class_id, student_id) VALUES (?, ?)
+        ON CONFLICT (class_id, student_id) DO NOTHING
+    """, (class_id, student_id))
+    if cursor.rowcount:
+        notify_write("waitlist_changed", [{'class_id': class_id}])
+    return {
+        "message": f"{student_name} is on the waitlist",
+        "class_id": class_id,
+        "student_name": student_name,
+        "status": "waitlisted",
+        "position": _waitlist_position(cursor, class_id, student_id)
+    }
+
+def join_waitlist(class_id: int, student_name: str) -> Dict:
+    """Enroll a student, or put them on the waitlist if the class is full"""
+    with transaction(immediate=True) as conn:
+        with savepoint(conn, "join_waitlist"):
+            return join_waitlist_in_transaction(conn.cursor(), class_id, student_name)
+
+def leave_waitlist(class_id: int, student_name: str) -> bool:
+    """Remove a student from a class's waitlist; False if they were not on it"""
+    with transaction(immediate=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM waitlist
+            WHERE class_id = ? AND student_id = (SELECT id FROM students WHERE name = ?)
+        """, (class_id, student_name))
+        if not cursor.rowcount:
+            return False
+        notify_write("waitlist_changed", [{'class_id': class_id}])
+        return True
+
+def unenroll_student(class_id: int, student_name: str) -> Dict:
+    """Drop an enrollment and promote the head of the waitlist into the freed seat"""
+    with transaction(immediate=True) as conn:
+        cursor = conn.cursor()
+        _class_seats(cursor, class_id)
+        cursor.execute("""
+            DELETE FROM enrollments
+            WHERE class_id = ? AND student_id = (SELECT id FROM students WHERE name = ?)
+            RETURNING student_id, enrolled_at
+        """, (class_id, student_name))
+        row = cursor.fetchone()
+        if row is None:
+            raise ValueError("Student is not enrolled in this class")
+        cursor.execute("UPDATE classes SET enrolled_count = enrolled_count - 1 WHERE id = ?", (class_id,))
+        notify_write("enrollments_deleted", [{'class_id': class_id, 'student_id': row['student_id'],
+                                              'enrolled_at': row['enrolled_at']}])
+        promoted = promote_waitlist(cursor, class_id)
+        return {
+            "message": f"Unenrolled {student_name}",
+            "class_id": class_id,
+            "student_name": student_name,
+            "enrolled_count": _class_seats(cursor, class_id)['enrolled_count'],
+            "promoted": promoted
+        }
+
+def update_class_capacity(class_id: int, capacity: int) -> Dict:
+    """Resize a class, promoting waitlisted students into any new seats
+
+    Shrinking below the current enrollment is rejected rather than
+    dropping students.
+    """
+    with transaction(immediate=True) as conn:
+        cursor = conn.cursor()
+        seats = _class_seats(cursor, class_id)
+        if capacity < max(seats['enrolled_count'], 1):
+            raise ValueError(f"capacity must be at least {max(seats['enrolled_count'], 1)}")
+        cursor.execute("UPDATE classes SET capacity = ? WHERE id = ?", (capacity, class_id))
+        notify_write("classes_updated", [{'id': class_id, 'level': seats['level'], 'teacher': seats['teacher'],
+                                          'capacity_delta': capacity - seats['capacity']}])
+        promoted = promote_waitlist(cursor, class_id)
+        return {**get_class_by_id(class_id), "promoted": promoted}
+
+def get_waitlist(class_id: int) -> Optional[List[Dict]]:
+    """A class's waitlist in queue order, or None if the class does not exist"""
     with get_db() as conn:
         cursor = conn.cursor()
-        
+        cursor.execute("SELECT 1 FROM classes WHERE id = ?", (class_id,))
+        if cursor.fetchone() is None:
+            return None
         cursor.execute("""
-            INSERT INTO quizzes (title, topic, difficulty, focus_mode, metadata)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
+            SELECT s.id, s.name, w.joined_at
+            FROM waitlist w
+            JOIN students s ON s.id = w.student_id
+            WHERE w.class_id = ?
+            ORDER BY w.id
+        """, (class_id,))
+        return [{'position': position, **dict(row)} for position, row in enumerate(cursor.fetchall(), 1)]
+
+def get_enrollment_status(class_id: int, student_name: str) -> Optional[Dict]:
+    """Whether a student is enrolled in, waitlisted for, or absent from a class (None if no such class)
+
+    ``state`` ("enrolled", "waitlisted:<position>" or "none") changes
+    whenever anything the student would care about does, so clients can
+    long-poll on it.
+    """
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT capacity, enrolled_count FROM classes WHERE id = ?", (class_id,))
+        seats = cursor.fetchone()
+        if seats is None:
+            return None
+        cursor.execute("SELECT id FROM students WHERE name = ?", (student_name,))
+        student = cursor.fetchone()
+        student_id = student[0] if student else None
+        cursor.execute("SELECT 1 FROM enrollments WHERE class_id = ? AND student_id = ?", (class_id, student_id))
+        enrolled = cursor.fetchone() is not None
+        position = None if enrolled else _waitlist_position(cursor, class_id, student_id)
+        cursor.execute("SELECT COUNT(*) FROM waitlist WHERE class_id = ?", (class_id,))
+        waitlist_length = cursor.fetchone()[0]
+
+    status = "enrolled" if enrolled else "waitlisted" if position else "none"
+    return {
+        "class_id": class_id,
+        "student_name": student_name,
+        "status": status,
+        "position": position,
+        "state": f"waitlisted:{position}" if position else status,
+        "enrolled_count": seats['enrolled_count'],
+        "capacity": seats['capacity'],
+        "waitlist_length": waitlist_length
+    }
+
+def create_quiz(quiz_data: Dict) -> int:
+    """Create a new quiz with questions"""
+    return create_quizzes([quiz_data])[0]['id']
+
+def create_quizzes(quizzes: List[Dict]) -> List[Dict]:
+    """Create quizzes and all their questions with executemany in one transaction
+
+    Returns the quizzes in ``get_quiz`` shape, built from the input and the
+    contiguous ids SQLite assigned, so nothing is read back or re-decoded.
+    """
+    if not quizzes:
+        return []
+    
+    quiz_rows = []
+    for quiz_data in quizzes:
+        metadata = quiz_data.get('metadata') or {}
+        quiz_rows.append((
             quiz_data['title'],
             quiz_data.get('topic', ''),
             quiz_data.get('difficulty', 'intermediate'),
             quiz_data.get('focus_mode', 'comprehension'),
-            json.dumps(quiz_data.get('metadata', {}))
+            json.dumps(metadata)
         ))
+    
+    with transaction(immediate=True) as conn:
+        cursor = conn.cursor()
+        created_at = cursor.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+        cursor.executemany("""
+            INSERT INTO quizzes (title, topic, difficulty, focus_mode, metadata, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [row + (created_at,) for row in quiz_rows])
+        # AUTOINCREMENT ids are contiguous while we hold the write lock
+        first_quiz_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0] - len(quiz_rows) + 1
         
-        quiz_id = cursor.lastrowid
+        question_rows = []
+        for offset, quiz_data in enumerate(quizzes):
+            quiz_id = first_quiz_id + offset
+            for question in quiz_data['questions']:
+                question_rows.append((
+                    quiz_id,
+                    question['question'],
+                    json.dumps(question['options']),
+                    question['correct_answer'],
+                    question.get('explanation', '')
+                ))
         
-        for question in quiz_data['questions']:
-            cursor.execute("""
+        first_question_id = 0
+        if question_rows:
+            cursor.executemany("""
                 INSERT INTO questions (quiz_id, text, options, correct_answer, explanation)
                 VALUES (?, ?, ?, ?, ?)
-            """, (
-                quiz_id,
-                question['question'],
-                json.dumps(question['options']),
-                question['correct_answer'],
-                question.get('explanation', '')
-            ))
+            """, question_rows)
+            first_question_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0] - len(question_rows) + 1
         
-        return quiz_id
+        events, question_id = [], first_question_id
+        for offset, quiz_data in enumerate(quizzes):
+            count = len(quiz_data['questions'])
+            events.append({'id': first_quiz_id + offset, 'question_ids': list(range(question_id, question_id + count))})
+            question_id += count
+        notify_write("quizzes_created", events)
+    
+    created = []
+    question_id = first_question_id
+    for offset, (quiz_data, row) in enumerate(zip(quizzes, quiz_rows)):
+        quiz_id = first_quiz_id + offset
+        questions = []
+        for question in quiz_data['questions']:
+            questions.append({
+                'id': question_id,
+                'quiz_id': quiz_id,
+                'text': question['question'],
+                'options': list(question['options']),
+                'correct_answer': question['correct_answer'],
+                'explanation': question.get('explanation', '')
+            })
+            question_id += 1
+        created.append({
+            'id': quiz_id,
+            'title': row[0],
+            'topic': row[1],
+            'difficulty': row[2],
+            'focus_mode': row[3],
+            'metadata': quiz_data.get('metadata') or {},
+            'created_at': created_at,
+            'questions': questions
+        })
+    return created
+
+@cached_read(lambda *args, **page: [("quizzes",)])
+def get_all_quizzes(after: Optional[Tuple[str, int]] = None, limit: Optional[int] = None) -> List[Dict]:
+    """Get all quizzes (summary view), newest first
 
-def get_all_quizzes() -> List[Dict]:
-    """Get all quizzes (summary view)"""
+    ``after`` is the (created_at, id) of the last row of the previous page.
+    """
     with get_db() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
+        query = """
             SELECT q.id, q.title, q.topic, q.difficulty, q.focus_mode, q.created_at,
-                   COUNT(qu.id) as question_count
+                   COALESCE(s.question_count, 0) as question_count
             FROM quizzes q
-            LEFT JOIN questions qu ON q.id = qu.quiz_id
-            GROUP BY q.id
-            ORDER BY q.created_at DESC
-        """)
+            LEFT JOIN quiz_stats s ON s.quiz_id = q.id
+        """
+        params = []
+        if after is not None:
+            query += " WHERE (q.created_at, q.id) < (?, ?)"
+            params.extend(after)
+        query += " ORDER BY q.created_at DESC, q.id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
         
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor]
+
+def get_quizzes_page(limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """One keyset page of quiz summaries plus the opaque token for the next page"""
+    after = tuple(decode_cursor("quizzes", cursor, (str, int))) if cursor else None
+    rows = get_all_quizzes(after=after, limit=limit + 1)
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor("quizzes", [last['created_at'], last['id']])
+    return rows[:limit], next_cursor
+
+def iter_quizzes(page_size: int = STREAM_PAGE_SIZE) -> Iterator[Dict]:
+    """Yield every quiz summary, reading one short keyset page at a time (uncached)"""
+    after = None
+    while True:
+        rows = get_all_quizzes.uncached(after=after, limit=page_size)
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after = (rows[-1]['created_at'], rows[-1]['id'])
 
+@cached_read(lambda quiz_id: [("quiz", quiz_id)])
 def get_quiz(quiz_id: int) -> Optional[Dict]:
     """Get a specific quiz with all questions"""
     with get_db() as conn:
@@ -292,3 +1867,152 @@ def get_quiz(quiz_id: int) -> Optional[Dict]:
         
         quiz['questions'] = questions
         return quiz
+
+def save_attempts(quiz_id: int, question_ids: List[int], attempts: List[Dict]) -> List[Dict]:
+    """Store graded attempts and their answers with executemany in one transaction
+
+    Each attempt carries ``answers`` (option index or None per question, in
+    ``question_ids`` order), ``correct`` (bools in the same order), ``score``
+    and an optional ``student_name``. Returns the stored attempts with ids.
+    """
+    if not attempts:
+        return []
+    
+    total = len(question_ids)
+    with transaction(immediate=True) as conn:
+        cursor = conn.cursor()
+        student_ids = upsert_students(cursor, (a['student_name'] for a in attempts if a.get('student_name')))
+        submitted_at = cursor.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0]
+        cursor.executemany("""
+            INSERT INTO attempts (quiz_id, student_id, score, total, submitted_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(quiz_id, student_ids.get(a.get('student_name')), a['score'], total, submitted_at) for a in attempts])
+        # AUTOINCREMENT ids are contiguous while we hold the write lock
+        first_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0] - len(attempts) + 1
+        
+        cursor.executemany("""
+            INSERT INTO answers (attempt_id, question_id, answer, is_correct)
+            VALUES (?, ?, ?, ?)
+        """, [
+            (attempt_id, question_id, answer, is_correct)
+            for attempt_id, attempt in enumerate(attempts, first_id)
+            for question_id, answer, is_correct in zip(question_ids, attempt['answers'], attempt['correct'])
+            if answer is not None
+        ])
+        
+        stored = [{
+            'id': attempt_id,
+            'quiz_id': quiz_id,
+            'student_id': student_ids.get(attempt.get('student_name')),
+            'student_name': attempt.get('student_name'),
+            'score': attempt['score'],
+            'total': total,
+            'correct': attempt['correct'],
+            'submitted_at': submitted_at
+        } for attempt_id, attempt in enumerate(attempts, first_id)]
+        notify_write("attempts_created", stored)
+    return stored
+
+def get_quiz_stats(quiz_id: int) -> Optional[Dict]:
+    """Attempts, average score and per-question accuracy for a quiz"""
+    with get_db() as conn:
+        return stats.quiz_stats(conn.cursor(), quiz_id)
+
+def get_fill_stats(dimension: str = "level", include_archived: bool = False) -> List[Dict]:
+    """Class fill rate grouped by ``level`` or ``teacher`` (live classes unless ``include_archived``)"""
+    with get_db() as conn:
+        if include_archived:
+            archive.attach(conn, get_pool().path)
+        return stats.fill_stats(conn.cursor(), dimension, include_archived)
+
+def get_enrollment_stats(since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+    """Enrollments per day"""
+    with get_db() as conn:
+        return stats.enrollment_stats(conn.cursor(), since, until)
+
+def rebuild_stats() -> None:
+    """Recompute all analytics tables from scratch in one transaction (recreating any that are missing)"""
+    with _archive_transaction() as conn:
+        cursor = conn.cursor()
+        stats.create_stats_tables(cursor)
+        stats.rebuild_stats(cursor)
+
+@contextmanager
+def _archive_transaction(immediate: bool = True, create: bool = False):
+    """``transaction`` on a connection with the archive attached (if there is one, or ``create``)
+
+    ATTACH must precede BEGIN, so this cannot join an open transaction.
+    """
+    if getattr(_local, "conn", None) is not None:
+        raise RuntimeError("archive transactions cannot be nested in another transaction")
+    with get_db() as conn:
+        archive.attach(conn, get_pool().path, create=create)
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        yield conn
+
+def archive_classes(before: str, batch_size: int = 500, pause: float = 0.0) -> Dict:
+    """Move classes created before ``before`` (and their enrollments) into the archive database
+
+    Works in batches of ``batch_size`` classes, each copied in one short
+    transaction and removed from the live tables in the next, sleeping
+    ``pause`` seconds between batches so other writers get the lock. Copying
+    only locks the archive; the live write lock is held for the delete
+    alone. Classes that change between the two steps stay live until the
+    next run. Returns counts of archived, skipped and batches.
+    """
+    totals = {"archived": 0, "enrollments": 0, "skipped": 0, "batches": 0}
+    last_id = 0
+    while True:
+        # Deferred: reads the live tables from a snapshot and locks only the archive
+        with _archive_transaction(immediate=False, create=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM classes WHERE created_at < ? AND id > ? ORDER BY id LIMIT ?",
+                           (before, last_id, batch_size))
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            ids_json = json.dumps(ids)
+            archive.copy_classes(cursor, ids_json)
+        with _archive_transaction() as conn:
+            cursor = conn.cursor()
+            rows = archive.delete_archived(cursor, ids_json)
+            notify_write("classes_archived", [{**dict(row), 'days': mask_to_days(row['day_mask'])}
+                                              for row in rows])
+        last_id = ids[-1]
+        totals["batches"] += 1
+        totals["archived"] += len(rows)
+        totals["enrollments"] += sum(row['enrolled_count'] for row in rows)
+        totals["skipped"] += len(ids) - len(rows)
+        if pause:
+            time.sleep(pause)
+    return totals
+
+def get_archive_stats() -> Dict:
+    """Counts of archived classes and enrollments (zeros if nothing was ever archived)"""
+    with get_db() as conn:
+        if not archive.attach(conn, get_pool().path):
+            return {"classes": 0, "enrollments": 0, "oldest_created_at": None, "newest_created_at": None}
+        return archive.summary(conn.cursor())
+
+def search_quizzes_page(query: str, limit: int, cursor: Optional[str] = None,
+                        difficulty: Optional[str] = None, focus_mode: Optional[str] = None
+                        ) -> Tuple[List[Dict], Optional[str]]:
+    """One page of full-text quiz search results, best match first, plus the next-page token"""
+    match = search.to_match_query(query)
+    if match is None:
+        return [], None
+    after = tuple(decode_cursor("search", cursor, (float, int))) if cursor else None
+    with get_db() as conn:
+        rows = search.search_quizzes(conn.cursor(), match, difficulty, focus_mode, after, limit + 1)
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor("search", [last['rank'], last['id']])
+    return rows[:limit], next_cursor
+
+def rebuild_search_index() -> None:
+    """Re-index all quizzes and questions for full-text search (recreating missing tables and triggers)"""
+    with transaction(immediate=True) as conn:
+        cursor = conn.cursor()
+        search.create_search_index(cursor)
+        search.rebuild_search_index(cursor)
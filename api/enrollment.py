@@ -0,0 +1,58 @@
+"""Group-commit enrollment engine for Learn.WA
+
+Concurrent enroll (and join-waitlist) requests are queued and applied by a
+single writer thread in batches: one BEGIN IMMEDIATE transaction and one commit per batch, with a
+savepoint per request so every caller still gets its own outcome.
+"""
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from database import transaction, savepoint, enroll_in_transaction, join_waitlist_in_transaction
+from group_commit import GroupCommitQueue
+
+
+class GroupCommitEnroller(GroupCommitQueue):
+    """Queue enroll requests and commit them together"""
+
+    name = "enrollment-writer"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats.update(enrolled=0, waitlisted=0, rejected=0)
+
+    def submit(self, class_id: int, student_name: str, waitlist: bool = False) -> Future:
+        """Queue an enrollment; the future resolves to the result dict or a ValueError
+
+        With ``waitlist`` a full class queues the student instead of rejecting them.
+        """
+        return super().submit((class_id, student_name, waitlist))
+
+    def enroll(self, class_id: int, student_name: str, waitlist: bool = False,
+               timeout: Optional[float] = None) -> Dict:
+        """Enroll and wait for the batch containing this request to commit"""
+        return self.submit(class_id, student_name, waitlist).result(timeout)
+
+    def _commit_batch(self, batch: List[Tuple[Tuple[int, str, bool], Future]]) -> None:
+        outcomes = []
+        with transaction(immediate=True) as conn:
+            cursor = conn.cursor()
+            for index, ((class_id, student_name, waitlist), future) in enumerate(batch):
+                apply = join_waitlist_in_transaction if waitlist else enroll_in_transaction
+                try:
+                    with savepoint(conn, f"enroll_{index}"):
+                        outcomes.append((future, apply(cursor, class_id, student_name)))
+                except ValueError as exc:
+                    outcomes.append((future, exc))
+
+        counts = {"enrolled": 0, "waitlisted": 0, "rejected": 0}
+        for future, outcome in outcomes:
+            if isinstance(outcome, Exception):
+                counts["rejected"] += 1
+                future.set_exception(outcome)
+            else:
+                counts[outcome.get("status", "enrolled")] += 1
+                future.set_result(outcome)
+        self._count(len(batch), **counts)
+
+
+enroller = GroupCommitEnroller()
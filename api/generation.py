@@ -0,0 +1,243 @@
+"""Cached, single-flight AI quiz generation for Learn.WA
+
+Generation requests are keyed on the normalized (topic, difficulty) of a
+``QuizRequest``. A result is served from memory (``ReadCache``), then from a
+JSON file cache on disk, and only then from the backend; concurrent
+identical misses share one in-flight backend call.
+
+Backends are plain callables ``QuizRequest -> GeneratedQuiz`` (or a dict of
+that shape). ``LocalQuizBackend`` is a deterministic stand-in for tests and
+development; install a real one with ``generator.set_backend``.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from cache import ReadCache
+from database import create_quizzes
+from quiz import GeneratedQuiz, GeneratedQuizUpload, QuizRequest, to_quiz_record
+
+CACHE_DIR = Path(__file__).parent / "quiz_cache"
+CACHE_TTL_SECONDS = 7 * 24 * 3600.0
+MEMORY_ENTRIES = 512
+DISK_ENTRIES = 10_000
+LATENCY_SAMPLES = 1024
+
+QuizBackend = Callable[[QuizRequest], Any]
+CacheKey = Tuple[str, str]
+
+
+def cache_key(request: QuizRequest) -> CacheKey:
+    """Case- and whitespace-insensitive key, so "Past  Tense" and "past tense" share a result"""
+    return " ".join(request.topic.split()).casefold(), request.difficulty
+
+
+class LocalQuizBackend:
+    """Deterministic offline generator: the same request always yields the same quiz"""
+
+    QUESTIONS = {"beginner": 5, "intermediate": 8, "advanced": 10}
+    MINUTES_PER_QUESTION = {"beginner": 1, "intermediate": 2, "advanced": 3}
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, request: QuizRequest) -> GeneratedQuiz:
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        topic = " ".join(request.topic.split())
+        rng = random.Random(hashlib.sha256(repr(cache_key(request)).encode()).digest())
+        count = self.QUESTIONS[request.difficulty]
+        questions = []
+        for number in range(1, count + 1):
+            options = [f"{topic} answer {number}.{letter}" for letter in "ABCD"]
+            questions.append({
+                "question": f"{topic}: question {number}",
+                "options": options,
+                "correctAnswer": rng.randrange(len(options)),
+                "explanation": f"Practice item {number} on {topic}.",
+                "difficulty": request.difficulty,
+            })
+        return GeneratedQuiz.model_validate({
+            "topic": topic,
+            "questions": questions,
+            "metadata": {"difficulty": request.difficulty,
+                         "estimatedTime": count * self.MINUTES_PER_QUESTION[request.difficulty]},
+        })
+
+
+class DiskCache:
+    """One JSON file per key with a TTL; the oldest files are evicted past ``max_entries``"""
+
+    def __init__(self, directory: Path, ttl: float = CACHE_TTL_SECONDS, max_entries: int = DISK_ENTRIES):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def _path(self, key: CacheKey) -> Path:
+        return self.directory / (hashlib.sha256(json.dumps(key).encode()).hexdigest() + ".json")
+
+    def get(self, key: CacheKey) -> Optional[Dict]:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != list(key) or entry.get("stored", 0) + self.ttl < time.time():
+            return None
+        return entry["quiz"]
+
+    def put(self, key: CacheKey, quiz: Dict) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"key": list(key), "stored": time.time(), "quiz": quiz}, f)
+        os.replace(tmp, path)  # readers never see a half-written file
+        self._evict()
+
+    def _evict(self) -> None:
+        with self._lock:
+            files = list(self.directory.glob("*.json"))
+            excess = len(files) - self.max_entries
+            if excess <= 0:
+                return
+            for path in sorted(files, key=lambda p: p.stat().st_mtime)[:excess]:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def clear(self) -> None:
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+
+def _percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+class QuizGenerator:
+    """Memory, then disk, then one coalesced backend call per distinct request"""
+
+    def __init__(self, backend: Optional[QuizBackend] = None, cache_dir: Path = CACHE_DIR,
+                 ttl: float = CACHE_TTL_SECONDS, memory_entries: int = MEMORY_ENTRIES,
+                 disk_entries: int = DISK_ENTRIES):
+        self.backend = backend or LocalQuizBackend()
+        self.memory = ReadCache(maxsize=memory_entries, ttl=ttl)
+        self.disk = DiskCache(cache_dir, ttl=ttl, max_entries=disk_entries)
+        self._inflight: Dict[CacheKey, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "memory_hits": 0, "disk_hits": 0, "backend_calls": 0,
+                       "coalesced": 0, "errors": 0}
+        self._latency = {"request": deque(maxlen=LATENCY_SAMPLES), "backend": deque(maxlen=LATENCY_SAMPLES)}
+
+    def set_backend(self, backend: QuizBackend) -> None:
+        """Swap the generation backend; cached results are kept"""
+        self.backend = backend
+
+    def generate(self, request: QuizRequest) -> Tuple[GeneratedQuiz, str]:
+        """The quiz for ``request`` and where it came from: "memory", "disk", "backend" or "coalesced" """
+        started = time.perf_counter()
+        key = cache_key(request)
+        source = []
+
+        def load() -> Dict:
+            quiz, origin = self._load(key, request)
+            source.append(origin)
+            return quiz
+
+        try:
+            quiz = self.memory.get_or_load(key, load, ())
+        finally:
+            self._record("request", time.perf_counter() - started)
+        origin = source[0] if source else "memory"
+        with self._lock:
+            self._stats["requests"] += 1
+            if origin == "memory":
+                self._stats["memory_hits"] += 1
+        return GeneratedQuiz.model_validate(quiz), origin
+
+    def generate_and_store(self, request: QuizRequest, title: Optional[str] = None,
+                           focus_mode: str = "comprehension") -> Tuple[Dict, str]:
+        """Generate (or reuse) a quiz and store it as a new quiz row, cache hits included"""
+        quiz, origin = self.generate(request)
+        upload = GeneratedQuizUpload(**quiz.model_dump(), title=title, focus_mode=focus_mode)
+        return create_quizzes([to_quiz_record(upload)])[0], origin
+
+    def _load(self, key: CacheKey, request: QuizRequest) -> Tuple[Dict, str]:
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            return future.result(), "coalesced"
+
+        try:
+            quiz, origin = self.disk.get(key), "disk"
+            if quiz is None:
+                quiz, origin = self._call_backend(request), "backend"
+                self.disk.put(key, quiz)
+            else:
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+            future.set_result(quiz)
+            return quiz, origin
+        except Exception as exc:
+            with self._lock:
+                self._stats["errors"] += 1
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _call_backend(self, request: QuizRequest) -> Dict:
+        started = time.perf_counter()
+        with self._lock:
+            self._stats["backend_calls"] += 1
+        try:
+            result = self.backend(request)
+        finally:
+            self._record("backend", time.perf_counter() - started)
+        if not isinstance(result, GeneratedQuiz):
+            result = GeneratedQuiz.model_validate(result)
+        return result.model_dump()
+
+    def _record(self, kind: str, seconds: float) -> None:
+        with self._lock:
+            self._latency[kind].append(seconds)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            latency = {kind: list(samples) for kind, samples in self._latency.items()}
+        hits = stats["memory_hits"] + stats["disk_hits"] + stats["coalesced"]
+        stats["hit_rate"] = round(hits / stats["requests"], 4) if stats["requests"] else 0.0
+        stats["in_flight"] = len(self._inflight)
+        for kind, samples in latency.items():
+            stats[f"{kind}_latency_ms"] = {
+                "avg": round(1000 * sum(samples) / len(samples), 3) if samples else 0.0,
+                "p50": round(1000 * _percentile(samples, 0.5), 3),
+                "p95": round(1000 * _percentile(samples, 0.95), 3),
+                "max": round(1000 * max(samples, default=0.0), 3),
+            }
+        stats["memory_cache"] = self.memory.stats()
+        return stats
+
+
+generator = QuizGenerator()
@@ -0,0 +1,205 @@
+"""Quiz attempt grading for Learn.WA
+
+A quiz's answer key is loaded once (and cached until the quiz changes), every
+submission is encoded as one row of chosen option indexes, and a whole batch
+is scored with a single array comparison: NumPy when it is installed, a
+pure-Python loop otherwise. Single submissions arriving concurrently are
+written with group commit.
+"""
+import json
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from database import cached_read, get_db, save_attempts, transaction
+from group_commit import GroupCommitQueue
+
+np = None  # bound by load_numpy() when the first answer key is built
+_numpy_checked = False
+
+UNANSWERED = -1
+_INEXACT = frozenset({bool, float})
+
+
+def load_numpy():
+    """NumPy if installed, else None; imported on first use since it doubles the API's import time"""
+    global np, _numpy_checked
+    if not _numpy_checked:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:  # pragma: no cover - optional speedup
+            pass
+        _numpy_checked = True
+    return np
+
+
+class AnswerKey:
+    """Correct option index per question of one quiz, in question id order"""
+
+    __slots__ = ("quiz_id", "question_ids", "correct", "_positions", "_options", "_codes", "_key")
+
+    def __init__(self, quiz_id: int, questions: List[Tuple[int, List[str], str]]):
+        self.quiz_id = quiz_id
+        self.question_ids = [question_id for question_id, _, _ in questions]
+        self._positions = {str(question_id): i for i, question_id in enumerate(self.question_ids)}
+        self._options = [{option: index for index, option in enumerate(options)} for _, options, _ in questions]
+        # A correct_answer that is not one of the options can never be matched
+        self.correct = [lookup.get(answer, -2) for lookup, (_, _, answer) in zip(self._options, questions)]
+        # Every accepted answer (index, option text or null) mapped to its code
+        self._codes = [{**lookup, **{index: index for index in lookup.values()}, None: UNANSWERED}
+                       for lookup in self._options]
+        self._key = np.array(self.correct, dtype=np.int16) if load_numpy() is not None else None
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    def _code(self, position: int, answer: Any) -> int:
+        if answer is None:
+            return UNANSWERED
+        if isinstance(answer, bool):
+            raise ValueError(f"Invalid answer for question {self.question_ids[position]}: {answer}")
+        if isinstance(answer, int):
+            if 0 <= answer < len(self._options[position]):
+                return answer
+            raise ValueError(f"Answer index out of range for question {self.question_ids[position]}: {answer}")
+        if isinstance(answer, str):
+            code = self._options[position].get(answer)
+            if code is None:
+                raise ValueError(f"Answer is not an option of question {self.question_ids[position]}: {answer}")
+            return code
+        raise ValueError(f"Invalid answer for question {self.question_ids[position]}: {answer!r}")
+
+    def encode(self, answers: Any) -> List[int]:
+        """Option index per question for a submission's ``answers``
+
+        ``answers`` is a list in question order or a ``{question_id: answer}``
+        dict; each answer is an option index, the option text, or null.
+        """
+        codes = [UNANSWERED] * len(self.question_ids)
+        if isinstance(answers, list):
+            if len(answers) > len(codes):
+                raise ValueError(f"Quiz has {len(codes)} questions, got {len(answers)} answers")
+            try:
+                fast = list(map(dict.get, self._codes, answers))
+            except TypeError:  # unhashable answer
+                fast = [None]
+            # A miss (None), or a bool/float that merely equals an index, needs the checked path
+            if None not in fast and _INEXACT.isdisjoint(map(type, answers)):
+                codes[:len(fast)] = fast
+                return codes
+            for position, answer in enumerate(answers):
+                codes[position] = self._code(position, answer)
+        elif isinstance(answers, dict):
+            for question_id, answer in answers.items():
+                position = self._positions.get(str(question_id))
+                if position is None:
+                    raise ValueError(f"Question {question_id} is not part of quiz {self.quiz_id}")
+                codes[position] = self._code(position, answer)
+        else:
+            raise ValueError("answers must be a list or an object keyed by question id")
+        return codes
+
+    def score(self, rows: List[List[int]]) -> Tuple[List[int], List[List[bool]]]:
+        """Scores and per-question correctness for encoded rows, in one pass"""
+        if not rows:
+            return [], []
+        if self._key is not None:
+            correct = np.array(rows, dtype=np.int16) == self._key
+            return correct.sum(axis=1).tolist(), correct.tolist()
+        key = self.correct
+        correct = [[code == expected for code, expected in zip(row, key)] for row in rows]
+        return [sum(row) for row in correct], correct
+
+
+@cached_read(lambda quiz_id: [("quiz", quiz_id)])
+def get_answer_key(quiz_id: int) -> Optional[AnswerKey]:
+    """Answer key for ``quiz_id``, or None if the quiz does not exist"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM quizzes WHERE id = ?", (quiz_id,))
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute("""
+            SELECT id, options, correct_answer
+            FROM questions WHERE quiz_id = ? ORDER BY id
+        """, (quiz_id,))
+        return AnswerKey(quiz_id, [(row[0], json.loads(row[1]), row[2]) for row in cursor])
+
+
+def grade_submissions(key: AnswerKey, submissions: List[Any]) -> Tuple[List[Dict], List[Dict]]:
+    """Grade a batch; returns (graded attempts for ``save_attempts``, [{index, error}])"""
+    rows, names, accepted, rejected = [], [], [], []
+    for index, submission in enumerate(submissions):
+        try:
+            if not isinstance(submission, dict):
+                raise ValueError("submission must be an object")
+            student_name = submission.get('student_name')
+            if student_name is not None and (not isinstance(student_name, str) or not student_name.strip()):
+                raise ValueError("student_name must be a non-empty string")
+            rows.append(key.encode(submission.get('answers', [])))
+            names.append(student_name.strip() if student_name else None)
+            accepted.append(index)
+        except ValueError as e:
+            rejected.append({"index": index, "error": str(e)})
+
+    scores, correct = key.score(rows)
+    graded = [
+        {"index": index, "student_name": name, "score": score, "correct": row_correct,
+         "answers": [None if code == UNANSWERED else code for code in row]}
+        for index, name, score, row_correct, row in zip(accepted, names, scores, correct, rows)
+    ]
+    return graded, rejected
+
+
+def _result(stored: Dict, graded: Dict) -> Dict:
+    result = dict(stored, index=graded['index'])
+    result['percentage'] = round(100 * stored['score'] / stored['total'], 2) if stored['total'] else 0.0
+    return result
+
+
+class AttemptWriter(GroupCommitQueue):
+    """Group-commit writes of single graded attempts"""
+
+    name = "attempt-writer"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats.update(attempts=0)
+
+    def submit(self, key: AnswerKey, graded: Dict) -> Future:
+        return super().submit((key, graded))
+
+    def _commit_batch(self, batch: List[Tuple[Tuple[AnswerKey, Dict], Future]]) -> None:
+        by_quiz: Dict[int, Tuple[AnswerKey, List[Tuple[Dict, Future]]]] = {}
+        for (key, graded), future in batch:
+            by_quiz.setdefault(key.quiz_id, (key, []))[1].append((graded, future))
+
+        outcomes = []
+        with transaction(immediate=True):
+            for key, items in by_quiz.values():
+                stored = save_attempts(key.quiz_id, key.question_ids, [graded for graded, _ in items])
+                outcomes.extend((future, _result(row, graded)) for row, (graded, future) in zip(stored, items))
+
+        for future, result in outcomes:
+            future.set_result(result)
+        self._count(len(batch), attempts=len(outcomes))
+
+
+attempt_writer = AttemptWriter()
+
+
+def submit_attempts(quiz_id: int, submissions: List[Any]) -> Optional[Tuple[List[Dict], List[Dict]]]:
+    """Grade and store a batch of submissions; None if the quiz does not exist
+
+    A single submission goes through the group-commit writer so concurrent
+    callers share a transaction; a batch is written in its own transaction.
+    Returns (stored attempts, [{index, error}]).
+    """
+    key = get_answer_key(quiz_id)
+    if key is None:
+        return None
+    graded, rejected = grade_submissions(key, submissions)
+    if len(graded) == 1 and len(submissions) == 1:
+        return [attempt_writer.submit(key, graded[0]).result()], rejected
+    stored = save_attempts(quiz_id, key.question_ids, graded)
+    return [_result(row, g) for row, g in zip(stored, graded)], rejected
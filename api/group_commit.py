@@ -0,0 +1,135 @@
+"""Group commit for Learn.WA write paths
+
+Concurrent requests are queued and applied by a single writer thread in
+batches, so a burst of N writes costs one BEGIN IMMEDIATE and one commit
+instead of N. Subclasses implement ``_commit_batch`` and resolve each
+request's future with its own outcome.
+
+Each database (tenant shard) gets its own queue and writer thread, started
+on its first write and stopped after a while without any, so shards never
+wait on each other's write locks.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import database
+
+MAX_BATCH = 256
+MAX_WAIT_SECONDS = 0.002
+LANE_IDLE_SECONDS = 60.0
+
+_Request = Tuple[Any, Future]
+
+
+class _Lane:
+    """Queue and writer thread for one database"""
+
+    __slots__ = ("queue", "thread")
+
+    def __init__(self):
+        self.queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self.thread: Optional[threading.Thread] = None
+
+
+class GroupCommitQueue:
+    """Queue write requests and hand them to ``_commit_batch`` together"""
+
+    name = "group-commit-writer"
+
+    def __init__(self, max_batch: int = MAX_BATCH, max_wait: float = MAX_WAIT_SECONDS,
+                 idle_timeout: float = LANE_IDLE_SECONDS):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.idle_timeout = idle_timeout
+        self._lanes: Dict[str, _Lane] = {}
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "requests": 0, "largest_batch": 0}
+
+    def submit(self, item: Any) -> Future:
+        """Queue ``item`` for the calling thread's database; resolves once its batch has committed"""
+        path = database.current_path()
+        future: Future = Future()
+        with self._lock:
+            lane = self._lanes.get(path)
+            if lane is None:
+                lane = self._lanes[path] = _Lane()
+                lane.thread = threading.Thread(target=self._run, args=(path, lane),
+                                               name=f"{self.name}:{path}", daemon=True)
+                lane.thread.start()
+            # Under the lock, so an idle writer cannot retire between lookup and put
+            lane.queue.put((item, future))
+        return future
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            lanes = list(self._lanes.values())
+        stats["pending"] = sum(lane.queue.qsize() for lane in lanes)
+        stats["lanes"] = len(lanes)
+        stats["avg_batch"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0
+        return stats
+
+    def close(self) -> None:
+        """Drain outstanding requests and stop every writer thread"""
+        with self._lock:
+            lanes, self._lanes = list(self._lanes.values()), {}
+            for lane in lanes:
+                lane.queue.put(None)
+        for lane in lanes:
+            lane.thread.join()
+
+    def _count(self, batch_size: int, **counters: int) -> None:
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["requests"] += batch_size
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], batch_size)
+            for key, value in counters.items():
+                self._stats[key] = self._stats.get(key, 0) + value
+
+    def _next(self, path: str, lane: _Lane) -> Optional[_Request]:
+        """Block for the next request; None to stop (closed, or idle and retired)"""
+        while True:
+            try:
+                return lane.queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    if lane.queue.empty():
+                        if self._lanes.get(path) is lane:
+                            del self._lanes[path]
+                        return None
+
+    def _run(self, path: str, lane: _Lane) -> None:
+        with database.use_database(path):
+            while True:
+                item = self._next(path, lane)
+                if item is None:
+                    return
+                batch = [item]
+                stop = False
+                # One deadline from the first request, so a steady trickle cannot hold the batch open
+                deadline = time.monotonic() + self.max_wait
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = lane.queue.get(timeout=remaining) if remaining > 0 else lane.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                try:
+                    self._commit_batch(batch)
+                except Exception as exc:  # pylint: disable=broad-except
+                    # The commit itself failed: nothing in this batch was written
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(exc)
+                if stop:
+                    return
+
+    def _commit_batch(self, batch: List[_Request]) -> None:
+        raise NotImplementedError
@@ -0,0 +1,187 @@
+"""In-process metrics for Learn.WA, rendered in the Prometheus text format
+
+Counters and fixed-bucket histograms are plain dicts keyed by label values
+behind one lock, so recording a sample costs a few dictionary updates and
+the instrumentation can stay on in production. No client library needed.
+"""
+import bisect
+import sys
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; covers sub-millisecond SQLite statements up to slow HTTP requests
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_SERIES = 1000  # per metric; further label combinations are folded into "other"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, series: Dict, labels: Labels) -> Labels:
+        if labels in series or len(series) < MAX_SERIES:
+            return labels
+        return ("other",) * len(self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic total per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        with self._lock:
+            key = self._key(self._values, labels)
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}"
+                for labels, value in items]
+
+
+class Collected(_Metric):
+    """Values read from ``collect`` whenever metrics are rendered (e.g. pool counters)"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[Labels, float]]], kind: str = "gauge"):
+        super().__init__(name, help_text, label_names)
+        self.kind = kind
+        self._collect = collect
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}"
+                for labels, value in self._collect()]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with a running sum and count per label combination"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._key(self._series, labels)
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, labels: Labels = ()) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, (list(counts), total, count))
+                           for labels, (counts, total, count) in self._series.items())
+        lines = []
+        for labels, (counts, total, count) in items:
+            running = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                running += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {running}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {total!r}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Registry:
+    """Named metrics rendered together by ``GET /api/metrics``"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def collected(self, name: str, help_text: str, label_names: Sequence[str],
+                  collect: Callable[[], Iterable[Tuple[Labels, float]]], kind: str = "gauge") -> Collected:
+        return self._register(Collected(name, help_text, label_names, collect, kind))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"Metric {metric.name} failed to render: {exc}", file=sys.stderr)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "learnwa_http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+http_errors = registry.counter(
+    "learnwa_http_errors_total", "HTTP requests that returned a 5xx status", ("route", "method"))
+http_latency = registry.histogram(
+    "learnwa_http_request_duration_seconds", "HTTP request latency", ("route", "method"))
+
+db_queries = registry.histogram(
+    "learnwa_db_query_duration_seconds", "SQLite statement execution time (execute/executemany)", ("statement",))
+db_fetch_seconds = registry.counter(
+    "learnwa_db_fetch_seconds_total", "Time spent fetching result rows", ("statement",))
+db_rows = registry.counter(
+    "learnwa_db_rows_total", "Rows returned by fetchone/fetchmany/fetchall, or changed by writes", ("statement",))
+db_slow_queries = registry.counter(
+    "learnwa_db_slow_queries_total", "Statements slower than the slow-query threshold", ("statement",))
@@ -0,0 +1,145 @@
+"""On-demand sampling profiler for live Learn.WA requests
+
+Selected requests (a random fraction, the next N requests to a route, or any
+request carrying the admin profile header) register their thread while they
+run. A background thread samples those threads' Python stacks every few
+milliseconds and aggregates them per route as collapsed stacks, the
+``frame;frame;frame count`` format read by flamegraph.pl and speedscope.
+Nothing is sampled while no profiled request is in flight.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SAMPLE_INTERVAL_SECONDS = 0.005
+MAX_STACK_DEPTH = 128
+MAX_STACKS_PER_ROUTE = 10_000
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse(frame, root: str) -> str:
+    """``root;outermost;...;innermost`` for a thread's current frame"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(root)
+    return ";".join(reversed(labels))
+
+
+class RequestProfiler:
+    """Decides which requests to profile and aggregates their sampled stacks"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.sample_rate = 0.0
+        self._armed: Dict[str, int] = {}
+        self._active: Dict[int, str] = {}  # thread id -> route
+        self._stacks: Dict[str, Counter] = {}
+        self._requests: Counter = Counter()
+        self._samples: Counter = Counter()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def arm(self, route: str, count: int) -> None:
+        """Profile the next ``count`` requests to ``route`` (a Flask rule like /api/classes/<int:class_id>)"""
+        with self._lock:
+            if count > 0:
+                self._armed[route] = count
+            else:
+                self._armed.pop(route, None)
+
+    def should_profile(self, route: str, forced: bool = False) -> bool:
+        if forced:
+            return True
+        with self._lock:
+            remaining = self._armed.get(route)
+            if remaining:
+                if remaining == 1:
+                    del self._armed[route]
+                else:
+                    self._armed[route] = remaining - 1
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, route: str) -> None:
+        """Begin sampling the calling thread for ``route``"""
+        with self._lock:
+            self._active[threading.get_ident()] = route
+            self._requests[route] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                active = dict(self._active)
+            frames = sys._current_frames()
+            stacks = [(route, collapse(frames[ident], route)) for ident, route in active.items() if ident in frames]
+            with self._lock:
+                for route, stack in stacks:
+                    counter = self._stacks.setdefault(route, Counter())
+                    if stack in counter or len(counter) < MAX_STACKS_PER_ROUTE:
+                        counter[stack] += 1
+                    self._samples[route] += 1
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "interval_ms": self.interval * 1000,
+                "armed": dict(self._armed),
+                "in_flight": len(self._active),
+                "routes": {route: {"requests": self._requests[route], "samples": self._samples[route],
+                                   "stacks": len(self._stacks.get(route, ()))}
+                           for route in sorted(self._requests)},
+            }
+
+    def collapsed(self, route: Optional[str] = None) -> str:
+        """Collapsed stacks for one route, or every route, heaviest first"""
+        with self._lock:
+            counters = [self._stacks.get(route, Counter())] if route else list(self._stacks.values())
+            lines = [f"{stack} {count}" for counter in counters for stack, count in counter.most_common()]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def dump(self, directory: Path) -> List[str]:
+        """Write one ``<route>.collapsed`` file per profiled route; returns the paths"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            routes = list(self._stacks)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        paths = []
+        for route in routes:
+            name = "".join(c if c.isalnum() else "_" for c in route).strip("_") or "root"
+            path = directory / f"{stamp}-{name}.collapsed"
+            path.write_text(self.collapsed(route), encoding="utf-8")
+            paths.append(str(path))
+        return paths
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self._requests.clear()
+            self._samples.clear()
+
+
+profiler = RequestProfiler()
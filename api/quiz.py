@@ -1,11 +1,14 @@
-
-from pydantic import BaseModel, Field
-from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, model_validator
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 
 class QuizRequest(BaseModel):
     topic: str
     difficulty: Literal["beginner", "intermediate", "advanced"] = "intermediate"
 
+class QuizGenerationRequest(QuizRequest):
+    title: Optional[str] = None
+    focus_mode: str = "comprehension"
+
 class QuizQuestion(BaseModel):
     question: str
     options: List[str]
@@ -13,6 +16,12 @@ class QuizQuestion(BaseModel):
     explanation: str
     difficulty: Literal["beginner", "intermediate", "advanced"]
 
+    @model_validator(mode="after")
+    def check_answer_index(self):
+        if self.correctAnswer >= len(self.options):
+            raise ValueError("correctAnswer must index one of the options")
+        return self
+
 class GeneratedQuizMetadata(BaseModel):
     difficulty: str
     estimatedTime: int # in minutes
@@ -21,3 +30,63 @@ class GeneratedQuiz(BaseModel):
     topic: str
     questions: List[QuizQuestion]
     metadata: GeneratedQuizMetadata
+
+# Persistence payloads: POST /api/quizzes shape, or an AI-generated quiz with optional title
+class StoredQuestion(BaseModel):
+    question: str
+    options: List[str]
+    correct_answer: str
+    explanation: str = ""
+
+class QuizCreate(BaseModel):
+    title: str
+    topic: str = ""
+    difficulty: str = "intermediate"
+    focus_mode: str = "comprehension"
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    questions: List[StoredQuestion]
+
+class GeneratedQuizUpload(GeneratedQuiz):
+    title: Optional[str] = None
+    focus_mode: str = "comprehension"
+
+QuizPayload = Union[QuizCreate, GeneratedQuizUpload]
+
+# Compiled once; validating a whole list runs in a single pydantic-core call
+quiz_payload_adapter = TypeAdapter(QuizPayload)
+quiz_batch_adapter = TypeAdapter(List[QuizPayload])
+
+def to_quiz_record(quiz: QuizPayload) -> Dict[str, Any]:
+    """Normalize a validated payload to the dict ``database.create_quizzes`` stores"""
+    if isinstance(quiz, QuizCreate):
+        return quiz.model_dump()
+    return {
+        "title": quiz.title or f"{quiz.topic} Quiz",
+        "topic": quiz.topic,
+        "difficulty": quiz.metadata.difficulty,
+        "focus_mode": quiz.focus_mode,
+        "metadata": quiz.metadata.model_dump(),
+        "questions": [
+            {"question": q.question, "options": q.options,
+             "correct_answer": q.options[q.correctAnswer], "explanation": q.explanation}
+            for q in quiz.questions
+        ],
+    }
+
+def validate_quiz_batch(payloads: List[Any]) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """Validate many quiz payloads; returns ([(index, record)], [{index, error}])"""
+    try:
+        quizzes = quiz_batch_adapter.validate_python(payloads)
+        return [(i, to_quiz_record(q)) for i, q in enumerate(quizzes)], []
+    except ValidationError:
+        pass
+    # Slow path only when something is invalid: find out which items
+    valid, rejected = [], []
+    for index, payload in enumerate(payloads):
+        try:
+            valid.append((index, to_quiz_record(quiz_payload_adapter.validate_python(payload))))
+        except ValidationError as e:
+            rejected.append({"index": index, "error": "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()
+            )})
+    return valid, rejected
@@ -0,0 +1,107 @@
+"""JSON encoding and response compression for the Learn.WA API
+
+``FastJSONProvider`` serializes with orjson when it is installed (about
+5-10x faster than the standard library on row lists) and falls back to
+Flask's encoder otherwise; either way keys keep their insertion order
+instead of being sorted. ``compress`` gzips (or, with the ``brotli``
+package, brotli-encodes) JSON bodies for clients that accept it; streamed
+bodies are always gzipped.
+"""
+import gzip
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/plain")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson where available"""
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._orjson(obj).decode()
+
+    def response(self, *args, **kwargs) -> Response:
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        # Straight to bytes: no str round trip
+        return self._app.response_class(self._orjson(self._prepare_response_obj(args, kwargs)) + b"\n",
+                                        mimetype=self.mimetype)
+
+    def _orjson(self, obj) -> bytes:
+        # Datetimes go through Flask's default (HTTP dates), as with the stdlib encoder
+        return orjson.dumps(obj, default=self.default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+def choose_encoding(accept_encoding) -> Optional[str]:
+    """Best content coding this server can produce for an Accept-Encoding header"""
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+
+def _gzip_stream(chunks: Iterable) -> Iterator[bytes]:
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        # Closing the body must still close the wrapped generator (and its database scope)
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress(response: Response, accept_encoding) -> Response:
+    """Compress a response body in place if it is worth it and the client accepts it
+
+    Streamed bodies are gzipped as they are generated; compressed output is
+    emitted whenever zlib has a block ready rather than once per row.
+    """
+    if (response.direct_passthrough or response.status_code != 200
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        if not accept_encoding['gzip']:
+            return response
+        response.response = _gzip_stream(response.response)
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers.pop('Content-Length', None)
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+    if encoding == 'br':
+        response.set_data(brotli.compress(body, quality=BROTLI_QUALITY))
+    else:
+        response.set_data(gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0))
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,305 @@
+"""Teacher schedule index and conflict detection for Learn.WA
+
+Keeps, per (teacher, weekday), the class time slots as minute intervals sorted
+by start time, so checking a new slot against a teacher's existing classes is
+a binary search instead of a scan over every class.
+
+The index remembers which value of the "schedule" change counter (see
+``database.change_counter``) it reflects. This process's own class writes
+advance it in step; any other difference means another process changed the
+schedule, and the index is reloaded before it is next used.
+"""
+import heapq
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import database
+from database import (
+    WEEKDAYS, add_write_listener, on_rollback, get_db, mask_to_days, time_to_minutes
+)
+
+_WEEKDAY_INDEX = {day: index for index, day in enumerate(WEEKDAYS)}
+
+# (start_minute, end_minute, class_id, name)
+Slot = Tuple[int, int, int, str]
+
+
+class ScheduleConflict(ValueError):
+    """Raised when a class would double-book a teacher"""
+
+    def __init__(self, conflicts: List[Dict]):
+        self.conflicts = conflicts
+        first = conflicts[0]
+        # class_id 0 marks a row from the same, not yet inserted, batch
+        where = f"(class {first['class_id']})" if first['class_id'] else "(earlier in this batch)"
+        super().__init__(
+            f"Schedule conflict: {first['teacher']} already teaches '{first['name']}' {where} "
+            f"on {first['day']} {first['start_time']}-{first['end_time']}"
+        )
+
+
+def format_minutes(value: int) -> str:
+    return f"{value // 60:02d}:{value % 60:02d}"
+
+
+class _Bucket:
+    """Slots for one (teacher, weekday), sorted by start with a running max of ends"""
+
+    __slots__ = ("starts", "slots", "max_end")
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.slots: List[Slot] = []
+        self.max_end: List[int] = []
+
+    def add(self, slot: Slot) -> None:
+        i = bisect_right(self.slots, slot)
+        self.slots.insert(i, slot)
+        self.starts.insert(i, slot[0])
+        self.max_end.insert(i, max(self.max_end[i - 1] if i else -1, slot[1]))
+        # Later running maxima only grow, and stop changing once they already reach this end
+        for j in range(i + 1, len(self.max_end)):
+            if self.max_end[j] >= slot[1]:
+                break
+            self.max_end[j] = slot[1]
+
+    def remove(self, class_id: int) -> None:
+        i = next((i for i, slot in enumerate(self.slots) if slot[2] == class_id), None)
+        if i is None:
+            return
+        rest = [slot for slot in self.slots[i:] if slot[2] != class_id]
+        self.slots[i:] = rest
+        self.starts[i:] = [slot[0] for slot in rest]
+        running = self.max_end[i - 1] if i else -1
+        del self.max_end[i:]
+        for slot in rest:
+            running = max(running, slot[1])
+            self.max_end.append(running)
+
+    def _reindex(self) -> None:
+        self.starts = [slot[0] for slot in self.slots]
+        running = -1
+        self.max_end = []
+        for slot in self.slots:
+            running = max(running, slot[1])
+            self.max_end.append(running)
+
+    def overlapping(self, start: int, end: int) -> List[Slot]:
+        """Slots intersecting [start, end): O(log n) when there are none"""
+        i = bisect_left(self.starts, end)
+        found = []
+        # Walk back only while some earlier slot can still reach past ``start``
+        while i > 0 and self.max_end[i - 1] > start:
+            i -= 1
+            if self.slots[i][1] > start:
+                found.append(self.slots[i])
+        return found
+
+
+class ScheduleIndex:
+    """Per-(teacher, weekday) interval index over the classes table"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._buckets: Dict[Tuple[str, int], _Bucket] = {}
+        self._size = 0
+        self.version: Optional[int] = None  # "schedule" change counter reflected; None: unknown
+
+    def __len__(self) -> int:
+        return self._size
+
+    def load(self, rows: Iterable[Tuple[int, str, str, List[str], int, int]],
+             version: Optional[int] = None) -> None:
+        """Replace the index contents with (id, name, teacher, days, start, end) rows as of ``version``"""
+        buckets: Dict[Tuple[str, int], List[Slot]] = {}
+        size = 0
+        for class_id, name, teacher, days, start, end in rows:
+            for day in days:
+                buckets.setdefault((teacher, _WEEKDAY_INDEX[day]), []).append((start, end, class_id, name))
+            size += 1
+        with self.lock:
+            self._buckets = {}
+            for key, slots in buckets.items():
+                bucket = _Bucket()
+                bucket.slots = sorted(slots)
+                bucket._reindex()
+                self._buckets[key] = bucket
+            self._size = size
+            self.version = version
+
+    def add(self, class_id: int, name: str, teacher: str, days: List[str], start: int, end: int) -> None:
+        with self.lock:
+            for day in days:
+                self._buckets.setdefault((teacher, _WEEKDAY_INDEX[day]), _Bucket()).add((start, end, class_id, name))
+            self._size += 1
+
+    def remove(self, class_id: int, teacher: str, days: List[str]) -> None:
+        with self.lock:
+            for day in days:
+                bucket = self._buckets.get((teacher, _WEEKDAY_INDEX[day]))
+                if bucket:
+                    bucket.remove(class_id)
+            self._size -= 1
+
+    def find_conflicts(self, teacher: str, days: List[str], start: int, end: int) -> List[Dict]:
+        """Existing classes this teacher has on any of ``days`` overlapping [start, end)"""
+        conflicts = []
+        with self.lock:
+            for day in days:
+                bucket = self._buckets.get((teacher, _WEEKDAY_INDEX[day]))
+                if bucket is None:
+                    continue
+                for slot_start, slot_end, class_id, name in bucket.overlapping(start, end):
+                    conflicts.append({
+                        "teacher": teacher, "day": day, "class_id": class_id, "name": name,
+                        "start_time": format_minutes(slot_start), "end_time": format_minutes(slot_end)
+                    })
+        return conflicts
+
+    def all_conflicts(self, teacher: Optional[str] = None) -> List[Dict]:
+        """Every overlapping pair of classes, found with one sweep per bucket"""
+        with self.lock:
+            items = [(key, list(bucket.slots)) for key, bucket in self._buckets.items()
+                     if teacher is None or key[0] == teacher]
+        conflicts = []
+        for (bucket_teacher, weekday), slots in sorted(items):
+            active: List[Tuple[int, Slot]] = []  # min-heap on end
+            for slot in slots:
+                start = slot[0]
+                while active and active[0][0] <= start:
+                    heapq.heappop(active)
+                for _, other in active:
+                    conflicts.append({
+                        "teacher": bucket_teacher,
+                        "day": WEEKDAYS[weekday],
+                        "start": format_minutes(start),
+                        "end": format_minutes(min(slot[1], other[1])),
+                        "classes": [
+                            {"id": other[2], "name": other[3],
+                             "start_time": format_minutes(other[0]), "end_time": format_minutes(other[1])},
+                            {"id": slot[2], "name": slot[3],
+                             "start_time": format_minutes(slot[0]), "end_time": format_minutes(slot[1])},
+                        ]
+                    })
+                heapq.heappush(active, (slot[1], slot))
+        return conflicts
+
+
+_indexes: Dict[str, ScheduleIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _load(index: ScheduleIndex) -> None:
+    with get_db() as conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN")  # the rows and the counter from one snapshot
+        version = database.change_counter("schedule")
+        rows = conn.execute("SELECT id, name, teacher, day_mask, start_minute, end_minute FROM classes")
+        index.load(((row['id'], row['name'], row['teacher'], mask_to_days(row['day_mask']),
+                     row['start_minute'], row['end_minute']) for row in rows), version)
+
+
+def _sync(index: ScheduleIndex) -> None:
+    """Reload ``index`` if the schedule changed outside this process's own writes"""
+    if database.change_counter("schedule") != index.version:
+        _load(index)
+
+
+def get_schedule_index() -> ScheduleIndex:
+    """Index for the current database, built on first use and reloaded after writes from elsewhere"""
+    path = database.get_pool().path
+    index = _indexes.get(path)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(path)
+            if index is None:
+                index = ScheduleIndex()
+                _load(index)
+                _indexes[path] = index
+                return index
+    _sync(index)
+    return index
+
+
+def rebuild_schedule_index() -> ScheduleIndex:
+    """Reload the current database's index unconditionally"""
+    index = get_schedule_index()
+    _load(index)
+    return index
+
+
+def _on_write(event: str, rows: List[Dict]) -> None:
+    if event not in ("classes_created", "classes_archived"):
+        return
+    index = _indexes.get(database.get_pool().path)
+    if index is None:
+        return  # not built yet; the first load will read these rows
+    # The triggers count one change per row; if the index was current before
+    # these rows, it is current again once they are applied and committed
+    version = database.change_counter("schedule")
+    expected = version - len(rows)
+
+    def advance():
+        with index.lock:
+            index.version = version if index.version == expected else None
+
+    database.after_commit(advance)
+    for row in rows:
+        if event == "classes_created":
+            index.add(row['id'], row['name'], row['teacher'], row['days'],
+                      time_to_minutes(row['start_time']), time_to_minutes(row['end_time']))
+            on_rollback(lambda row=row: index.remove(row['id'], row['teacher'], row['days']))
+        else:
+            # Archived classes are over; they stop blocking the slot once the move commits.
+            # Deferred so the index lock is never awaited while holding the write lock.
+            database.after_commit(lambda row=row: index.remove(row['id'], row['teacher'], row['days']))
+
+
+add_write_listener(_on_write)
+
+
+def check_class(class_row: Dict, index: Optional[ScheduleIndex] = None) -> None:
+    """Raise ScheduleConflict if ``class_row`` overlaps one of its teacher's classes"""
+    if index is None:  # not ``or``: an empty index is falsy
+        index = get_schedule_index()
+    conflicts = index.find_conflicts(
+        class_row['teacher'], class_row['days'],
+        time_to_minutes(class_row['start_time']), time_to_minutes(class_row['end_time'])
+    )
+    if conflicts:
+        raise ScheduleConflict(conflicts)
+
+
+def create_class(class_row: Dict) -> int:
+    """database.create_class, rejecting rows that double-book the teacher
+
+    The check runs under the SQLite write lock, which serializes it with every
+    other class write; the index lock is only taken inside that, never around it.
+    Callers may wrap this in their own transaction only if it has not written
+    yet or was opened with ``immediate=True`` (see ``database.transaction``).
+    """
+    with database.transaction(immediate=True):
+        check_class(class_row, get_schedule_index())
+        return database.create_class(class_row)
+
+
+def create_classes(class_specs: Iterable[Dict], validate: Callable[[Dict], Dict],
+                   chunk_size: Optional[int] = None):
+    """database.create_classes with conflict checks, including within the batch
+
+    Rows are checked against the index inside each chunk's write transaction
+    (see ``create_class``); no lock is held between chunks. Only rows that
+    pass both checks join the batch, so a rejected row never blocks later ones.
+    """
+    index = get_schedule_index()
+    pending = ScheduleIndex()
+
+    def check(class_row: Dict) -> None:
+        _sync(index)  # under this chunk's write lock
+        check_class(class_row, index)
+        check_class(class_row, pending)
+        pending.add(0, class_row['name'], class_row['teacher'], class_row['days'],
+                    time_to_minutes(class_row['start_time']), time_to_minutes(class_row['end_time']))
+
+    return database.create_classes(class_specs, validate=validate, chunk_size=chunk_size, check=check)
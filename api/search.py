@@ -0,0 +1,189 @@
+"""Full-text quiz search for Learn.WA
+
+Two external-content FTS5 indexes, one over quiz titles/topics and one over
+question text/explanations, are kept in sync with their tables by triggers.
+A search ranks quizzes by their best hit in either index (bm25, title hits
+weighted highest) and only builds highlighted snippets for the page it
+returns. Snippets are HTML: the stored text is escaped and matches are
+wrapped in ``<mark>`` tags.
+
+Pages are keyed on (bm25 rank, quiz id). bm25 depends on corpus-wide term
+statistics, so a quiz written between two page requests shifts ranks and
+can make a result repeat or be skipped across the page boundary; clients
+needing an exact listing should page a quiet index or de-duplicate by id.
+
+Functions here take an open cursor; ``database`` owns the connections.
+"""
+import html
+import re
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+SNIPPET_TOKENS = 12
+HIGHLIGHT = ("<mark>", "</mark>")
+# Private-use characters mark matches until the text around them is escaped
+_SENTINELS = ("\ue000", "\ue001")
+
+_WORD = re.compile(r"\w+\*?")
+
+_SCHEMA = {
+    "quiz_fts": """
+        CREATE VIRTUAL TABLE IF NOT EXISTS quiz_fts USING fts5(
+            title, topic, content='quizzes', content_rowid='id', tokenize='porter unicode61'
+        )
+    """,
+    "question_fts": """
+        CREATE VIRTUAL TABLE IF NOT EXISTS question_fts USING fts5(
+            text, explanation, content='questions', content_rowid='id', tokenize='porter unicode61'
+        )
+    """,
+}
+
+_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS quizzes_fts_insert AFTER INSERT ON quizzes BEGIN
+        INSERT INTO quiz_fts (rowid, title, topic) VALUES (new.id, new.title, new.topic);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quizzes_fts_delete AFTER DELETE ON quizzes BEGIN
+        INSERT INTO quiz_fts (quiz_fts, rowid, title, topic) VALUES ('delete', old.id, old.title, old.topic);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS quizzes_fts_update AFTER UPDATE OF title, topic ON quizzes BEGIN
+        INSERT INTO quiz_fts (quiz_fts, rowid, title, topic) VALUES ('delete', old.id, old.title, old.topic);
+        INSERT INTO quiz_fts (rowid, title, topic) VALUES (new.id, new.title, new.topic);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions BEGIN
+        INSERT INTO question_fts (rowid, text, explanation) VALUES (new.id, new.text, new.explanation);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions BEGIN
+        INSERT INTO question_fts (question_fts, rowid, text, explanation)
+        VALUES ('delete', old.id, old.text, old.explanation);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS questions_fts_update AFTER UPDATE OF text, explanation ON questions BEGIN
+        INSERT INTO question_fts (question_fts, rowid, text, explanation)
+        VALUES ('delete', old.id, old.text, old.explanation);
+        INSERT INTO question_fts (rowid, text, explanation) VALUES (new.id, new.text, new.explanation);
+    END
+    """,
+]
+
+
+def create_search_index(cursor: sqlite3.Cursor) -> None:
+    """Create the FTS indexes and sync triggers, indexing existing rows if new"""
+    for name, ddl in _SCHEMA.items():
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+        missing = cursor.fetchone() is None
+        cursor.execute(ddl)
+        if missing:
+            cursor.execute(f"INSERT INTO {name} ({name}) VALUES ('rebuild')")
+    for ddl in _TRIGGERS:
+        cursor.execute(ddl)
+
+
+def rebuild_search_index(cursor: sqlite3.Cursor) -> None:
+    """Re-index every quiz and question, then merge the index segments"""
+    for name in _SCHEMA:
+        cursor.execute(f"INSERT INTO {name} ({name}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {name} ({name}) VALUES ('optimize')")
+
+
+def to_match_query(text: str) -> Optional[str]:
+    """Turn free text into an FTS5 query: every word must match, ``word*`` is a prefix
+
+    Words are quoted, so user input can never be parsed as FTS5 syntax.
+    Returns None when there is nothing to search for.
+    """
+    terms = []
+    for word in _WORD.findall(text):
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    return " ".join(terms) or None
+
+
+def search_quizzes(cursor: sqlite3.Cursor, match: str, difficulty: Optional[str] = None,
+                   focus_mode: Optional[str] = None, after: Optional[Tuple[float, int]] = None,
+                   limit: int = 20) -> List[Dict]:
+    """Quizzes matching ``match`` (an FTS5 query), best first
+
+    ``after`` is the (rank, id) of the last result of the previous page.
+    Each result carries the rank and a highlighted snippet of its best hit.
+    """
+    filters, params = [], [match, match]
+    if difficulty:
+        filters.append("q.difficulty = ?")
+        params.append(difficulty)
+    if focus_mode:
+        filters.append("q.focus_mode = ?")
+        params.append(focus_mode)
+    if after is not None:
+        filters.append("(best.rank, best.quiz_id) > (?, ?)")
+        params.extend(after)
+    params.append(limit)
+
+    cursor.execute(f"""
+        WITH hits AS (
+            SELECT rowid AS quiz_id, bm25(quiz_fts, 10.0, 5.0) AS rank, 'quiz' AS source, rowid AS hit_id
+            FROM quiz_fts WHERE quiz_fts MATCH ?
+            UNION ALL
+            SELECT qu.quiz_id, bm25(question_fts, 1.0, 0.5), 'question', question_fts.rowid
+            FROM question_fts JOIN questions qu ON qu.id = question_fts.rowid
+            WHERE question_fts MATCH ?
+        ),
+        best AS (
+            -- SQLite returns source/hit_id from the row holding MIN(rank)
+            SELECT quiz_id, MIN(rank) AS rank, source, hit_id FROM hits GROUP BY quiz_id
+        )
+        SELECT q.id, q.title, q.topic, q.difficulty, q.focus_mode, q.created_at,
+               COALESCE(s.question_count, 0) AS question_count,
+               best.rank, best.source, best.hit_id
+        FROM best
+        JOIN quizzes q ON q.id = best.quiz_id
+        LEFT JOIN quiz_stats s ON s.quiz_id = q.id
+        {"WHERE " + " AND ".join(filters) if filters else ""}
+        ORDER BY best.rank, best.quiz_id
+        LIMIT ?
+    """, params)
+    rows = [dict(row) for row in cursor.fetchall()]
+
+    snippets = _snippets(cursor, match, rows)
+    for row in rows:
+        source, hit_id = row.pop('source'), row.pop('hit_id')
+        row['matched'] = source
+        if source == 'question':
+            row['question_id'] = hit_id
+        row['snippet'] = snippets.get((source, hit_id), "")
+    return rows
+
+
+def _snippets(cursor: sqlite3.Cursor, match: str, rows: List[Dict]) -> Dict[Tuple[str, int], str]:
+    """Highlighted snippets for just the hits on this page"""
+    snippets = {}
+    for source, table in (("quiz", "quiz_fts"), ("question", "question_fts")):
+        ids = [row['hit_id'] for row in rows if row['source'] == source]
+        if not ids:
+            continue
+        cursor.execute(f"""
+            SELECT rowid, snippet({table}, -1, ?, ?, '…', {SNIPPET_TOKENS})
+            FROM {table} WHERE {table} MATCH ? AND rowid IN ({', '.join('?' * len(ids))})
+        """, (*_SENTINELS, match, *ids))
+        snippets.update(((source, rowid), _highlight(text)) for rowid, text in cursor.fetchall())
+    return snippets
+
+
+def _highlight(text: Optional[str]) -> str:
+    """HTML-escape snippet text, then turn the match sentinels into HIGHLIGHT tags"""
+    escaped = html.escape(text or "")
+    for sentinel, tag in zip(_SENTINELS, HIGHLIGHT):
+        escaped = escaped.replace(sentinel, tag)
+    return escaped
@@ -3,27 +3,154 @@
 Flask REST API for Learn.WA English Classes
 Provides endpoints for managing classes, students, and enrollments with SQLite persistence
 """
+import hmac
+import os
+import time
+from contextlib import closing
+from datetime import date
 from functools import wraps
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
 import sys
 from pathlib import Path
-import json
 
 # Add scripts and api directories to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
 sys.path.insert(0, str(Path(__file__).parent))
 
-from english_classes import create_english_class, VALID_LEVELS
+from english_classes import class_record, time_to_minutes, VALID_DAYS, VALID_LEVELS
 from database import (
-    init_db, create_class as db_create_class, get_all_classes,
-    get_class_by_id, enroll_student, get_class_students,
-    create_quiz, get_all_quizzes, get_quiz
+    get_all_classes, get_class_by_id, enroll_students,
+    get_classes_page, iter_classes, create_quizzes, get_all_quizzes,
+    get_quizzes_page, iter_quizzes, get_quiz, transaction, pool_stats,
+    cache_etag, read_cache, get_quiz_stats, get_fill_stats, get_enrollment_stats,
+    search_quizzes_page, current_path, use_database, set_tenant, create_tenant, list_tenants,
+    get_waitlist, leave_waitlist, unenroll_student, update_class_capacity,
+    get_enrollment_status, database_path, UnknownTenant, TenantExists
 )
+import backup
+import database
+from enrollment import enroller
+from schedule import (
+    ScheduleConflict, create_class as schedule_create_class,
+    create_classes as schedule_create_classes, get_schedule_index
+)
+from spec_stream import import_class_specs
+from waitlist import watcher
+from grading import attempt_writer, submit_attempts
+import metrics
+from profiling import profiler
+from responses import FastJSONProvider, compress
+# quiz and generation (pydantic) are imported by the handlers that use them,
+# keeping them off the cold-start path; the schema is migrated on first connection
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
+# Admin endpoints (and the X-Profile header) are disabled unless a token is configured
+app.config['ADMIN_TOKEN'] = os.environ.get('LEARNWA_ADMIN_TOKEN')
+# JSON bodies of 1 KiB and up are gzip/brotli-encoded for clients that accept it; turn
+# off with LEARNWA_COMPRESS=0 when a reverse proxy already compresses
+app.config['COMPRESS_RESPONSES'] = os.environ.get('LEARNWA_COMPRESS', '1') != '0'
+app.config['PROFILE_DIR'] = os.environ.get('LEARNWA_PROFILE_DIR', str(Path(__file__).parent / 'profiles'))
+app.config['BACKUP_DIR'] = os.environ.get('LEARNWA_BACKUP_DIR', str(Path(__file__).parent / 'backups'))
+profiler.sample_rate = float(os.environ.get('LEARNWA_PROFILE_SAMPLE_RATE', 0))
+
+# Multi-tenant mode: one SQLite shard per tenant, chosen by X-Tenant or <tenant>.<TENANT_DOMAIN>
+database.TENANTS_DIR = os.environ.get('LEARNWA_TENANTS_DIR') or database.TENANTS_DIR
+app.config['TENANT_DOMAIN'] = os.environ.get('LEARNWA_TENANT_DOMAIN')
+TENANTLESS_ROUTES = {'/api/health', '/api/levels', '/api/metrics', '/api/db/pool', '/api/generation/stats'}
+
+
+def is_admin():
+    token = app.config.get('ADMIN_TOKEN')
+    supplied = request.headers.get('X-Admin-Token')
+    return bool(token and supplied) and hmac.compare_digest(token, supplied)
+
+
+def admin_required(func):
+    """Reject requests without the configured X-Admin-Token"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not is_admin():
+            return json_error_response("Admin token required", 403)
+        return func(*args, **kwargs)
+    return wrapper
+
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+    route = request.url_rule.rule if request.url_rule else None
+    if route and profiler.should_profile(route, forced='X-Profile' in request.headers and is_admin()):
+        g.profiling = True
+        profiler.start(route)
+
+
+def request_tenant():
+    """Tenant named by the X-Tenant header, else by the subdomain of TENANT_DOMAIN"""
+    tenant = request.headers.get('X-Tenant')
+    if tenant:
+        return tenant.strip().lower()
+    domain = app.config.get('TENANT_DOMAIN')
+    host = request.host.split(':', 1)[0].lower()
+    if domain and host.endswith('.' + domain.lower()):
+        return host[:-len(domain) - 1]
+    return None
+
+
+@app.before_request
+def route_tenant():
+    """Send this request's database calls to its tenant's shard"""
+    if not database.TENANTS_DIR or request.url_rule is None:
+        return None
+    rule = request.url_rule.rule
+    if rule in TENANTLESS_ROUTES or rule.startswith('/api/admin/'):
+        return None
+    tenant = request_tenant()
+    if not tenant:
+        return json_error_response("Tenant required (X-Tenant header or subdomain)", 400)
+    try:
+        set_tenant(tenant)
+    except ValueError as e:
+        return json_error_response(str(e), 400)
+    except UnknownTenant as e:
+        return json_error_response(str(e), 404)
+    return None
+
+
+@app.teardown_request
+def stop_profiling(exc=None):
+    if g.pop('profiling', False):
+        profiler.stop()
+
+
+@app.teardown_request
+def reset_tenant(exc=None):
+    set_tenant(None)
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Per-route count, 5xx count and latency (time to build the response, not to stream it)"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        metrics.http_requests.inc((route, request.method, str(response.status_code)))
+        metrics.http_latency.observe((route, request.method), time.perf_counter() - started)
+        if response.status_code >= 500:
+            metrics.http_errors.inc((route, request.method))
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """Compress buffered JSON bodies (runs before the metrics hook, so its time is counted)"""
+    if app.config.get('COMPRESS_RESPONSES'):
+        compress(response, request.accept_encodings)
+    return response
+
 
 def json_error_response(message, status_code=500):
     """Return a JSON error response with a specific status code"""
@@ -41,8 +168,114 @@ def with_error_handling(func):
             return json_error_response("Internal server error", 500)
     return wrapper
 
-# Initialize database on startup
-init_db()
+MAX_PAGE_SIZE = 1000
+MAX_BULK_ENROLLMENTS = 50_000
+STREAM_FORMATS = {"json": "application/json", "ndjson": "application/x-ndjson"}
+
+
+def stream_response(rows, fmt):
+    """Write rows as a JSON array or NDJSON incrementally instead of building the list"""
+    dumps = app.json.dumps
+    # The body is iterated after teardown has reset the tenant, so pin the shard
+    path = current_path()
+
+    def generate():
+        with use_database(path):
+            if fmt == "ndjson":
+                for row in rows:
+                    yield dumps(row) + "\n"
+                return
+            yield "["
+            first = True
+            for row in rows:
+                yield dumps(row) if first else "," + dumps(row)
+                first = False
+            yield "]"
+
+    return Response(generate(), mimetype=STREAM_FORMATS[fmt])
+
+
+def page_limit(default):
+    """(?limit= as an int, None) or (None, 400 response) if it is out of range"""
+    limit = request.args.get('limit')
+    try:
+        limit = int(limit) if limit is not None else default
+    except ValueError:
+        return None, json_error_response("limit must be an integer", 400)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return None, json_error_response(f"limit must be between 1 and {MAX_PAGE_SIZE}", 400)
+    return limit, None
+
+
+def query_flag(name):
+    """True if ?name= is set to 1/true/yes"""
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def class_options():
+    """(get_class* keyword arguments for ?fields=, ?include= and ?include_archived=, None) or (None, 400 response)"""
+    options = {}
+    fields = request.args.get('fields')
+    if fields:
+        try:
+            options['fields'] = database.class_fields(fields.split(','))
+        except ValueError as e:
+            return None, json_error_response(str(e), 400)
+    include = [name.strip() for name in request.args.get('include', '').split(',') if name.strip()]
+    unknown = [name for name in include if name != 'students']
+    if unknown:
+        return None, json_error_response(f"Cannot include: {unknown[0]} (expected students)", 400)
+    if include:
+        options['include_students'] = True
+    if query_flag('include_archived'):
+        options['include_archived'] = True
+    return options, None
+
+
+def list_response(fetch_page, iterate, **filters):
+    """Shared list handling: ?stream=json|ndjson, ?limit=/?cursor= keyset pages, or everything
+
+    Returns None when the request asks for neither, so the caller keeps its
+    plain JSON array response.
+    """
+    fmt = request.args.get('stream')
+    if fmt:
+        if fmt not in STREAM_FORMATS:
+            return json_error_response(f"Invalid stream format: {fmt}", 400)
+        return stream_response(iterate(**filters), fmt)
+    
+    if request.args.get('limit') is None and request.args.get('cursor') is None:
+        return None
+    
+    limit, error = page_limit(100)
+    if error:
+        return error
+    cursor = request.args.get('cursor')
+    try:
+        items, next_cursor = fetch_page(limit, cursor, **filters)
+    except ValueError as e:
+        return json_error_response(str(e), 400)
+    return jsonify({"items": items, "next": next_cursor})
+
+def cached_json(scopes, load, not_found=None):
+    """JSON response with a version ETag; 304 when the client's copy is current
+
+    The ETag comes from the read cache versions, so a matching
+    If-None-Match is answered without loading or serializing anything.
+    """
+    etag = cache_etag(*scopes)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    
+    data = load()
+    if data is None and not_found:
+        return jsonify({"error": not_found}), 404
+    
+    response = jsonify(data)
+    response.set_etag(etag, weak=True)
+    return response
 
 # Global error handlers to ensure JSON responses
 @app.errorhandler(404)
@@ -61,6 +294,164 @@ def health_check():
     """Health check endpoint"""
     return jsonify({"status": "ok", "message": "Learn.WA API is running with SQLite"})
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request, SQL, connection and cache metrics in the Prometheus text format"""
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@admin_required
+def get_profiles():
+    """Profiler settings and per-route request/sample counts"""
+    return jsonify(profiler.summary())
+
+@app.route('/api/admin/profiles', methods=['POST'])
+@admin_required
+def configure_profiles():
+    """Set {"sample_rate": 0.01} and/or arm {"route": "/api/classes", "count": 20}"""
+    data = request.json or {}
+    if 'sample_rate' in data:
+        rate = data['sample_rate']
+        if not isinstance(rate, (int, float)) or not 0 <= rate <= 1:
+            return json_error_response("sample_rate must be between 0 and 1", 400)
+        profiler.sample_rate = float(rate)
+    if 'route' in data:
+        count = data.get('count', 10)
+        if not isinstance(count, int) or count < 0:
+            return json_error_response("count must be a non-negative integer", 400)
+        if not any(rule.rule == data['route'] for rule in app.url_map.iter_rules()):
+            return json_error_response(f"Unknown route: {data['route']}", 400)
+        profiler.arm(data['route'], count)
+    return jsonify(profiler.summary())
+
+@app.route('/api/admin/profiles/collapsed', methods=['GET'])
+@admin_required
+def get_collapsed_profiles():
+    """Collapsed stacks (flamegraph.pl / speedscope input), optionally for one ?route="""
+    return Response(profiler.collapsed(request.args.get('route')), mimetype="text/plain")
+
+@app.route('/api/admin/profiles/dump', methods=['POST'])
+@admin_required
+def dump_profiles():
+    """Write one collapsed-stack file per route to PROFILE_DIR"""
+    return jsonify({"files": profiler.dump(app.config['PROFILE_DIR'])})
+
+@app.route('/api/admin/profiles', methods=['DELETE'])
+@admin_required
+def reset_profiles():
+    profiler.reset()
+    return jsonify(profiler.summary())
+
+@app.route('/api/admin/tenants', methods=['GET'])
+@admin_required
+def get_tenants():
+    """Tenant shards on disk, with size and whether each is open"""
+    return jsonify({"tenants": list_tenants(), "max_open": database.MAX_OPEN_SHARDS})
+
+@app.route('/api/admin/tenants', methods=['POST'])
+@admin_required
+def create_tenant_endpoint():
+    """Create and migrate a shard for {"tenant": "school-name"}"""
+    data = request.json or {}
+    try:
+        return jsonify(create_tenant(data.get('tenant'))), 201
+    except TenantExists as e:
+        return json_error_response(str(e), 409)
+    except ValueError as e:
+        return json_error_response(str(e), 400)
+
+def throttle_options(data, defaults):
+    """{"pages": int >= 1, "pause": 0-1 seconds} from ``data`` over ``defaults``; ValueError if invalid"""
+    options = dict(defaults)
+    for key, value in data.items():
+        if key not in options:
+            continue
+        if key == 'pages':
+            if isinstance(value, str) and value.isdigit():
+                value = int(value)
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                raise ValueError("pages must be a positive integer")
+        else:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                value = -1.0
+            if not 0 <= value <= 1:
+                raise ValueError(f"{key} must be between 0 and 1 seconds")
+        options[key] = value
+    return options
+
+@app.route('/api/admin/backups', methods=['GET'])
+@admin_required
+def get_backups():
+    """Recent and running snapshots, newest first"""
+    return jsonify({"backups": backup.jobs.list()})
+
+@app.route('/api/admin/backups', methods=['POST'])
+@admin_required
+def start_backup():
+    """Snapshot the database (or {"tenant": ...}'s shard) to BACKUP_DIR in the background
+
+    {"pages": N, "pause": seconds} throttle the copy: pages per step and the
+    sleep between steps.
+    """
+    data = request.json or {}
+    try:
+        path = database_path(data.get('tenant'))
+        options = throttle_options(data, {'pages': backup.STEP_PAGES, 'pause': backup.STEP_PAUSE_SECONDS})
+        os.makedirs(app.config['BACKUP_DIR'], exist_ok=True)
+        dest = os.path.join(app.config['BACKUP_DIR'],
+                            f"{Path(path).stem}-{time.strftime('%Y%m%d-%H%M%S')}.db")
+        return jsonify(backup.jobs.start(path, dest, **options)), 202
+    except UnknownTenant as e:
+        return json_error_response(str(e), 404)
+    except backup.BackupRunning as e:
+        return json_error_response(str(e), 409)
+    except ValueError as e:
+        return json_error_response(str(e), 400)
+
+@app.route('/api/admin/export', methods=['GET'])
+@admin_required
+def export_database():
+    """Stream every table (or ?tables=a,b) as NDJSON {"table", "row"} lines from one snapshot
+
+    Supports ?tenant= and ?pause= (seconds slept every 1,000 rows); gzipped
+    for clients that accept it.
+    """
+    try:
+        path = database_path(request.args.get('tenant'))
+        pause = throttle_options(request.args, {'pause': 0.0})['pause']
+        tables = [name for name in request.args.get('tables', '').split(',') if name] or None
+        unknown = [name for name in tables or () if name not in backup.table_names(path)]
+        if unknown:
+            return json_error_response(f"Unknown table: {unknown[0]}", 400)
+    except UnknownTenant as e:
+        return json_error_response(str(e), 404)
+    except ValueError as e:
+        return json_error_response(str(e), 400)
+    dumps = app.json.dumps
+
+    def generate():
+        with closing(backup.iter_export(path, tables, pause=pause)) as records:
+            for record in records:
+                yield dumps(record) + "\n"
+
+    response = Response(generate(), mimetype=STREAM_FORMATS["ndjson"])
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename="{Path(path).stem}-{time.strftime("%Y%m%d-%H%M%S")}.ndjson"')
+    return response
+
+@app.route('/api/db/pool', methods=['GET'])
+@with_error_handling
+def get_pool_stats():
+    """Connection pool statistics"""
+    return jsonify({
+        "pools": pool_stats(),
+        "enrollment_queue": enroller.stats(),
+        "attempt_queue": attempt_writer.stats(),
+        "read_cache": read_cache.stats()
+    })
+
 @app.route('/api/levels', methods=['GET'])
 @with_error_handling
 def get_levels():
@@ -74,19 +465,40 @@ def get_classes():
     level = request.args.get('level')
     teacher = request.args.get('teacher')
     
-    classes = get_all_classes(level=level, teacher=teacher)
-    return jsonify(classes)
+    day = request.args.get('day')
+    if day:
+        day = day.strip().capitalize()
+        if day not in VALID_DAYS:
+            return jsonify({"error": f"Invalid day: {request.args['day']}"}), 400
+    
+    time_filters = {}
+    for param in ('starts_after', 'ends_before'):
+        value = request.args.get(param)
+        if value:
+            minutes = time_to_minutes(value)
+            if minutes is None:
+                return jsonify({"error": f"Invalid {param}: {value} (expected HH:MM)"}), 400
+            time_filters[param] = minutes
+    
+    options, error = class_options()
+    if error:
+        return error
+    
+    filters = dict(level=level, teacher=teacher, day=day, **time_filters, **options)
+    paged = list_response(get_classes_page, iter_classes, **filters)
+    if paged is not None:
+        return paged
+    
+    return cached_json([("classes",)], lambda: get_all_classes(**filters))
 
 @app.route('/api/classes/<int:class_id>', methods=['GET'])
 @with_error_handling
 def get_class(class_id):
-    """Get a specific class by ID"""
-    class_obj = get_class_by_id(class_id)
-    
-    if not class_obj:
-        return jsonify({"error": "Class not found"}), 404
-    
-    return jsonify(class_obj)
+    """Get a specific class by ID (supports ?fields= and ?include=students)"""
+    options, error = class_options()
+    if error:
+        return error
+    return cached_json([("class", class_id)], lambda: get_class_by_id(class_id, **options), "Class not found")
 
 @app.route('/api/classes', methods=['POST'])
 @with_error_handling
@@ -96,31 +508,18 @@ def create_class():
     
     try:
         # Validate using the english_classes module
-        validated_class = create_english_class(
-            name=data['name'],
-            level=data['level'],
-            teacher=data['teacher'],
-            days=data['days'],
-            start_time=data['start_time'],
-            end_time=data['end_time'],
-            capacity=data.get('capacity', 20)
-        )
+        class_row = class_record(data)
         
-        # Save to database
-        class_id = db_create_class({
-            'name': validated_class.name,
-            'level': validated_class.level,
-            'teacher': validated_class.teacher,
-            'days': validated_class.days,
-            'start_time': validated_class.start_time,
-            'end_time': validated_class.end_time,
-            'capacity': validated_class.capacity
-        })
+        # Save to database and read back on the same connection, holding the
+        # write lock from the start so the conflict check cannot race
+        with transaction(immediate=True):
+            class_id = schedule_create_class(class_row)
+            new_class = get_class_by_id(class_id)
         
-        # Return created class
-        new_class = get_class_by_id(class_id)
         return jsonify(new_class), 201
         
+    except ScheduleConflict as e:
+        return jsonify({"error": str(e), "conflicts": e.conflicts}), 409
     except (ValueError, KeyError) as e:
         return jsonify({"error": str(e)}), 400
 
@@ -131,45 +530,25 @@ def bulk_create_classes():
     data = request.json
     classes_data = data.get('classes', [])
     
-    created_classes = []
-    
-    for class_data in classes_data:
-        try:
-            validated_class = create_english_class(
-                name=class_data['name'],
-                level=class_data['level'],
-                teacher=class_data['teacher'],
-                days=class_data['days'],
-                start_time=class_data['start_time'],
-                end_time=class_data['end_time'],
-                capacity=class_data.get('capacity', 20)
-            )
-            
-            class_id = db_create_class({
-                'name': validated_class.name,
-                'level': validated_class.level,
-                'teacher': validated_class.teacher,
-                'days': validated_class.days,
-                'start_time': validated_class.start_time,
-                'end_time': validated_class.end_time,
-                'capacity': validated_class.capacity
-            })
-            
-            new_class = get_class_by_id(class_id)
-            created_classes.append(new_class)
-            
-        except (ValueError, KeyError):
-            continue
+    created_classes, rejected = schedule_create_classes(classes_data, validate=class_record)
     
     return jsonify({
         "message": f"Created {len(created_classes)} classes",
-        "classes": created_classes
+        "classes": created_classes,
+        "rejected": rejected
     }), 201
 
+@app.route('/api/schedule/conflicts', methods=['GET'])
+@with_error_handling
+def get_schedule_conflicts():
+    """Report every pair of classes that double-books a teacher"""
+    conflicts = get_schedule_index().all_conflicts(teacher=request.args.get('teacher'))
+    return jsonify({"count": len(conflicts), "conflicts": conflicts})
+
 @app.route('/api/classes/<int:class_id>/enroll', methods=['POST'])
 @with_error_handling
 def enroll_student_endpoint(class_id):
-    """Enroll a student in a class"""
+    """Enroll a student in a class ({"waitlist": true} queues them if it is full)"""
     data = request.json
     student_name = data.get('student_name')
     
@@ -177,89 +556,322 @@ def enroll_student_endpoint(class_id):
         return jsonify({"error": "student_name is required"}), 400
     
     try:
-        result = enroll_student(class_id, student_name)
-        
-        # Get updated class info
-        updated_class = get_class_by_id(class_id)
-        result['enrolled_count'] = updated_class['enrolled_count']
-        
-        return jsonify(result), 200
+        # Queued and group-committed with concurrent enrollments; the result
+        # already carries the post-enrollment count
+        result = enroller.enroll(class_id, student_name, waitlist=bool(data.get('waitlist')))
+        return jsonify(result), 202 if result.get('status') == 'waitlisted' else 200
         
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
 
-@app.route('/api/classes/<int:class_id>/students', methods=['GET'])
+@app.route('/api/classes/<int:class_id>/enroll', methods=['DELETE'])
 @with_error_handling
-def get_enrolled_students(class_id):
-    """Get all students enrolled in a class"""
-    class_obj = get_class_by_id(class_id)
+def unenroll_student_endpoint(class_id):
+    """Unenroll a student; the head of the waitlist takes the seat"""
+    student_name = (request.json or {}).get('student_name')
+    if not student_name:
+        return jsonify({"error": "student_name is required"}), 400
+    try:
+        return jsonify(unenroll_student(class_id, student_name)), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/classes/<int:class_id>', methods=['PATCH'])
+@with_error_handling
+def update_class_endpoint(class_id):
+    """Change a class's capacity, promoting waitlisted students into new seats"""
+    capacity = (request.json or {}).get('capacity')
+    if type(capacity) is not int:
+        return jsonify({"error": "capacity (integer) is required"}), 400
+    try:
+        return jsonify(update_class_capacity(class_id, capacity)), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/classes/<int:class_id>/waitlist', methods=['GET'])
+@with_error_handling
+def get_waitlist_endpoint(class_id):
+    """A class's waitlist in queue order"""
+    waitlist = get_waitlist(class_id)
+    if waitlist is None:
+        return json_error_response("Class not found", 404)
+    return jsonify({"class_id": class_id, "count": len(waitlist), "waitlist": waitlist})
+
+@app.route('/api/classes/<int:class_id>/waitlist', methods=['POST'])
+@with_error_handling
+def join_waitlist_endpoint(class_id):
+    """Enroll if a seat is free, otherwise join the waitlist"""
+    student_name = (request.json or {}).get('student_name')
+    if not student_name:
+        return jsonify({"error": "student_name is required"}), 400
+    try:
+        result = enroller.enroll(class_id, student_name, waitlist=True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result), 202 if result['status'] == 'waitlisted' else 200
+
+@app.route('/api/classes/<int:class_id>/waitlist', methods=['DELETE'])
+@with_error_handling
+def leave_waitlist_endpoint(class_id):
+    """Leave a class's waitlist"""
+    student_name = (request.json or {}).get('student_name')
+    if not student_name:
+        return jsonify({"error": "student_name is required"}), 400
+    if not leave_waitlist(class_id, student_name):
+        return json_error_response("Student is not on this waitlist", 404)
+    return jsonify({"message": f"{student_name} left the waitlist", "class_id": class_id})
+
+@app.route('/api/classes/<int:class_id>/waitlist/status', methods=['GET'])
+@with_error_handling
+def waitlist_status_endpoint(class_id):
+    """A student's enrollment status; with ?after=<state>&wait=<seconds>, long-poll until it changes"""
+    student_name = request.args.get('student_name')
+    if not student_name:
+        return json_error_response("student_name is required", 400)
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return json_error_response("wait must be a number of seconds", 400)
+    after = request.args.get('after')
     
-    if not class_obj:
-        return jsonify({"error": "Class not found"}), 404
+    # after=waitlisted:<n> returns when the position moves; after=waitlisted only once it is decided
+    status = get_enrollment_status(class_id, student_name)
+    if status is None:
+        return json_error_response("Class not found", 404)
+    if after in (status['state'], status['status']) and wait > 0:
+        def changed():
+            current = get_enrollment_status(class_id, student_name)
+            if current is None:
+                return {}  # the class was archived meanwhile: stop waiting
+            return current if after not in (current['state'], current['status']) else None
+        # Unchanged at the timeout: answer with the same state and let the client poll again
+        current = watcher.wait_for(class_id, changed, wait)
+        if current == {}:
+            return json_error_response("Class not found", 404)
+        status = current or status
+    return jsonify(status)
+
+@app.route('/api/enrollments/bulk', methods=['POST'])
+@with_error_handling
+def bulk_enroll_endpoint():
+    """Enroll many students in many classes at once, with one result per item"""
+    items = (request.json or {}).get('enrollments')
+    if not isinstance(items, list):
+        return jsonify({"error": "enrollments must be a list of {class_id, student_name}"}), 400
+    if len(items) > MAX_BULK_ENROLLMENTS:
+        return jsonify({"error": f"At most {MAX_BULK_ENROLLMENTS} enrollments per request"}), 400
     
-    students = get_class_students(class_id)
+    # Malformed items are rejected here; the rest go to the database in one transaction
+    results, pairs, positions = [None] * len(items), [], []
+    for index, item in enumerate(items):
+        class_id = item.get('class_id') if isinstance(item, dict) else None
+        student_name = item.get('student_name') if isinstance(item, dict) else None
+        if type(class_id) is not int or not isinstance(student_name, str) or not student_name:
+            results[index] = {"index": index, "status": "rejected",
+                              "error": "class_id (integer) and student_name are required"}
+        else:
+            pairs.append((class_id, student_name))
+            positions.append(index)
+    for index, outcome in zip(positions, enroll_students(pairs)):
+        results[index] = {**outcome, "index": index}
     
+    enrolled = sum(result['status'] == 'enrolled' for result in results)
     return jsonify({
-        "class_id": class_id,
-        "enrolled_count": class_obj['enrolled_count'],
-        "students": students
-    })
+        "message": f"Enrolled {enrolled} of {len(items)}",
+        "enrolled": enrolled,
+        "rejected": len(items) - enrolled,
+        "results": results
+    }), 200
+
+@app.route('/api/classes/<int:class_id>/students', methods=['GET'])
+@with_error_handling
+def get_enrolled_students(class_id):
+    """Get all students enrolled in a class (?include_archived=1 also finds archived classes)"""
+    include_archived = query_flag('include_archived')
+    
+    def load():
+        # Count and roster in one cached read, invalidated by enrollments
+        class_obj = get_class_by_id(class_id, fields=('id', 'enrolled_count'), include_students=True,
+                                    include_archived=include_archived)
+        return class_obj and {
+            "class_id": class_id,
+            "enrolled_count": class_obj['enrolled_count'],
+            "students": class_obj['students']
+        }
+    
+    return cached_json([("class", class_id)], load, "Class not found")
 
 @app.route('/api/quizzes', methods=['POST'])
 @with_error_handling
 def create_quiz_endpoint():
     """Create a new quiz"""
+    from quiz import validate_quiz_batch
     data = request.json
     
-    try:
-        quiz_id = create_quiz(data)
-        new_quiz = get_quiz(quiz_id)
-        return jsonify(new_quiz), 201
-    except (ValueError, KeyError) as e:
-        return jsonify({"error": str(e)}), 400
+    valid, rejected = validate_quiz_batch([data])
+    if rejected:
+        return jsonify({"error": rejected[0]['error']}), 400
+    
+    new_quiz = create_quizzes([valid[0][1]])[0]
+    return jsonify(new_quiz), 201
+
+@app.route('/api/quizzes/bulk', methods=['POST'])
+@with_error_handling
+def bulk_create_quizzes():
+    """Create many quizzes (stored or AI-generated shape) in one transaction"""
+    from quiz import validate_quiz_batch
+    data = request.json or {}
+    quizzes_data = data.get('quizzes')
+    if not isinstance(quizzes_data, list):
+        return jsonify({"error": "quizzes must be a list"}), 400
+    
+    valid, rejected = validate_quiz_batch(quizzes_data)
+    created = create_quizzes([record for _, record in valid])
+    
+    return jsonify({
+        "message": f"Created {len(created)} quizzes",
+        "quizzes": created,
+        "rejected": rejected
+    }), 201
 
 @app.route('/api/quizzes', methods=['GET'])
 @with_error_handling
 def get_quizzes():
     """Get all quizzes"""
-    quizzes = get_all_quizzes()
-    return jsonify(quizzes)
+    paged = list_response(get_quizzes_page, iter_quizzes)
+    if paged is not None:
+        return paged
+    
+    return cached_json([("quizzes",)], get_all_quizzes)
+
+@app.route('/api/quizzes/generate', methods=['POST'])
+@with_error_handling
+def generate_quiz():
+    """Generate a quiz for {"topic", "difficulty"} (cached and coalesced) and store it"""
+    from pydantic import ValidationError
+    from generation import generator
+    from quiz import QuizGenerationRequest
+    data = request.json
+    if not isinstance(data, dict):
+        return json_error_response("Request body must be a JSON object", 400)
+    try:
+        quiz_request = QuizGenerationRequest.model_validate(data)
+    except ValidationError as e:
+        return json_error_response("; ".join(
+            f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()
+        ), 400)
+    
+    try:
+        stored, source = generator.generate_and_store(
+            quiz_request, title=quiz_request.title, focus_mode=quiz_request.focus_mode
+        )
+    except ValidationError as e:
+        return json_error_response(f"Generated quiz is invalid: {e.error_count()} errors", 502)
+    except Exception as exc:  # pylint: disable=broad-except
+        print(f"Quiz generation failed: {exc}", file=sys.stderr)
+        return json_error_response("Quiz generation failed", 502)
+    return jsonify({**stored, "source": source}), 201
+
+@app.route('/api/generation/stats', methods=['GET'])
+@with_error_handling
+def generation_stats():
+    """Quiz generation cache, coalescing and latency metrics"""
+    from generation import generator
+    return jsonify(generator.stats())
+
+@app.route('/api/quizzes/search', methods=['GET'])
+@with_error_handling
+def search_quizzes():
+    """Full-text search over quiz titles, topics and questions (?q=, ?difficulty=, ?focus_mode=)"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return json_error_response("q is required", 400)
+    limit, error = page_limit(20)
+    if error:
+        return error
+    
+    try:
+        items, next_cursor = search_quizzes_page(
+            query, limit, request.args.get('cursor'),
+            difficulty=request.args.get('difficulty'), focus_mode=request.args.get('focus_mode')
+        )
+    except ValueError as e:
+        return json_error_response(str(e), 400)
+    return jsonify({"items": items, "next": next_cursor})
 
 @app.route('/api/quizzes/<int:quiz_id>', methods=['GET'])
 @with_error_handling
 def get_quiz_endpoint(quiz_id):
     """Get a specific quiz with questions"""
-    quiz = get_quiz(quiz_id)
+    return cached_json([("quiz", quiz_id)], lambda: get_quiz(quiz_id), "Quiz not found")
+
+@app.route('/api/quizzes/<int:quiz_id>/attempts', methods=['POST'])
+@with_error_handling
+def submit_quiz_attempts(quiz_id):
+    """Grade and store one attempt, or a batch sent as {"attempts": [...]}"""
+    data = request.json
+    if not isinstance(data, dict):
+        return json_error_response("Request body must be a JSON object", 400)
+    
+    batch = 'attempts' in data
+    submissions = data['attempts'] if batch else [data]
+    if not isinstance(submissions, list):
+        return json_error_response("attempts must be a list", 400)
+    
+    outcome = submit_attempts(quiz_id, submissions)
+    if outcome is None:
+        return json_error_response("Quiz not found", 404)
+    attempts, rejected = outcome
     
-    if not quiz:
-        return jsonify({"error": "Quiz not found"}), 404
+    if not batch:
+        if rejected:
+            return json_error_response(rejected[0]['error'], 400)
+        return jsonify(attempts[0]), 201
     
-    return jsonify(quiz)
+    return jsonify({
+        "message": f"Graded {len(attempts)} attempts",
+        "attempts": attempts,
+        "rejected": rejected
+    }), 201
+
+@app.route('/api/stats/quizzes/<int:quiz_id>', methods=['GET'])
+@with_error_handling
+def quiz_stats_endpoint(quiz_id):
+    """Attempts, average score and per-question accuracy for a quiz"""
+    stats = get_quiz_stats(quiz_id)
+    if stats is None:
+        return json_error_response("Quiz not found", 404)
+    return jsonify(stats)
+
+@app.route('/api/stats/classes', methods=['GET'])
+@with_error_handling
+def class_fill_stats():
+    """Class fill rate by ?by=level (default) or ?by=teacher; ?include_archived=1 adds archived classes"""
+    try:
+        return jsonify(get_fill_stats(request.args.get('by', 'level'), query_flag('include_archived')))
+    except ValueError as e:
+        return json_error_response(str(e), 400)
+
+@app.route('/api/stats/enrollments', methods=['GET'])
+@with_error_handling
+def enrollment_stats():
+    """Enrollments per day, optionally bounded by ?since= and ?until= (YYYY-MM-DD)"""
+    bounds = {}
+    for name in ('since', 'until'):
+        value = request.args.get(name)
+        if value:
+            try:
+                bounds[name] = date.fromisoformat(value).isoformat()
+            except ValueError:
+                return json_error_response(f"{name} must be a YYYY-MM-DD date", 400)
+    return jsonify(get_enrollment_stats(**bounds))
 
 if __name__ == '__main__':
-    # Load initial data from class_specs.json if database is empty
-    classes_list = get_all_classes()
-    if len(classes_list) == 0:
+    # Stream initial data from class_specs.json if database is empty
+    if not get_all_classes():
+        specs_path = Path(__file__).parent.parent / 'scripts' / 'class_specs.json'
         try:
-            specs_path = Path(__file__).parent.parent / 'scripts' / 'class_specs.json'
-            with open(specs_path, 'r') as f:
-                specs_data = json.load(f)
-                
-            for class_data in specs_data:
-                try:
-                    validated_class = create_english_class(**class_data)
-                    db_create_class({
-                        'name': validated_class.name,
-                        'level': validated_class.level,
-                        'teacher': validated_class.teacher,
-                        'days': validated_class.days,
-                        'start_time': validated_class.start_time,
-                        'end_time': validated_class.end_time,
-                        'capacity': validated_class.capacity
-                    })
-                except ValueError:
-                    continue
-                    
+            import_class_specs(specs_path, lambda specs: schedule_create_classes(specs, validate=class_record))
             print(f"Loaded initial data from class_specs.json")
         except FileNotFoundError:
             print("class_specs.json not found, starting with empty database")
@@ -0,0 +1,272 @@
+"""Incrementally maintained analytics tables for Learn.WA
+
+Aggregates (per-question accuracy, per-quiz scores, class fill by level and
+teacher, enrollments per day) live in small tables that are updated in the
+same transaction as the write that changes them, so reading them costs a
+primary-key lookup however much history there is. ``rebuild_stats``
+recomputes everything from the base tables.
+
+Archived classes (see ``archive``) leave the fill stats when they are moved
+but their enrollments stay counted per day: those enrollments did happen.
+
+Functions here take an open connection or cursor; ``database`` owns the
+transactions and calls ``apply_write`` from ``notify_write``.
+"""
+import sqlite3
+from collections import Counter
+from typing import Dict, List, Optional
+
+import archive
+
+FILL_DIMENSIONS = ("level", "teacher")
+
+_TABLES = {
+    "quiz_stats": """
+        CREATE TABLE IF NOT EXISTS quiz_stats (
+            quiz_id INTEGER PRIMARY KEY,
+            question_count INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            total_score INTEGER NOT NULL DEFAULT 0,
+            total_possible INTEGER NOT NULL DEFAULT 0
+        )
+    """,
+    "question_stats": """
+        CREATE TABLE IF NOT EXISTS question_stats (
+            question_id INTEGER PRIMARY KEY,
+            quiz_id INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0
+        )
+    """,
+    "class_fill_stats": """
+        CREATE TABLE IF NOT EXISTS class_fill_stats (
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            classes INTEGER NOT NULL DEFAULT 0,
+            capacity INTEGER NOT NULL DEFAULT 0,
+            enrolled INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, value)
+        ) WITHOUT ROWID
+    """,
+    "enrollment_daily": """
+        CREATE TABLE IF NOT EXISTS enrollment_daily (
+            day TEXT PRIMARY KEY,
+            enrollments INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """,
+}
+
+
+def create_stats_tables(cursor: sqlite3.Cursor) -> None:
+    """Create the aggregate tables, backfilling them if any were missing"""
+    cursor.execute(f"""
+        SELECT COUNT(*) FROM sqlite_master
+        WHERE type = 'table' AND name IN ({', '.join('?' * len(_TABLES))})
+    """, tuple(_TABLES))
+    missing = cursor.fetchone()[0] < len(_TABLES)
+    for ddl in _TABLES.values():
+        cursor.execute(ddl)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_question_stats_quiz ON question_stats (quiz_id, question_id)")
+    if missing:
+        rebuild_stats(cursor)
+
+
+def rebuild_stats(cursor: sqlite3.Cursor) -> None:
+    """Recompute every aggregate from the base tables"""
+    for table in _TABLES:
+        cursor.execute(f"DELETE FROM {table}")
+    cursor.execute("""
+        INSERT INTO quiz_stats (quiz_id, question_count, attempts, total_score, total_possible)
+        SELECT q.id, COALESCE(qu.question_count, 0), COALESCE(a.attempts, 0),
+               COALESCE(a.total_score, 0), COALESCE(a.total_possible, 0)
+        FROM quizzes q
+        LEFT JOIN (SELECT quiz_id, COUNT(*) AS question_count FROM questions GROUP BY quiz_id) qu
+            ON qu.quiz_id = q.id
+        LEFT JOIN (SELECT quiz_id, COUNT(*) AS attempts, SUM(score) AS total_score,
+                          SUM(total) AS total_possible
+                   FROM attempts GROUP BY quiz_id) a
+            ON a.quiz_id = q.id
+    """)
+    cursor.execute("""
+        INSERT INTO question_stats (question_id, quiz_id, attempts, correct)
+        SELECT qu.id, qu.quiz_id, COALESCE(s.attempts, 0), COALESCE(c.correct, 0)
+        FROM questions qu
+        LEFT JOIN quiz_stats s ON s.quiz_id = qu.quiz_id
+        LEFT JOIN (SELECT question_id, SUM(is_correct) AS correct FROM answers GROUP BY question_id) c
+            ON c.question_id = qu.id
+    """)
+    for dimension in FILL_DIMENSIONS:
+        cursor.execute(f"""
+            INSERT INTO class_fill_stats (dimension, value, classes, capacity, enrolled)
+            SELECT '{dimension}', {dimension}, COUNT(*), SUM(capacity), SUM(enrolled_count)
+            FROM classes GROUP BY {dimension}
+        """)
+    enrollments = archive.enrollments_source() if archive.is_attached(cursor.connection) else "enrollments"
+    cursor.execute(f"""
+        INSERT INTO enrollment_daily (day, enrollments)
+        SELECT date(enrolled_at), COUNT(*) FROM {enrollments} GROUP BY date(enrolled_at)
+    """)
+
+
+def _classes_created(cursor: sqlite3.Cursor, rows: List[Dict]) -> None:
+    totals: Dict = {}
+    for row in rows:
+        for dimension in FILL_DIMENSIONS:
+            count, capacity = totals.get((dimension, row[dimension]), (0, 0))
+            totals[(dimension, row[dimension])] = (count + 1, capacity + row['capacity'])
+    cursor.executemany("""
+        INSERT INTO class_fill_stats (dimension, value, classes, capacity) VALUES (?, ?, ?, ?)
+        ON CONFLICT (dimension, value) DO UPDATE SET
+            classes = classes + excluded.classes, capacity = capacity + excluded.capacity
+    """, [key + value for key, value in totals.items()])
+
+
+def _enrollments_created(cursor: sqlite3.Cursor, rows: List[Dict]) -> None:
+    per_class = Counter(row['class_id'] for row in rows)
+    cursor.executemany("""
+        UPDATE class_fill_stats SET enrolled = enrolled + ?2
+        WHERE (dimension, value) IN (
+            SELECT 'level', level FROM classes WHERE id = ?1
+            UNION ALL SELECT 'teacher', teacher FROM classes WHERE id = ?1
+        )
+    """, list(per_class.items()))
+    cursor.execute("""
+        INSERT INTO enrollment_daily (day, enrollments) VALUES (date('now'), ?)
+        ON CONFLICT (day) DO UPDATE SET enrollments = enrollments + excluded.enrollments
+    """, (len(rows),))
+
+
+def _enrollments_deleted(cursor: sqlite3.Cursor, rows: List[Dict]) -> None:
+    per_class = Counter(row['class_id'] for row in rows)
+    cursor.executemany("""
+        UPDATE class_fill_stats SET enrolled = enrolled - ?2
+        WHERE (dimension, value) IN (
+            SELECT 'level', level FROM classes WHERE id = ?1
+            UNION ALL SELECT 'teacher', teacher FROM classes WHERE id = ?1
+        )
+    """, list(per_class.items()))
+    # Counted on the day they were made, as rebuild_stats would
+    cursor.executemany("UPDATE enrollment_daily SET enrollments = enrollments - ?2 WHERE day = date(?1)",
+                       list(Counter(row['enrolled_at'] for row in rows).items()))
+
+
+def _classes_updated(cursor: sqlite3.Cursor, rows: List[Dict]) -> None:
+    cursor.executemany("""
+        UPDATE class_fill_stats SET capacity = capacity + ?
+        WHERE (dimension, value) IN (VALUES ('level', ?), ('teacher', ?))
+    """, [(row['capacity_delta'], row['level'], row['teacher']) for row in rows if row.get('capacity_delta')])
+
+
+def _classes_archived(cursor: sqlite3.Cursor, rows: List[Dict]) -> None:
+    totals: Dict = {}
+    for row in rows:
+        for dimension in FILL_DIMENSIONS:
+            count, capacity, enrolled = totals.get((dimension, row[dimension]), (0, 0, 0))
+            totals[(dimension, row[dimension])] = (count + 1, capacity + row['capacity'],
+                                                   enrolled + row['enrolled_count'])
+    cursor.executemany("""
+        UPDATE class_fill_stats SET classes = classes - ?, capacity = capacity - ?, enrolled = enrolled - ?
+        WHERE dimension = ? AND value = ?
+    """, [value + key for key, value in totals.items()])
+    cursor.execute("DELETE FROM class_fill_stats WHERE classes <= 0")
+
+
+def _quizzes_created(cursor: sqlite3.Cursor, rows: List[Dict]) -> None:
+    cursor.executemany("INSERT INTO quiz_stats (quiz_id, question_count) VALUES (?, ?)",
+                       [(row['id'], len(row['question_ids'])) for row in rows])
+    cursor.executemany("INSERT INTO question_stats (question_id, quiz_id) VALUES (?, ?)",
+                       [(question_id, row['id']) for row in rows for question_id in row['question_ids']])
+
+
+def _attempts_created(cursor: sqlite3.Cursor, rows: List[Dict]) -> None:
+    by_quiz: Dict[int, List[Dict]] = {}
+    for row in rows:
+        by_quiz.setdefault(row['quiz_id'], []).append(row)
+    for quiz_id, attempts in by_quiz.items():
+        cursor.execute("""
+            UPDATE quiz_stats SET attempts = attempts + ?, total_score = total_score + ?,
+                                  total_possible = total_possible + ?
+            WHERE quiz_id = ?
+        """, (len(attempts), sum(a['score'] for a in attempts), sum(a['total'] for a in attempts), quiz_id))
+        cursor.execute("SELECT question_id FROM question_stats WHERE quiz_id = ? ORDER BY question_id", (quiz_id,))
+        question_ids = [row[0] for row in cursor.fetchall()]
+        correct = [sum(column) for column in zip(*(a['correct'] for a in attempts))]
+        cursor.executemany("""
+            UPDATE question_stats SET attempts = attempts + ?, correct = correct + ? WHERE question_id = ?
+        """, [(len(attempts), count, question_id) for question_id, count in zip(question_ids, correct)])
+
+
+_HANDLERS = {
+    "classes_created": _classes_created,
+    "classes_updated": _classes_updated,
+    "classes_archived": _classes_archived,
+    "enrollments_created": _enrollments_created,
+    "enrollments_deleted": _enrollments_deleted,
+    "quizzes_created": _quizzes_created,
+    "attempts_created": _attempts_created,
+}
+
+
+def apply_write(cursor: sqlite3.Cursor, event: str, rows: List[Dict]) -> None:
+    """Fold one write event into the aggregates, inside the writer's transaction"""
+    handler = _HANDLERS.get(event)
+    if handler is not None and rows:
+        handler(cursor, rows)
+
+
+def _ratio(part: int, whole: int) -> float:
+    return round(part / whole, 4) if whole else 0.0
+
+
+def quiz_stats(cursor: sqlite3.Cursor, quiz_id: int) -> Optional[Dict]:
+    """Average score and per-question accuracy for one quiz"""
+    cursor.execute("SELECT * FROM quiz_stats WHERE quiz_id = ?", (quiz_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    stats = dict(row)
+    stats['average_score'] = round(stats['total_score'] / stats['attempts'], 2) if stats['attempts'] else 0.0
+    stats['average_percentage'] = round(100 * _ratio(stats['total_score'], stats['total_possible']), 2)
+    cursor.execute("""
+        SELECT question_id, attempts, correct FROM question_stats
+        WHERE quiz_id = ? ORDER BY question_id
+    """, (quiz_id,))
+    stats['questions'] = [
+        {**dict(q), 'accuracy': _ratio(q['correct'], q['attempts'])} for q in cursor.fetchall()
+    ]
+    return stats
+
+
+def fill_stats(cursor: sqlite3.Cursor, dimension: str, include_archived: bool = False) -> List[Dict]:
+    """Classes, seats and enrollments per level or teacher
+
+    ``include_archived`` adds archived classes, totalled from the attached
+    archive (which holds no aggregates of its own).
+    """
+    if dimension not in FILL_DIMENSIONS:
+        raise ValueError(f"Invalid dimension: {dimension}")
+    cursor.execute("""
+        SELECT value, classes, capacity, enrolled FROM class_fill_stats
+        WHERE dimension = ? ORDER BY value
+    """, (dimension,))
+    totals = {row['value']: (row['classes'], row['capacity'], row['enrolled']) for row in cursor.fetchall()}
+    if include_archived and archive.is_attached(cursor.connection):
+        for value, archived in archive.fill_totals(cursor, dimension).items():
+            totals[value] = tuple(a + b for a, b in zip(totals.get(value, (0, 0, 0)), archived))
+    return [{dimension: value, 'classes': classes, 'capacity': capacity, 'enrolled': enrolled,
+             'fill_rate': _ratio(enrolled, capacity)}
+            for value, (classes, capacity, enrolled) in sorted(totals.items())]
+
+
+def enrollment_stats(cursor: sqlite3.Cursor, since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+    """Enrollments per day (UTC), optionally bounded by inclusive YYYY-MM-DD dates"""
+    query = "SELECT day, enrollments FROM enrollment_daily WHERE 1 = 1"
+    params = []
+    if since:
+        query += " AND day >= ?"
+        params.append(since)
+    if until:
+        query += " AND day <= ?"
+        params.append(until)
+    cursor.execute(query + " ORDER BY day", params)
+    return [dict(row) for row in cursor.fetchall()]
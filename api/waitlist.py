@@ -0,0 +1,86 @@
+"""Long-poll support for Learn.WA waitlists
+
+A request waiting on a student's enrollment status sleeps on a condition
+until a committed write touches that class's enrollments or waitlist, then
+re-reads the status. Waiting holds no database connection, so a crowd of
+students watching a full class costs threads, not queries or retries.
+
+Wake-ups are in-process: with several server processes a waiter only hears
+about writes made by its own process and otherwise returns at its timeout,
+when the client simply polls again.
+"""
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import database
+import metrics
+
+MAX_WAIT_SECONDS = 30.0
+
+_WATCHED_EVENTS = ("enrollments_created", "enrollments_deleted", "waitlist_changed", "classes_updated",
+                   "classes_archived")
+
+_Key = Tuple[str, int]
+
+
+class WaitlistWatcher:
+    """Wake long-polling requests when a class's enrollments or waitlist change"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._versions: Dict[_Key, int] = {}
+        self._waiters: Dict[_Key, int] = {}
+        database.add_write_listener(self._on_write)
+
+    def wait_for(self, class_id: int, check: Callable[[], Optional[Dict]], timeout: float) -> Optional[Dict]:
+        """Call ``check`` now and after every change to the class until it returns a result
+
+        Returns None if ``timeout`` seconds pass without one.
+        """
+        key = (database.current_path(), class_id)
+        deadline = time.monotonic() + min(timeout, MAX_WAIT_SECONDS)
+        with self._cond:
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+            version = self._versions.setdefault(key, 0)
+        try:
+            while True:
+                # The version is read before checking, so a change in between still wakes us
+                result = check()
+                if result is not None:
+                    return result
+                with self._cond:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait_for(
+                            lambda: self._versions[key] != version, remaining):
+                        return None
+                    version = self._versions[key]
+        finally:
+            with self._cond:
+                self._waiters[key] -= 1
+                if not self._waiters[key]:
+                    del self._waiters[key], self._versions[key]
+
+    def waiting(self) -> int:
+        with self._cond:
+            return sum(self._waiters.values())
+
+    def _on_write(self, event: str, rows) -> None:
+        if event not in _WATCHED_EVENTS:
+            return
+        path = database.current_path()
+        keys = {(path, row['class_id'] if 'class_id' in row else row['id']) for row in rows}
+        database.after_commit(lambda: self._wake(keys))
+
+    def _wake(self, keys) -> None:
+        with self._cond:
+            woken = [key for key in keys if key in self._waiters]
+            for key in woken:
+                self._versions[key] += 1
+            if woken:
+                self._cond.notify_all()
+
+
+watcher = WaitlistWatcher()
+metrics.registry.collected("learnwa_waitlist_pollers", "Requests long-polling a waitlist status", (),
+                           lambda: [((), watcher.waiting())])
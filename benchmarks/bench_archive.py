@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Archiving finished terms: live query speed and writer latency while it runs
+
+Generates a database whose classes are spread over ``--terms`` terms of
+which all but the last are finished, then measures live class queries
+before and after ``archive_classes`` moves the finished terms out, and the
+latency of a concurrent writer (enroll_student on a current class) while
+archiving in batches versus in one transaction.
+
+    python3 benchmarks/bench_archive.py --classes 20000 --enrollments 200000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import common
+import database
+import datagen
+
+
+def live_queries(results, label, level):
+    for name, func in ((f"get_all_classes[level] {label}", lambda i: database.get_all_classes.uncached(level=level)),
+                       (f"get_all_classes[Monday 09:00+] {label}",
+                        lambda i: database.get_all_classes.uncached(day="Monday", starts_after=540))):
+        results[name] = common.measure(func, 50)
+
+
+def archive_with_writer(before, batch_size, pause, class_id):
+    """Run ``archive_classes`` while one thread keeps enrolling; returns (writer latencies, totals, elapsed)"""
+    latencies, done = [], threading.Event()
+
+    def writer():
+        clock = time.perf_counter
+        n = 0
+        while not done.is_set():
+            t0 = clock()
+            database.enroll_student(class_id, f"Writer {batch_size}.{n}")
+            latencies.append(clock() - t0)
+            n += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    time.sleep(0.2)  # the writer's steady state before archiving starts
+    started = time.perf_counter()
+    totals = database.archive_classes(before, batch_size, pause)
+    elapsed = time.perf_counter() - started
+    done.set()
+    thread.join()
+    return latencies, totals, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--classes", type=int, default=20_000)
+    parser.add_argument("--students", type=int, default=50_000)
+    parser.add_argument("--enrollments", type=int, default=200_000)
+    parser.add_argument("--terms", type=int, default=4, help="terms the classes are spread over")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.01, help="seconds between archive batches")
+    common.add_result_arguments(parser)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="learnwa-archive-")
+    pristine = os.path.join(workdir, "pristine.db")
+    datagen.generate(pristine, args.classes, args.students, args.enrollments, 0, 0)
+    with database.use_database(pristine), database.transaction() as conn:
+        # Term k of n began (n - k) * 120 days ago; only the last term is current
+        conn.execute("UPDATE classes SET created_at = datetime('now', (((id % ?) - ?) * 120) || ' days')",
+                     (args.terms, args.terms - 1))
+    database.close_pools()  # the last close checkpoints, so the file copies whole
+    before = time.strftime("%Y-%m-%d", time.gmtime(time.time() - 60 * 86400))
+
+    results = {}
+    for label, batch_size in ((f"batches of {args.batch_size}", args.batch_size), ("one transaction", args.classes)):
+        database.DB_PATH = os.path.join(workdir, f"run-{batch_size}.db")
+        shutil.copy(pristine, database.DB_PATH)
+        database.init_db()
+        level = datagen.LEVELS[0]
+        current_id = database.create_class({
+            "name": "Current", "level": level, "teacher": "Writer", "days": ["Monday"],
+            "start_time": "09:00", "end_time": "10:00", "capacity": 10**9})
+        if batch_size == args.batch_size:
+            live_queries(results, "before", level)
+        pause = args.pause if batch_size < args.classes else 0.0
+        latencies, totals, elapsed = archive_with_writer(before, batch_size, pause, current_id)
+        results[f"enroll_student during archive, {label}"] = {
+            **common.summarize(latencies, elapsed), "max_ms": round(1000 * max(latencies), 4)}
+        print(f"{label}: archived {totals['archived']} classes and {totals['enrollments']} enrollments "
+              f"in {elapsed:.2f}s ({totals['batches']} batches); slowest concurrent enroll "
+              f"{1000 * max(latencies):.1f} ms", file=sys.stderr)
+        if batch_size == args.batch_size:
+            live_queries(results, "after", level)
+        database.close_pools()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return common.finish(args, results, suite="archive", classes=args.classes, enrollments=args.enrollments,
+                         batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
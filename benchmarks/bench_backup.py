@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Request latency while an online snapshot of the database is running
+
+Runs the loadgen endpoint mix against the in-process app three times:
+without a backup, while snapshots throttled to ``--pages`` pages per step
+with ``--pause`` seconds between steps are taken back to back, and while
+unthrottled single-step snapshots are. Reports p50/p95/p99 over all
+requests for each, plus how long one snapshot took.
+
+    python3 benchmarks/bench_backup.py --scale 0.05 --duration 10
+"""
+import argparse
+import os
+import sys
+import threading
+from pathlib import Path
+
+import common  # first: puts api/ and scripts/ on sys.path
+import backup
+import database
+import loadgen
+
+
+def snapshots_until(stop, path, dest, pages, pause, timings):
+    while not stop.is_set():
+        timings.append(backup.snapshot(path, dest, pages=pages, pause=pause)["seconds"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", type=Path, help="datagen database to copy (default: generate one)")
+    parser.add_argument("--scale", type=float, default=0.05, help="datagen scale when --db is not given")
+    parser.add_argument("--pages", type=int, default=backup.STEP_PAGES, help="pages per step when throttled")
+    parser.add_argument("--pause", type=float, default=backup.STEP_PAUSE_SECONDS, help="seconds between steps")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=8.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    common.add_result_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.db and not args.db.exists():
+        print(f"Error: {args.db} not found", file=sys.stderr)
+        return 1
+    url = loadgen.serve_in_process(args.db, args.scale)
+    path = database.DB_PATH
+    dest = os.path.join(os.path.dirname(path), "snapshot.db")
+    print(f"Database {os.path.getsize(path) / 1e6:.1f} MB; target {url}", file=sys.stderr)
+
+    results = {}
+    for label, pages, pause in (("no backup", None, None),
+                                (f"backup {args.pages} pages/step, {args.pause * 1000:g} ms pause", args.pages, args.pause),
+                                ("backup in one step", 2**31 - 1, 0.0)):
+        stop, timings = threading.Event(), []
+        thread = None
+        if pages is not None:
+            thread = threading.Thread(target=snapshots_until, args=(stop, path, dest, pages, pause, timings))
+            thread.start()
+        load = loadgen.run_load(url, args.concurrency, args.duration, args.warmup, args.seed)
+        stop.set()
+        if thread is not None:
+            thread.join()
+            print(f"{label}: {len(timings)} snapshots, {sum(timings) / len(timings):.2f}s each", file=sys.stderr)
+        results[label] = {**load["all"], "snapshot_seconds": round(sum(timings) / len(timings), 3) if timings else None}
+    database.close_pools()
+    return common.finish(args, results, suite="backup", pages=args.pages, pause=args.pause,
+                         concurrency=args.concurrency, duration=args.duration)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for every public database.py function and EnglishClass validation
+
+Runs against a scratch copy of a datagen database (made with the SQLite
+backup API, so the source is never modified), or a freshly generated one
+at ``--scale`` when no ``--db`` is given. Cached reads are measured both
+"cold" (straight to SQLite) and "warm" (served from the read cache).
+
+    python3 benchmarks/datagen.py --db bench.db
+    python3 benchmarks/bench_database.py --db bench.db --save baseline.json
+    python3 benchmarks/bench_database.py --db bench.db --baseline baseline.json
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+import common  # noqa: F401  (puts api/ and scripts/ on sys.path)
+import database
+import datagen
+from bench_validation import make_specs
+from english_classes import class_record, create_english_class, create_multiple_classes
+
+
+def prepare_database(source, scale):
+    """Path of a scratch database: a copy of ``source`` or a new datagen one"""
+    path = os.path.join(tempfile.mkdtemp(prefix="learnwa-bench-"), "bench.db")
+    if source:
+        with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+            src.backup(dst)
+        database.DB_PATH = path
+        database.init_db()
+    else:
+        datagen.generate(path, int(100_000 * scale), int(1_000_000 * scale), int(5_000_000 * scale),
+                         int(50_000 * scale), 10)
+        database.DB_PATH = path
+    return path
+
+
+def table_count(table):
+    with database.get_db() as conn:
+        return conn.execute(f"SELECT MAX(id) FROM {table}").fetchone()[0] or 0
+
+
+def quiz_spec(n, questions=10):
+    return {
+        "title": f"Bench quiz {n}", "topic": "benchmarks", "difficulty": "intermediate",
+        "questions": [{"question": f"Bench question {n}.{q}", "options": ["a", "b", "c", "d"],
+                       "correct_answer": "abcd"[q % 4], "explanation": ""} for q in range(questions)],
+    }
+
+
+def class_spec(n, capacity=20):
+    start = 7 * 60 + (n % 48) * 15
+    return {"name": f"Bench class {n}", "level": "Intermediate", "teacher": f"Bench teacher {n}",
+            "days": ["Monday", "Wednesday"], "start_time": f"{start // 60:02d}:{start % 60:02d}",
+            "end_time": f"{(start + 60) // 60:02d}:{(start + 60) % 60:02d}", "capacity": capacity}
+
+
+def build_benchmarks(rng, classes, quizzes):
+    """name -> (func(i), default iterations)"""
+    levels, teachers = datagen.LEVELS, max(1, classes // 20)
+    class_ids = [rng.randint(1, classes) for _ in range(4096)]
+    quiz_ids = [rng.randint(1, quizzes) for _ in range(4096)]
+    pick = lambda ids, i: ids[i % len(ids)]
+    since = (date.today() - timedelta(days=30)).isoformat()
+    get_all_classes = database.get_all_classes.uncached
+
+    pages = {"classes": None, "quizzes": None}
+
+    # Page functions go through the read cache; clearing it keeps them cold
+    def next_classes_page(i):
+        database.read_cache.clear()
+        rows, pages["classes"] = database.get_classes_page(100, pages["classes"], level=levels[0])
+        return rows
+
+    def next_quizzes_page(i):
+        database.read_cache.clear()
+        rows, pages["quizzes"] = database.get_quizzes_page(100, pages["quizzes"])
+        return rows
+
+    # Writes go to classes/quizzes made here, so they never fail on capacity
+    roomy = [c["id"] for c in database.create_classes([class_spec(-n, capacity=10**6) for n in range(1, 101)])[0]]
+    quiz_ids_w = [q["id"] for q in database.create_quizzes([quiz_spec(-n) for n in range(1, 11)])]
+    question_ids = {q["id"]: [x["id"] for x in q["questions"]]
+                    for q in (database.get_quiz.uncached(qid) for qid in quiz_ids_w)}
+    counter = iter(range(10**9))
+
+    def attempt_batch(i):
+        quiz_id = quiz_ids_w[i % len(quiz_ids_w)]
+        answers = [rng.randrange(4) for _ in range(10)]
+        correct = [a == q % 4 for q, a in enumerate(answers)]
+        return database.save_attempts(quiz_id, question_ids[quiz_id], [
+            {"student_name": f"Student {rng.randrange(1000)}", "answers": answers,
+             "correct": correct, "score": sum(correct)} for _ in range(100)])
+
+    valid_specs = make_specs(1000, invalid_ratio=0.0)
+    mixed_specs = make_specs(1000)
+
+    return {
+        # Reads
+        "get_all_classes[teacher]": (lambda i: get_all_classes(teacher=f"Teacher {i % teachers}"), 500),
+        "get_all_classes[day,time,limit=100]": (
+            lambda i: get_all_classes(day=database.WEEKDAYS[i % 7], starts_after=9 * 60, limit=100), 500),
+        "get_all_classes[warm]": (lambda i: database.get_all_classes(level=levels[0]), 2000),
+        "get_all_classes[limit=500]": (lambda i: get_all_classes(after_id=pick(class_ids, i), limit=500), 200),
+        "get_all_classes[limit=500,fields=name,days]": (
+            lambda i: get_all_classes(after_id=pick(class_ids, i), limit=500, fields=("id", "name", "days")), 200),
+        "get_all_classes[limit=100,include=students]": (
+            lambda i: get_all_classes(after_id=pick(class_ids, i), limit=100, include_students=True), 200),
+        "get_classes_page[100]": (next_classes_page, 500),
+        "iter_classes[1000 rows]": (
+            lambda i: sum(1 for _ in zip(range(1000), database.iter_classes(level=levels[i % 7]))), 50),
+        "get_class_by_id[cold]": (lambda i: database.get_class_by_id.uncached(pick(class_ids, i)), 5000),
+        "get_class_by_id[warm]": (lambda i: database.get_class_by_id(class_ids[0]), 20000),
+        "get_class_students": (lambda i: database.get_class_students(pick(class_ids, i)), 2000),
+        "get_all_quizzes[limit=100]": (lambda i: database.get_all_quizzes.uncached(limit=100), 500),
+        "get_quizzes_page[100]": (next_quizzes_page, 500),
+        "get_quiz[cold]": (lambda i: database.get_quiz.uncached(pick(quiz_ids, i)), 2000),
+        "get_quiz[warm]": (lambda i: database.get_quiz(quiz_ids[0]), 20000),
+        "search_quizzes_page[phrase]": (lambda i: database.search_quizzes_page("phrasal verbs", 20), 200),
+        "search_quizzes_page[prefix]": (lambda i: database.search_quizzes_page("kitch*", 20), 200),
+        "get_quiz_stats": (lambda i: database.get_quiz_stats(pick(quiz_ids, i)), 2000),
+        "get_fill_stats[level]": (lambda i: database.get_fill_stats("level"), 2000),
+        "get_enrollment_stats[30 days]": (lambda i: database.get_enrollment_stats(since=since), 1000),
+        # Writes
+        "create_class": (lambda i: database.create_class(class_spec(next(counter))), 500),
+        "create_classes[100]": (
+            lambda i: database.create_classes([class_spec(next(counter)) for _ in range(100)]), 50),
+        "enroll_student": (
+            lambda i: database.enroll_student(roomy[i % len(roomy)], f"Bench student {next(counter)}"), 1000),
+        "enroll_students[20k, roster sync]": (
+            lambda i: database.enroll_students([(roomy[n % len(roomy)], f"Bench student {next(counter)}")
+                                                for n in range(20000)]), 10),
+        "create_quizzes[10x10]": (lambda i: database.create_quizzes([quiz_spec(i) for _ in range(10)]), 100),
+        "save_attempts[100x10]": (attempt_batch, 100),
+        # Validation
+        "create_english_class": (lambda i: create_english_class(**valid_specs[i % 1000]), 20000),
+        "class_record": (lambda i: class_record(valid_specs[i % 1000]), 20000),
+        "create_multiple_classes[1000]": (lambda i: create_multiple_classes(mixed_specs), 50),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", type=Path, help="datagen database to copy (default: generate one)")
+    parser.add_argument("--scale", type=float, default=0.01, help="datagen scale when --db is not given")
+    parser.add_argument("--iterations", type=float, default=1.0, help="multiplier for every benchmark's iterations")
+    parser.add_argument("--only", help="run benchmarks whose name contains this text")
+    parser.add_argument("--seed", type=int, default=42)
+    common.add_result_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.db and not args.db.exists():
+        print(f"Error: {args.db} not found", file=sys.stderr)
+        return 1
+    path = prepare_database(args.db, args.scale)
+    classes, quizzes = table_count("classes"), table_count("quizzes")
+    print(f"Database: {path} ({classes:,} classes, {quizzes:,} quizzes)")
+
+    benchmarks = build_benchmarks(random.Random(args.seed), classes, quizzes)
+    results = {}
+    for name, (func, iterations) in benchmarks.items():
+        if args.only and args.only not in name:
+            continue
+        results[name] = common.measure(func, max(1, int(iterations * args.iterations)))
+    database.close_pools()
+    return common.finish(args, results, suite="database", classes=classes, quizzes=quizzes)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Throughput benchmark for quiz attempt grading
+
+Creates one quiz in a scratch database, then grades and stores batches of
+random submissions through grading.submit_attempts, reporting attempts per
+second for grading alone and for grading plus the batched writes.
+
+    python3 benchmarks/bench_grading.py --count 100000 --questions 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "api"))
+
+import database
+import grading
+
+
+def make_submissions(count, questions, students, seed=42):
+    rng = random.Random(seed)
+    return [
+        {"student_name": f"Student {rng.randrange(students)}",
+         "answers": [rng.randrange(4) for _ in range(questions)]}
+        for _ in range(count)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=5_000)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--students", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), "bench_grading.db")
+    database.init_db()
+    quiz = database.create_quizzes([{
+        "title": "Benchmark quiz",
+        "questions": [{"question": f"Q{i}", "options": ["a", "b", "c", "d"], "correct_answer": "abcd"[i % 4]}
+                      for i in range(args.questions)],
+    }])[0]
+    submissions = make_submissions(args.count, args.questions, args.students)
+    key = grading.get_answer_key(quiz["id"])
+    print(f"NumPy: {'yes' if grading.load_numpy() is not None else 'no (pure-Python fallback)'}")
+
+    started = time.perf_counter()
+    for offset in range(0, args.count, args.batch):
+        grading.grade_submissions(key, submissions[offset:offset + args.batch])
+    elapsed = time.perf_counter() - started
+    print(f"{'grade':<16} {args.count:>9} attempts  {elapsed:7.2f}s  {args.count / elapsed:>10,.0f} attempts/s")
+
+    started = time.perf_counter()
+    for offset in range(0, args.count, args.batch):
+        grading.submit_attempts(quiz["id"], submissions[offset:offset + args.batch])
+    elapsed = time.perf_counter() - started
+    print(f"{'grade + store':<16} {args.count:>9} attempts  {elapsed:7.2f}s  {args.count / elapsed:>10,.0f} attempts/s")
+
+
+if __name__ == "__main__":
+    main()
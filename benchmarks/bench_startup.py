@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Cold-start benchmark for the Learn.WA API
+
+Every sample is a fresh interpreter, as on a serverless cold start, timed
+from process launch to exit. Steps build on each other, so the differences
+show where startup time goes: interpreter, Flask, importing the app, the
+first request (which checks the schema version) and the first request
+against a new database (which runs every migration).
+
+    python3 benchmarks/bench_startup.py --runs 20 --save startup.json
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import common
+
+PRELUDE = f"""
+import sys
+sys.path[:0] = [{str(common.ROOT / 'api')!r}, {str(common.ROOT / 'scripts')!r}]
+import database
+database.DB_PATH = sys.argv[1]
+"""
+FIRST_REQUEST = """
+import server
+assert server.app.test_client().get('/api/classes?limit=1').status_code == 200
+"""
+
+STEPS = {
+    "python": "pass",
+    "import flask": "import flask, flask_cors",
+    "import database + init_db": PRELUDE + "database.init_db()",
+    "import server": PRELUDE + "import server",
+    "first request": PRELUDE + FIRST_REQUEST,
+    "first request, new database": PRELUDE + FIRST_REQUEST,
+}
+
+
+def run_step(code, db_path, runs, fresh_db):
+    latencies = []
+    started = time.perf_counter()
+    for n in range(runs):
+        path = f"{db_path}.{n}" if fresh_db else db_path
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code, path], check=True, cwd=os.path.dirname(db_path))
+        latencies.append(time.perf_counter() - t0)
+    return common.summarize(latencies, time.perf_counter() - started)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="fresh processes per step")
+    common.add_result_arguments(parser)
+    args = parser.parse_args(argv)
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="learnwa-startup-"), "startup.db")
+    subprocess.run([sys.executable, "-c", PRELUDE + "database.init_db()", db_path], check=True)
+
+    results = {}
+    for name, code in STEPS.items():
+        results[name] = run_step(code, db_path, args.runs, fresh_db=name.endswith("new database"))
+    return common.finish(args, results, suite="startup", runs=args.runs)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Write throughput with one shared database versus one shard per tenant
+
+``--threads`` writers each commit ``--writes`` small transactions
+(enroll_student), first all against one tenant's shard and then each
+against its own. With a shared file every commit queues on one write lock;
+with shards the commits only share the interpreter.
+
+    python3 benchmarks/bench_tenants.py --threads 8 --writes 2000
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+
+import common
+import database
+
+
+def run(tenants, writes):
+    """One writer thread per entry of ``tenants``; returns per-write latencies and elapsed seconds"""
+    latencies = [[] for _ in tenants]
+    barrier = threading.Barrier(len(tenants) + 1)
+
+    def writer(n, tenant, class_id):
+        database.set_tenant(tenant)
+        clock = time.perf_counter
+        barrier.wait()
+        for i in range(writes):
+            t0 = clock()
+            database.enroll_student(class_id, f"Student {n}.{i}")
+            latencies[n].append(clock() - t0)
+
+    class_ids = []
+    for tenant in tenants:
+        with database.use_database(database.tenant_path(tenant)):
+            class_ids.append(database.create_class({
+                "name": f"Class {len(class_ids)}", "level": "Beginner", "teacher": f"Teacher {len(class_ids)}",
+                "days": ["Monday"], "start_time": "09:00", "end_time": "10:00", "capacity": 10**9}))
+    threads = [threading.Thread(target=writer, args=(n, tenant, class_id))
+               for n, (tenant, class_id) in enumerate(zip(tenants, class_ids))]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return [latency for per_thread in latencies for latency in per_thread], time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=2000, help="transactions per thread")
+    common.add_result_arguments(parser)
+    args = parser.parse_args(argv)
+
+    database.TENANTS_DIR = tempfile.mkdtemp(prefix="learnwa-tenants-")
+    for n in range(args.threads):
+        database.create_tenant(f"school-{n}")
+
+    results = {}
+    for label, tenants in ((f"{args.threads} writers, 1 shard", ["school-0"] * args.threads),
+                           (f"{args.threads} writers, {args.threads} shards",
+                            [f"school-{n}" for n in range(args.threads)])):
+        latencies, elapsed = run(tenants, args.writes)
+        results[label] = common.summarize(latencies, elapsed)
+    database.close_pools()
+    return common.finish(args, results, suite="tenants", threads=args.threads)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for EnglishClass validation throughput
+
+Compares the one-at-a-time path (create_english_class, raising on the first
+error) with the batch validator (create_multiple_classes). Specs are fed in
+batches so memory stays bounded at 1M specs.
+
+    python3 benchmarks/bench_validation.py --count 1000000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from english_classes import create_english_class, create_multiple_classes, VALID_LEVELS, VALID_DAYS
+
+LEVELS = sorted(VALID_LEVELS)
+DAYS = sorted(VALID_DAYS)
+
+
+def make_specs(count, invalid_ratio=0.1, seed=42):
+    """Build a pool of ``count`` specs, roughly ``invalid_ratio`` of them invalid"""
+    rng = random.Random(seed)
+    specs = []
+    for i in range(count):
+        start = rng.randrange(6 * 60, 20 * 60, 15)
+        spec = {
+            "name": f"Class {i}",
+            "level": rng.choice(LEVELS),
+            "teacher": f"Teacher {rng.randrange(500)}",
+            "days": ", ".join(rng.sample(DAYS, rng.randint(1, 3))) if i % 2 else rng.sample(DAYS, 2),
+            "start_time": f"{start // 60:02d}:{start % 60:02d}",
+            "end_time": f"{(start + 90) // 60:02d}:{(start + 90) % 60:02d}",
+            "capacity": rng.randint(5, 30),
+        }
+        if rng.random() < invalid_ratio:
+            spec[rng.choice(["level", "start_time", "capacity"])] = "bogus"
+        specs.append(spec)
+    return specs
+
+
+def bench_single(pool, count, batch):
+    errors = 0
+    started = time.perf_counter()
+    for offset in range(0, count, batch):
+        for i in range(offset, min(offset + batch, count)):
+            try:
+                create_english_class(**pool[i % len(pool)])
+            except ValueError:
+                errors += 1
+    return time.perf_counter() - started, errors
+
+
+def bench_batch(pool, count, batch):
+    errors = 0
+    started = time.perf_counter()
+    for offset in range(0, count, batch):
+        specs = [pool[i % len(pool)] for i in range(offset, min(offset + batch, count))]
+        _, spec_errors = create_multiple_classes(specs)
+        errors += sum(1 for e in spec_errors if e)
+    return time.perf_counter() - started, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--pool", type=int, default=50_000, help="distinct specs cycled through")
+    args = parser.parse_args(argv)
+
+    pool = make_specs(min(args.pool, args.count))
+    for label, bench in (("create_english_class", bench_single), ("create_multiple_classes", bench_batch)):
+        elapsed, errors = bench(pool, args.count, args.batch)
+        print(f"{label:<24} {args.count:>9} specs  {elapsed:7.2f}s  {args.count / elapsed:>10,.0f} specs/s  ({errors} invalid)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Retry storms versus waitlist long-polling for a full class
+
+``--students`` clients want seats in a full class while one seat is freed
+every ``--interval`` seconds. With retries each client re-sends the enroll
+request every ``--retry`` seconds until it gets in; with the waitlist each
+joins once and long-polls its status. Latency is from a seat being freed
+to a client learning it has one; ``requests`` is the load it took.
+
+    python3 benchmarks/bench_waitlist.py --students 100 --interval 0.02
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import common
+import database
+
+
+def run(client_factory, class_id, students, interval, student_loop):
+    """Free one seat per ``interval`` while every student runs ``student_loop``; returns (handoffs, requests, elapsed)"""
+    admitted, requests = [], [0] * students
+    released = []
+    barrier = threading.Barrier(students + 1)
+
+    def student(n):
+        client = client_factory()
+        barrier.wait()
+        requests[n] = student_loop(client, f"Student {n}")
+        admitted.append(time.perf_counter())
+
+    threads = [threading.Thread(target=student, args=(n,)) for n in range(students)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    admin = client_factory()
+    for n in range(students):
+        time.sleep(interval)
+        released.append(time.perf_counter())
+        admin.delete(f"/api/classes/{class_id}/enroll", json={"student_name": f"Holder {n}"})
+    for thread in threads:
+        thread.join()
+    # Seats go out in release order, so the k-th admission answers the k-th release
+    handoffs = [max(0.0, a - r) for a, r in zip(sorted(admitted), released)]
+    return handoffs, sum(requests), time.perf_counter() - started
+
+
+def retrying(class_id, retry):
+    def loop(client, name):
+        sent = 0
+        while True:
+            sent += 1
+            if client.post(f"/api/classes/{class_id}/enroll", json={"student_name": name}).status_code == 200:
+                return sent
+            time.sleep(retry)
+    return loop
+
+
+def long_polling(class_id):
+    def loop(client, name):
+        status = client.post(f"/api/classes/{class_id}/waitlist", json={"student_name": name}).json
+        sent = 1
+        state = status["status"]
+        while state != "enrolled":
+            sent += 1
+            state = client.get(f"/api/classes/{class_id}/waitlist/status", query_string={
+                "student_name": name, "after": state, "wait": 30}).json["status"]
+        return sent
+    return loop
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=50, help="clients waiting for a seat")
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds between freed seats")
+    parser.add_argument("--retry", type=float, default=0.05, help="retry delay for the retrying clients")
+    common.add_result_arguments(parser)
+    args = parser.parse_args(argv)
+
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="learnwa-waitlist-"), "waitlist.db")
+    import server
+    results = {}
+    for label, make_loop in ((f"retry every {args.retry * 1000:g} ms", lambda c: retrying(c, args.retry)),
+                             ("waitlist + long-poll", long_polling)):
+        client = server.app.test_client()
+        class_id = client.post("/api/classes", json={
+            "name": label, "level": "Beginner", "teacher": label, "days": ["Monday"],
+            "start_time": "09:00", "end_time": "10:00", "capacity": args.students}).json["id"]
+        database.enroll_students([(class_id, f"Holder {n}") for n in range(args.students)])
+        handoffs, requests, elapsed = run(server.app.test_client, class_id, args.students, args.interval,
+                                          make_loop(class_id))
+        results[label] = {**common.summarize(handoffs, elapsed), "requests": requests,
+                          "requests_per_seat": round(requests / args.students, 1)}
+        print(f"{label}: {requests} requests for {args.students} seats", file=sys.stderr)
+    database.close_pools()
+    return common.finish(args, results, suite="waitlist", students=args.students, interval=args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Shared helpers for the benchmark scripts: timing, percentiles and baseline comparison
+
+Every benchmark produces ``{name: {"ops_per_sec", "p50_ms", "p95_ms", "p99_ms", ...}}``.
+Results are saved as JSON with ``--save`` and checked against a saved run with
+``--baseline``; a benchmark whose throughput drops or whose p95 grows by more
+than the tolerance is reported as a regression (exit status 1).
+"""
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT / "api"))
+
+DEFAULT_TOLERANCE = 0.15
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def summarize(latencies: List[float], elapsed: float, operations: Optional[int] = None) -> Dict:
+    """Throughput and latency percentiles (ms) for per-operation latencies in seconds"""
+    ordered = sorted(latencies)
+    operations = len(ordered) if operations is None else operations
+    return {
+        "operations": operations,
+        "ops_per_sec": round(operations / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(1000 * percentile(ordered, 0.50), 4),
+        "p95_ms": round(1000 * percentile(ordered, 0.95), 4),
+        "p99_ms": round(1000 * percentile(ordered, 0.99), 4),
+    }
+
+
+def measure(func: Callable[[int], object], iterations: int, warmup: int = 10) -> Dict:
+    """Call ``func(i)`` ``iterations`` times and summarize the per-call latencies"""
+    for i in range(min(warmup, iterations)):
+        func(i)
+    latencies = []
+    clock = time.perf_counter
+    started = clock()
+    for i in range(iterations):
+        t0 = clock()
+        func(i)
+        latencies.append(clock() - t0)
+    return summarize(latencies, clock() - started)
+
+
+def print_results(results: Dict[str, Dict]) -> None:
+    width = max((len(name) for name in results), default=10)
+    print(f"{'benchmark':<{width}}  {'ops/s':>12}  {'p50 ms':>9}  {'p95 ms':>9}  {'p99 ms':>9}")
+    for name, result in results.items():
+        print(f"{name:<{width}}  {result['ops_per_sec']:>12,.1f}  {result['p50_ms']:>9.3f}  "
+              f"{result['p95_ms']:>9.3f}  {result['p99_ms']:>9.3f}")
+
+
+def save_results(path: Path, results: Dict[str, Dict], **meta) -> None:
+    payload = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                 "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), **meta},
+        "results": results,
+    }
+    Path(path).write_text(json.dumps(payload, indent=2, sort_keys=True), encoding="utf-8")
+    print(f"Saved results to {path}")
+
+
+def compare_results(current: Dict[str, Dict], baseline: Dict[str, Dict],
+                    tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Human-readable regressions of ``current`` against ``baseline``"""
+    regressions = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base["ops_per_sec"] and result["ops_per_sec"] < base["ops_per_sec"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['ops_per_sec']:,.1f} ops/s "
+                               f"vs baseline {base['ops_per_sec']:,.1f}")
+        if base["p95_ms"] and result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']:.3f} ms vs baseline {base['p95_ms']:.3f} ms")
+    return regressions
+
+
+def load_results(path: Path) -> Dict[str, Dict]:
+    return json.loads(Path(path).read_text(encoding="utf-8"))["results"]
+
+
+def add_result_arguments(parser) -> None:
+    parser.add_argument("--save", type=Path, help="write results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare against a saved results file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown before a result counts as a regression")
+
+
+def finish(args, results: Dict[str, Dict], **meta) -> int:
+    """Print, optionally save and compare; returns the process exit status"""
+    print_results(results)
+    if args.save:
+        save_results(args.save, results, **meta)
+    if args.baseline:
+        regressions = compare_results(results, load_results(args.baseline), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Synthetic data generator for Learn.WA benchmarks
+
+Builds a database through ``database.init_db`` and fills it with
+executemany: classes with realistic schedules, students, enrollments spread
+over the past year (class counts kept consistent) and quizzes with
+questions. Search indexes and analytics tables are rebuilt once at the end
+instead of being maintained row by row. Output is deterministic per seed.
+
+    python3 benchmarks/datagen.py --db bench.db                # full size
+    python3 benchmarks/datagen.py --db small.db --scale 0.01   # 1% of it
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "api"))
+
+import database
+from english_classes import VALID_LEVELS
+
+LEVELS = sorted(VALID_LEVELS)
+TOPICS = [
+    "past simple", "present perfect", "phrasal verbs", "conditionals", "reported speech",
+    "passive voice", "articles", "prepositions of time", "modal verbs", "relative clauses",
+    "future forms", "gerunds and infinitives", "comparatives", "collocations", "idioms",
+    "business email", "travel vocabulary", "food and cooking", "job interviews", "pronunciation",
+]
+WORDS = ("apple bridge garden window teacher market river winter letter ticket "
+         "meeting holiday kitchen journey answer weather airport library doctor concert").split()
+DIFFICULTIES = ("beginner", "intermediate", "advanced")
+FOCUS_MODES = ("comprehension", "grammar", "vocabulary", "speaking")
+CHUNK = 50_000
+
+
+def chunks(rows, size=CHUNK):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def class_rows(count, per_class, seed):
+    rng = random.Random(seed)
+    teachers = max(1, count // 20)
+    for i in range(count):
+        days = sorted(rng.sample(range(7), rng.randint(1, 3)))
+        start = rng.randrange(7 * 60, 20 * 60, 15)
+        end = start + rng.choice((60, 90, 120))
+        mask = sum(1 << d for d in days)
+        names = database.mask_to_days(mask)
+        yield (f"Class {i}", rng.choice(LEVELS), f"Teacher {i % teachers}",
+               "[" + ", ".join(f'"{d}"' for d in names) + "]",
+               f"{start // 60:02d}:{start % 60:02d}", f"{end // 60:02d}:{end % 60:02d}",
+               per_class + rng.randint(0, 10), mask, start, end)
+
+
+def enrollment_rows(classes, students, total, now):
+    """(class_id, student_id, enrolled_at) with distinct students per class"""
+    per_class, extra = divmod(total, classes)
+    year = 365 * 24 * 3600
+    n = 0
+    for class_id in range(1, classes + 1):
+        for k in range(per_class + (class_id <= extra)):
+            student_id = ((class_id - 1) * (per_class + 1) + k) % students + 1
+            enrolled_at = now - timedelta(seconds=(n * 7919) % year)
+            yield class_id, student_id, enrolled_at.strftime("%Y-%m-%d %H:%M:%S")
+            n += 1
+
+
+def quiz_rows(count, seed, created_at):
+    rng = random.Random(seed)
+    for i in range(count):
+        topic = rng.choice(TOPICS)
+        difficulty = rng.choice(DIFFICULTIES)
+        yield (f"{topic.title()} practice {i}", topic, difficulty, rng.choice(FOCUS_MODES),
+               f'{{"difficulty": "{difficulty}", "estimatedTime": 10}}', created_at)
+
+
+def question_rows(quizzes, per_quiz, seed):
+    rng = random.Random(seed)
+    for quiz_id in range(1, quizzes + 1):
+        for number in range(per_quiz):
+            words = rng.sample(WORDS, 4)
+            options = "[" + ", ".join(f'"{w}"' for w in words) + "]"
+            yield (quiz_id, f"Question {number + 1}: which word completes the {rng.choice(WORDS)} sentence?",
+                   options, rng.choice(words), f"The {words[0]} example shows the rule.")
+
+
+def insert(conn, label, sql, rows):
+    started = time.perf_counter()
+    total = 0
+    for batch in chunks(rows):
+        with conn:
+            conn.executemany(sql, batch)
+        total += len(batch)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<12} {total:>10,} rows  {elapsed:7.2f}s  {total / elapsed if elapsed else 0:>10,.0f} rows/s")
+    return total
+
+
+def generate(path, classes, students, enrollments, quizzes, questions, seed=42):
+    """Create and fill the database at ``path``; it must not exist yet"""
+    if classes and enrollments // classes > students:
+        raise ValueError("more enrollments per class than there are students")
+    database.DB_PATH = str(path)
+    database.init_db()
+
+    pool = database.get_pool()
+    conn = pool.acquire()
+    try:
+        # Indexes are rebuilt wholesale at the end rather than trigger by trigger
+        for trigger in ("quizzes_fts_insert", "questions_fts_insert"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        now = datetime.now().replace(microsecond=0)
+        per_class = enrollments // classes if classes else 0
+
+        insert(conn, "classes", """
+            INSERT INTO classes (name, level, teacher, days, start_time, end_time, capacity,
+                                 day_mask, start_minute, end_minute)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, class_rows(classes, per_class + 1, seed))
+        insert(conn, "students", "INSERT INTO students (name) VALUES (?)",
+               ((f"Student {i}",) for i in range(students)))
+        insert(conn, "enrollments", "INSERT INTO enrollments (class_id, student_id, enrolled_at) VALUES (?, ?, ?)",
+               enrollment_rows(classes, students, enrollments, now) if classes else ())
+        with conn:
+            conn.execute("""
+                UPDATE classes SET enrolled_count = (SELECT COUNT(*) FROM enrollments WHERE class_id = classes.id)
+            """)
+        insert(conn, "quizzes", """
+            INSERT INTO quizzes (title, topic, difficulty, focus_mode, metadata, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, quiz_rows(quizzes, seed, now.strftime("%Y-%m-%d %H:%M:%S")))
+        insert(conn, "questions", """
+            INSERT INTO questions (quiz_id, text, options, correct_answer, explanation) VALUES (?, ?, ?, ?, ?)
+        """, question_rows(quizzes, questions, seed))
+    finally:
+        pool.release(conn)
+
+    # rebuild_search_index also puts the dropped triggers back
+    for label, step in (("search index", database.rebuild_search_index), ("stats", database.rebuild_stats)):
+        started = time.perf_counter()
+        step()
+        print(f"{label:<12} {'':>10}       {time.perf_counter() - started:7.2f}s")
+    database.close_pools()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", type=Path, default=Path("bench.db"))
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier applied to every count")
+    parser.add_argument("--classes", type=int, default=100_000)
+    parser.add_argument("--students", type=int, default=1_000_000)
+    parser.add_argument("--enrollments", type=int, default=5_000_000)
+    parser.add_argument("--quizzes", type=int, default=50_000)
+    parser.add_argument("--questions", type=int, default=10, help="questions per quiz")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="overwrite an existing database")
+    args = parser.parse_args(argv)
+
+    if args.db.exists():
+        if not args.force:
+            print(f"Error: {args.db} exists (use --force to overwrite)", file=sys.stderr)
+            return 1
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(f"{args.db}{suffix}"):
+                os.remove(f"{args.db}{suffix}")
+
+    def scaled(n):
+        return max(1, int(n * args.scale))
+
+    started = time.perf_counter()
+    generate(args.db, scaled(args.classes), scaled(args.students), scaled(args.enrollments),
+             scaled(args.quizzes), args.questions, args.seed)
+    print(f"Generated {args.db} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
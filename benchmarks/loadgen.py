@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Closed-loop HTTP load generator for the Learn.WA API
+
+Each of ``--concurrency`` workers sends a request drawn from a weighted
+endpoint mix, waits for the response and immediately sends the next, for
+``--duration`` seconds after a warm-up. Throughput and p50/p95/p99 latency
+are reported per endpoint, plus the total.
+
+Without ``--url`` the Flask app is served in-process (werkzeug, threaded)
+on a scratch copy of ``--db``. Clients and server then share one
+interpreter, so absolute numbers are pessimistic; for release comparisons
+run the server on its own and point ``--url`` at it.
+
+    python3 benchmarks/loadgen.py --db bench.db --duration 30 --save load.json
+    python3 benchmarks/loadgen.py --url http://127.0.0.1:5000 --baseline load.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+import common
+from bench_database import prepare_database
+from datagen import LEVELS, TOPICS
+
+
+class Client:
+    """Keep-alive JSON client for one worker"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+
+    def request(self, method, path, body=None):
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload else {}
+        try:
+            self.conn.request(method, path, payload, headers)
+            response = self.conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            return 0, b""
+
+
+def setup(url, rng):
+    """Ids to read from, plus a roomy class set and a quiz for the write endpoints"""
+    client = Client(url)
+    _, body = client.request("GET", "/api/classes?limit=1000")
+    class_ids = [c["id"] for c in json.loads(body)["items"]]
+    _, body = client.request("GET", "/api/quizzes?limit=1000")
+    quiz_ids = [q["id"] for q in json.loads(body)["items"]]
+
+    run = f"{time.time():.0f}-{rng.randrange(10**6)}"
+    _, body = client.request("POST", "/api/classes/bulk", {"classes": [
+        {"name": f"Load class {run}.{n}", "level": "Intermediate", "teacher": f"Load teacher {run}.{n}",
+         "days": ["Saturday"], "start_time": "10:00", "end_time": "11:00", "capacity": 10**6}
+        for n in range(20)]})
+    roomy = [c["id"] for c in json.loads(body)["classes"]]
+    _, body = client.request("POST", "/api/quizzes", {
+        "title": f"Load quiz {run}", "topic": "load testing",
+        "questions": [{"question": f"Load question {q}", "options": ["a", "b", "c", "d"],
+                       "correct_answer": "abcd"[q % 4]} for q in range(10)]})
+    write_quiz = json.loads(body)["id"]
+    if not (class_ids and quiz_ids and roomy):
+        raise RuntimeError("the target database has no classes or quizzes (run datagen.py first)")
+    return class_ids, quiz_ids, roomy, write_quiz
+
+
+def endpoint_mix(class_ids, quiz_ids, roomy, write_quiz, run):
+    """[(weight, name, request factory)]; factories take the worker's rng and return (method, path, body)"""
+    counter = iter(range(10**9))
+    return [
+        (20, "GET /api/classes?level&limit",
+         lambda rng: ("GET", f"/api/classes?level={quote(rng.choice(LEVELS))}&limit=50", None)),
+        (25, "GET /api/classes/<id>", lambda rng: ("GET", f"/api/classes/{rng.choice(class_ids)}", None)),
+        (10, "GET /api/classes/<id>/students",
+         lambda rng: ("GET", f"/api/classes/{rng.choice(class_ids)}/students", None)),
+        (10, "GET /api/quizzes?limit", lambda rng: ("GET", "/api/quizzes?limit=50", None)),
+        (15, "GET /api/quizzes/<id>", lambda rng: ("GET", f"/api/quizzes/{rng.choice(quiz_ids)}", None)),
+        (5, "GET /api/quizzes/search",
+         lambda rng: ("GET", f"/api/quizzes/search?q={quote(rng.choice(TOPICS))}", None)),
+        (3, "GET /api/stats/classes", lambda rng: ("GET", "/api/stats/classes?by=level", None)),
+        (6, "POST /api/classes/<id>/enroll",
+         lambda rng: ("POST", f"/api/classes/{rng.choice(roomy)}/enroll",
+                      {"student_name": f"Load student {run}.{next(counter)}"})),
+        (6, "POST /api/quizzes/<id>/attempts",
+         lambda rng: ("POST", f"/api/quizzes/{write_quiz}/attempts",
+                      {"student_name": f"Student {rng.randrange(10_000)}",
+                       "answers": [rng.randrange(4) for _ in range(10)]})),
+    ]
+
+
+def worker(url, mix, seed, start_at, stop_at, samples):
+    rng = random.Random(seed)
+    client = Client(url)
+    weights = [weight for weight, _, _ in mix]
+    clock = time.perf_counter
+    while True:
+        _, name, make = rng.choices(mix, weights)[0]
+        method, path, body = make(rng)
+        t0 = clock()
+        status, _ = client.request(method, path, body)
+        t1 = clock()
+        if t1 >= stop_at:
+            return
+        if t0 >= start_at:
+            samples.append((name, t1 - t0, status))
+
+
+def run_load(url, concurrency, duration, warmup, seed):
+    rng = random.Random(seed)
+    mix = endpoint_mix(*setup(url, rng), run=f"{time.time():.0f}")
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+    per_worker = [[] for _ in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(url, mix, seed + n, start_at, stop_at, per_worker[n]))
+               for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    by_endpoint, errors = defaultdict(list), defaultdict(int)
+    for samples in per_worker:
+        for name, latency, status in samples:
+            by_endpoint[name].append(latency)
+            if not 200 <= status < 300:
+                errors[name] += 1
+    results = {}
+    for _, name, _ in mix:
+        if by_endpoint[name]:
+            results[name] = {**common.summarize(by_endpoint[name], duration), "errors": errors[name]}
+    everything = [latency for latencies in by_endpoint.values() for latency in latencies]
+    results["all"] = {**common.summarize(everything, duration), "errors": sum(errors.values())}
+    return results
+
+
+def serve_in_process(db, scale=0.01):
+    """Start the app on an ephemeral port; returns its base URL"""
+    prepare_database(db, scale)
+    from werkzeug.serving import make_server
+    import server
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no access log line per request
+    httpd = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{httpd.server_port}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="base URL of a running server (default: serve in-process)")
+    parser.add_argument("--db", type=Path, help="datagen database to copy for the in-process server "
+                        "(default: generate a small one)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before that")
+    parser.add_argument("--seed", type=int, default=42)
+    common.add_result_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.db and not args.db.exists():
+        print(f"Error: {args.db} not found", file=sys.stderr)
+        return 1
+    url = args.url or serve_in_process(args.db)
+    print(f"Target: {url}  concurrency={args.concurrency}  duration={args.duration:g}s")
+    results = run_load(url, args.concurrency, args.duration, args.warmup, args.seed)
+    failed = results["all"]["errors"]
+    if failed:
+        print(f"Warning: {failed} requests failed", file=sys.stderr)
+    return common.finish(args, results, suite="load", url=url if args.url else "in-process",
+                         concurrency=args.concurrency, duration=args.duration)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
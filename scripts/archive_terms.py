@@ -0,0 +1,38 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "api"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move classes from finished terms (and their enrollments) into the archive database")
+    parser.add_argument("--before", required=True, help="archive classes created before this date (YYYY-MM-DD)")
+    parser.add_argument("--batch-size", type=int, default=500, help="classes moved per transaction")
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    parser.add_argument("--db", help="database file (defaults to database.DB_PATH)")
+    parser.add_argument("--dir", default=os.environ.get("LEARNWA_TENANTS_DIR"),
+                        help="archive every tenant shard in this directory instead (defaults to $LEARNWA_TENANTS_DIR)")
+    args = parser.parse_args(argv)
+    if args.batch_size < 1:
+        print("Error: --batch-size must be at least 1", file=sys.stderr)
+        return 1
+
+    import database
+    if args.db: database.DB_PATH = args.db
+    if args.dir and not args.db: database.TENANTS_DIR = args.dir
+    paths = [info["path"] for info in database.list_tenants()] if args.dir and not args.db else [database.DB_PATH]
+
+    for path in paths:
+        with database.use_database(path):
+            database.init_db()
+            started = time.perf_counter()
+            totals = database.archive_classes(args.before, args.batch_size, args.pause)
+        print(f"{path}: archived {totals['archived']} classes and {totals['enrollments']} enrollments "
+              f"in {totals['batches']} batches ({totals['skipped']} changed meanwhile, left live) "
+              f"in {time.perf_counter() - started:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
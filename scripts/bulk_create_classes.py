@@ -1,13 +1,47 @@
-import json
+import argparse
+import sys
 from pathlib import Path
-from english_classes import create_multiple_classes
+from english_classes import class_record
+from spec_stream import DEFAULT_CHUNK_SIZE, import_class_specs
 
 # Correctly locate the JSON file relative to the script's location
 SPECS_PATH = Path(__file__).parent / "class_specs.json"
+sys.path.insert(0, str(Path(__file__).parent.parent / "api"))
 
-with open(SPECS_PATH, "r", encoding="utf-8") as f:
-    specs = json.load(f)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream class specs (JSON array or NDJSON) into the database")
+    parser.add_argument("path", nargs="?", default=SPECS_PATH, type=Path)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="specs written per transaction")
+    parser.add_argument("--offset", type=int, default=0, help="resume from this spec index")
+    parser.add_argument("--db", help="database file (defaults to database.DB_PATH)")
+    parser.add_argument("--dry-run", action="store_true", help="validate only, write nothing")
+    args = parser.parse_args(argv)
 
-all_classes = create_multiple_classes(specs)
-for cls in all_classes:
-    print(f"Created: {cls.name} with {cls.teacher}")
+    import database
+    import schedule
+    if args.db: database.DB_PATH = args.db
+
+    def validate_only(specs):
+        created, rejected = [], []
+        for index, spec in enumerate(specs):
+            try: created.append(class_record(spec))
+            except KeyError as e: rejected.append({"index": index, "error": f"Missing field: {e.args[0]}"})
+            except (ValueError, TypeError) as e: rejected.append({"index": index, "error": str(e)})
+        return created, rejected
+
+    def write(specs):
+        # Through the schedule so teachers are never double-booked
+        return schedule.create_classes(specs, validate=class_record)
+
+    if not args.dry_run: database.init_db()
+
+    def report(state):
+        for item in state.chunk_errors: print(f"Rejected #{item['index']}: {item['error']}", file=sys.stderr)
+        print(f"{state.processed} processed, {state.created} created, {state.rejected} rejected (next offset {state.next_offset})")
+
+    state = import_class_specs(args.path, validate_only if args.dry_run else write,
+                               chunk_size=args.chunk_size, offset=args.offset, progress=report)
+    print(f"Done: {state.created} classes {'validated' if args.dry_run else 'created'}, {state.rejected} rejected")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,57 @@
 #!/usr/bin/env python3
 import re
+from functools import lru_cache
 from dataclasses import dataclass, field
-from typing import List, Dict, Iterable, Optional, Union, Any
+from typing import List, Dict, Iterable, Optional, Union, Any, Tuple
 
 VALID_LEVELS = {"Beginner", "Elementary", "Pre-Intermediate", "Intermediate", "Upper-Intermediate", "Advanced", "Proficient"}
 VALID_DAYS = {"Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"}
 
-@dataclass
+# Shared lookups so validation never rebuilds strings or recompiles patterns
+_DAY_LOOKUP = {d.lower(): d for d in VALID_DAYS}
+_DAY_SPLIT = re.compile(r"[,;]+")
+# Every valid "HH:MM" mapped to minutes of the day: one dict probe per time
+_MINUTES = {f"{h:02d}:{m:02d}": h * 60 + m for h in range(24) for m in range(60)}
+_FIELDS = frozenset({"name", "level", "teacher", "days", "start_time", "end_time", "capacity"})
+_ALLOWED_FIELDS = _FIELDS | {"syllabus"}
+
+def time_to_minutes(value: Any) -> Optional[int]:
+    """Parse "HH:MM" (00:00-23:59) into minutes of the day; None if malformed."""
+    return _MINUTES.get(value) if isinstance(value, str) else None
+
+@lru_cache(maxsize=4096)
+def _split_day_string(days: str) -> Tuple[str, ...]:
+    return tuple(d.strip() for d in _DAY_SPLIT.split(days))
+
+def split_days(days: Union[str, Iterable[str]]) -> List[str]:
+    return list(_split_day_string(days)) if isinstance(days, str) else list(days)
+
+def _normalize_day(day: Any) -> Any:
+    if not isinstance(day, str): return day
+    day = day.strip()
+    return _DAY_LOOKUP.get(day.lower()) or day.capitalize()
+
+def _check(level, days, start_time, end_time, capacity) -> Tuple[List[str], Optional[int], Optional[int], List[str]]:
+    """Validate one class; returns (normalized days, start minutes, end minutes, errors)."""
+    normalized = [d if isinstance(d, str) and d in VALID_DAYS else _normalize_day(d) for d in days]
+    start = _MINUTES.get(start_time) if isinstance(start_time, str) else None
+    end = _MINUTES.get(end_time) if isinstance(end_time, str) else None
+    # Type checks first: JSON lists/dicts are unhashable and would raise in the set lookups
+    level_ok = isinstance(level, str) and level in VALID_LEVELS
+    days_ok = all(isinstance(d, str) and d in VALID_DAYS for d in normalized)
+    if (level_ok and days_ok and start is not None and end is not None and start < end
+            and isinstance(capacity, int) and capacity > 0):
+        return normalized, start, end, []
+    errors = []
+    if not level_ok: errors.append(f"Invalid level: {level}")
+    if not days_ok: errors.append(f"Invalid days: {normalized}")
+    if start is None: errors.append(f"Invalid start_time: {start_time}")
+    if end is None: errors.append(f"Invalid end_time: {end_time}")
+    if start is not None and end is not None and end <= start: errors.append("end_time must be after start_time")
+    if not isinstance(capacity, int) or capacity <= 0: errors.append("capacity must be a positive integer")
+    return normalized, start, end, errors
+
+@dataclass(slots=True)
 class EnglishClass:
     name: str
     level: str
@@ -17,15 +62,22 @@ class EnglishClass:
     capacity: int
     syllabus: List[str] = field(default_factory=list)
     students: List[str] = field(default_factory=list, init=False)
+    start_minutes: int = field(default=0, init=False, repr=False, compare=False)
+    end_minutes: int = field(default=0, init=False, repr=False, compare=False)
 
     def __post_init__(self):
-        if self.level not in VALID_LEVELS: raise ValueError(f"Invalid level: {self.level}")
-        self.days = [d.strip().capitalize() for d in self.days]
-        if any(d not in VALID_DAYS for d in self.days): raise ValueError(f"Invalid days: {self.days}")
-        if not re.match(r"^(?:[01]\d|2[0-3]):[0-5]\d$", self.start_time): raise ValueError(f"Invalid start_time: {self.start_time}")
-        if not re.match(r"^(?:[01]\d|2[0-3]):[0-5]\d$", self.end_time): raise ValueError(f"Invalid end_time: {self.end_time}")
-        if self.end_time <= self.start_time: raise ValueError("end_time must be after start_time")
-        if not isinstance(self.capacity, int) or self.capacity <= 0: raise ValueError("capacity must be a positive integer")
+        self.days, start, end, errors = _check(self.level, self.days, self.start_time, self.end_time, self.capacity)
+        if errors: raise ValueError(errors[0])
+        self.start_minutes, self.end_minutes = start, end
+
+    @classmethod
+    def _from_checked(cls, spec: Dict[str, Any], days: List[str], start: int, end: int) -> "EnglishClass":
+        obj = object.__new__(cls)
+        obj.name, obj.level, obj.teacher, obj.days = spec["name"], spec["level"], spec["teacher"], days
+        obj.start_time, obj.end_time, obj.capacity = spec["start_time"], spec["end_time"], spec["capacity"]
+        obj.syllabus, obj.students = list(spec.get("syllabus", ())), []
+        obj.start_minutes, obj.end_minutes = start, end
+        return obj
 
     def add_student(self, name: str) -> bool:
         if len(self.students) >= self.capacity: return False
@@ -34,8 +86,42 @@ class EnglishClass:
 
 def create_english_class(**kwargs) -> EnglishClass:
     if isinstance(kwargs.get("days"), str):
-        kwargs["days"] = [d.strip() for d in re.split(r"[,;]+", kwargs["days"])]
+        kwargs["days"] = split_days(kwargs["days"])
     return EnglishClass(**kwargs)
 
-def create_multiple_classes(specs: Iterable[Dict[str, Any]]) -> List[EnglishClass]:
-    return [create_english_class(**spec) for spec in specs]
+def class_record(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a raw spec (capacity defaults to 20) and return the row to store."""
+    capacity = spec.get("capacity", 20)
+    days, start, end, errors = _check(spec["level"], split_days(spec["days"]), spec["start_time"], spec["end_time"], capacity)
+    if errors: raise ValueError(errors[0])
+    return {"name": spec["name"], "level": spec["level"], "teacher": spec["teacher"], "days": days,
+            "start_time": spec["start_time"], "end_time": spec["end_time"], "capacity": capacity,
+            "start_minutes": start, "end_minutes": end}
+
+def validate_spec(spec: Dict[str, Any]) -> Tuple[Optional[List[str]], Optional[int], Optional[int], List[str]]:
+    """Collect every error in one spec; returns (days, start minutes, end minutes, errors)."""
+    keys = spec.keys()
+    if len(keys) == len(_FIELDS) and keys >= _FIELDS:
+        missing = unexpected = ()
+    else:
+        missing = [f"Missing field: {k}" for k in sorted(_FIELDS - keys)]
+        unexpected = [f"Unexpected field: {k}" for k in sorted(keys - _ALLOWED_FIELDS)]
+        if missing: return None, None, None, missing + unexpected
+    days = spec["days"]
+    if isinstance(days, str): days = list(_split_day_string(days))
+    elif not isinstance(days, (list, tuple)): return None, None, None, [f"Invalid days: {days}", *unexpected]
+    days, start, end, errors = _check(spec["level"], days, spec["start_time"], spec["end_time"], spec["capacity"])
+    if unexpected: errors.extend(unexpected)
+    return days, start, end, errors
+
+def create_multiple_classes(specs: Iterable[Dict[str, Any]]) -> Tuple[List[Optional[EnglishClass]], List[List[str]]]:
+    """Validate many specs without stopping at the first bad one.
+
+    Returns two aligned lists: the created class (None if invalid) and that spec's error list.
+    """
+    classes, errors = [], []
+    for spec in specs:
+        days, start, end, spec_errors = validate_spec(spec)
+        classes.append(None if spec_errors else EnglishClass._from_checked(spec, days, start, end))
+        errors.append(spec_errors)
+    return classes, errors
@@ -0,0 +1,22 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "api"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute the analytics tables from classes, enrollments, quizzes and attempts")
+    parser.add_argument("--db", help="database file (defaults to database.DB_PATH)")
+    args = parser.parse_args(argv)
+
+    import database
+    if args.db: database.DB_PATH = args.db
+    database.init_db()
+
+    started = time.perf_counter()
+    database.rebuild_stats()
+    print(f"Rebuilt analytics tables in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "api"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Take an online snapshot of a live database, or export its tables as NDJSON")
+    parser.add_argument("--db", help="database file (defaults to database.DB_PATH)")
+    parser.add_argument("--tenant", help="use this tenant's shard in --dir instead")
+    parser.add_argument("--dir", default=os.environ.get("LEARNWA_TENANTS_DIR"),
+                        help="shard directory (defaults to $LEARNWA_TENANTS_DIR)")
+    parser.add_argument("--pause", type=float, help="seconds to sleep between steps (backup) or every 1,000 rows (export)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    snap = commands.add_parser("snapshot", help="consistent copy via the online backup API")
+    snap.add_argument("dest", help="file to write (its archive, if any, is copied next to it)")
+    snap.add_argument("--pages", type=int, help="pages copied per step")
+    export = commands.add_parser("export", help="every table as gzipped NDJSON from one snapshot")
+    export.add_argument("dest", help="file to write (.ndjson.gz), or - for uncompressed stdout")
+    export.add_argument("--tables", help="comma-separated tables (default all)")
+    args = parser.parse_args(argv)
+
+    import backup
+    import database
+    if args.db: database.DB_PATH = args.db
+    if args.dir: database.TENANTS_DIR = args.dir
+    try:
+        path = database.database_path(args.tenant)
+        if args.command == "snapshot":
+            options = {key: value for key, value in (("pages", args.pages), ("pause", args.pause)) if value is not None}
+            for copy in backup.snapshot_with_archive(path, args.dest, **options):
+                print(f"{copy['source']} -> {copy['path']}: {copy['pages']} pages in {copy['steps']} steps, "
+                      f"{copy['size_bytes'] / 1e6:.1f} MB in {copy['seconds']:.2f}s")
+            return 0
+        tables = args.tables.split(",") if args.tables else None
+        started, rows = time.perf_counter(), 0
+        out = sys.stdout if args.dest == "-" else gzip.open(args.dest, "wt", encoding="utf-8", compresslevel=5)
+        try:
+            for record in backup.iter_export(path, tables, pause=args.pause or 0.0):
+                out.write(json.dumps(record, default=str) + "\n")
+                rows += 1
+        finally:
+            if out is not sys.stdout: out.close()
+    except (ValueError, LookupError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Exported {rows} rows from {path} in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
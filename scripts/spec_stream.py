@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Stream class specs from JSON-array or NDJSON files without loading them whole."""
+import json
+import re
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple, Union
+
+READ_SIZE = 1 << 16
+DEFAULT_CHUNK_SIZE = 1000
+NDJSON_SUFFIXES = {".ndjson", ".jsonl"}
+
+_decode = json.JSONDecoder().raw_decode
+_WHITESPACE = " \t\r\n"
+# What a value cut off at the end of the buffer can still end with: more data may complete it
+_NUMBER_TAIL = re.compile(r"[0-9+\-.eE]*\Z")
+_ESCAPE_TAIL = re.compile(r"u[0-9a-fA-F]{0,4}\Z")  # {4}: a high surrogate waiting for its pair
+_LITERALS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")
+_OPEN, _FIRST, _ITEM, _AFTER_ITEM = range(4)
+
+def _truncated(buf: str, err: json.JSONDecodeError) -> bool:
+    """Whether ``err`` only means the value runs past the end of ``buf``."""
+    if err.pos >= len(buf) or err.msg.startswith("Unterminated string"): return True
+    if err.msg.startswith("Invalid \\uXXXX"): return bool(_ESCAPE_TAIL.match(buf, err.pos))
+    if _NUMBER_TAIL.match(buf, err.pos): return True
+    tail = buf[err.pos:]
+    return len(tail) < 9 and any(literal.startswith(tail) for literal in _LITERALS)
+
+def iter_json_array(stream: TextIO, read_size: int = READ_SIZE) -> Iterator[Any]:
+    """Yield the items of a top-level JSON array one at a time.
+
+    Items must be separated by exactly one comma. Malformed input raises as
+    soon as it is buffered, not once the whole file has been read.
+    """
+    buf, pos, eof, state = "", 0, False, _OPEN
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE: pos += 1
+        if pos < len(buf):
+            ch = buf[pos]
+            if state == _OPEN:
+                if ch != "[": raise ValueError("Expected a JSON array")
+                pos, state = pos + 1, _FIRST
+                continue
+            if state == _AFTER_ITEM:
+                if ch == "]": return
+                if ch != ",": raise ValueError(f"Expected ',' or ']' after array item, found {ch!r}")
+                pos, state = pos + 1, _ITEM
+                continue
+            if ch == "]" and state == _FIRST: return
+            if ch in ",]": raise ValueError(f"Expected an array item, found {ch!r}")
+            try:
+                item, end = _decode(buf, pos)
+            except json.JSONDecodeError as err:
+                if eof or not _truncated(buf, err): raise
+            else:
+                # Only trust an item once something past it is buffered ("12" may be "123")
+                if eof or not _NUMBER_TAIL.match(buf, end):
+                    yield item
+                    pos, state = end, _AFTER_ITEM
+                    continue
+        if eof: raise ValueError("Unterminated JSON array")
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buf = buf[pos:] + chunk; pos = 0
+
+def iter_ndjson(stream: TextIO, skip: int = 0) -> Iterator[Any]:
+    """Yield one JSON value per non-blank line; the first ``skip`` values are not decoded."""
+    for line in stream:
+        if not line.strip(): continue
+        if skip:
+            skip -= 1
+            continue
+        yield json.loads(line)
+
+def _is_ndjson(path: Path, stream: TextIO) -> bool:
+    if path.suffix.lower() in NDJSON_SUFFIXES: return True
+    while True:
+        ch = stream.read(1)
+        if not ch or not ch.isspace(): break
+    stream.seek(0)
+    return ch == "{"
+
+def iter_specs(path: Union[str, Path], offset: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(index, spec)`` pairs from a JSON array or NDJSON file, starting at ``offset``."""
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        if _is_ndjson(path, f):
+            yield from enumerate(iter_ndjson(f, skip=offset), start=offset)
+        else:
+            yield from islice(enumerate(iter_json_array(f)), offset, None)
+
+@dataclass
+class ImportProgress:
+    next_offset: int
+    processed: int = 0
+    created: int = 0
+    rejected: int = 0
+    chunk_errors: List[Dict[str, Any]] = field(default_factory=list)  # last chunk only, keeps memory flat
+
+WriteChunk = Callable[[List[Dict[str, Any]]], Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]
+
+def import_class_specs(path: Union[str, Path], write: WriteChunk, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       offset: int = 0, progress: Optional[Callable[[ImportProgress], None]] = None) -> ImportProgress:
+    """Stream specs from ``path`` into ``write`` in chunks of at most ``chunk_size``.
+
+    ``write`` validates and stores one chunk, returning ``(created, rejected)`` like
+    ``database.create_classes``; rejected indexes are rewritten to file positions.
+    After each chunk ``progress`` is called; its ``next_offset`` resumes the import.
+    """
+    state = ImportProgress(next_offset=offset)
+    specs = iter_specs(path, offset)
+    while True:
+        chunk = list(islice(specs, chunk_size))
+        if not chunk: break
+        created, rejected = write([spec for _, spec in chunk])
+        state.processed += len(chunk)
+        state.created += len(created)
+        state.rejected += len(rejected)
+        state.chunk_errors = [{**item, "index": chunk[item["index"]][0]} for item in rejected]
+        state.next_offset = chunk[-1][0] + 1
+        if progress: progress(state)
+    return state
@@ -0,0 +1,42 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "api"))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create, list and migrate per-tenant database shards")
+    parser.add_argument("--dir", default=os.environ.get("LEARNWA_TENANTS_DIR"),
+                        help="shard directory (defaults to $LEARNWA_TENANTS_DIR)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="create and migrate new tenant shards")
+    create.add_argument("tenants", nargs="+")
+    commands.add_parser("list", help="list tenant shards")
+    commands.add_parser("migrate", help="bring every shard up to the current schema version")
+    args = parser.parse_args(argv)
+
+    if not args.dir:
+        print("Error: no shard directory (use --dir or set LEARNWA_TENANTS_DIR)", file=sys.stderr)
+        return 1
+    import database
+    database.TENANTS_DIR = args.dir
+
+    if args.command == "create":
+        failed = 0
+        for tenant in args.tenants:
+            try: print(f"Created {database.create_tenant(tenant)['path']}")
+            except ValueError as e: failed += 1; print(f"Error: {e}", file=sys.stderr)
+        return 1 if failed else 0
+
+    tenants = database.list_tenants()
+    for info in tenants:
+        if args.command == "migrate":
+            with database.use_database(info["path"]):
+                database.init_db()
+        print(f"{info['tenant']:<32} {info['size_bytes'] / 1e6:>10.1f} MB  {info['path']}")
+    print(f"{len(tenants)} tenants{' migrated to schema version ' + str(database.SCHEMA_VERSION) if args.command == 'migrate' else ''}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
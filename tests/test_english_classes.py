@@ -0,0 +1,34 @@
+"""Malformed JSON specs must be reported in their error list, not raise"""
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+from english_classes import create_multiple_classes
+
+
+def spec(**overrides):
+    base = {"name": "Morning", "level": "Beginner", "teacher": "Ann", "days": ["Monday"],
+            "start_time": "09:00", "end_time": "10:00", "capacity": 5}
+    return {**base, **overrides}
+
+
+class UnhashableFieldsTest(unittest.TestCase):
+    def test_unhashable_level_and_days_are_errors(self):
+        classes, errors = create_multiple_classes([
+            spec(level=["Beginner"]),
+            spec(level={"name": "Beginner"}),
+            spec(days=[["Monday"], {"day": "Friday"}]),
+            spec(),
+        ])
+        self.assertEqual(classes[:3], [None, None, None])
+        self.assertIn("Invalid level: ['Beginner']", errors[0])
+        self.assertIn("Invalid level: {'name': 'Beginner'}", errors[1])
+        self.assertTrue(any(e.startswith("Invalid days:") for e in errors[2]))
+        self.assertIsNotNone(classes[3])
+        self.assertEqual(errors[3], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
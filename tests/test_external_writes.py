@@ -0,0 +1,72 @@
+"""Writes made by another process invalidate cached reads, ETags and the schedule index"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT / "api"))
+
+import database
+import schedule
+from english_classes import class_record
+
+
+def spec(name, start="09:00", end="10:00"):
+    return {"name": name, "level": "Beginner", "teacher": "Teacher", "days": ["Monday"],
+            "start_time": start, "end_time": end, "capacity": 5}
+
+
+class ExternalWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = database.DB_PATH
+        database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="learnwa-test-"), "learn_wa.db")
+        database.init_db()
+        import server
+        self.client = server.app.test_client()
+
+    def tearDown(self):
+        database.close_pools()
+        database.DB_PATH = self.previous
+
+    def external(self, sql, parameters=()):
+        conn = sqlite3.connect(database.DB_PATH)
+        with conn:
+            conn.execute(sql, parameters)
+        conn.close()
+        time.sleep(database.CHANGE_POLL_SECONDS * 2)
+
+    def test_cached_class_and_etag(self):
+        class_id = self.client.post("/api/classes", json=spec("Class")).json["id"]
+        first = self.client.get(f"/api/classes/{class_id}")
+        etag = first.headers["ETag"]
+        self.assertEqual(self.client.get(f"/api/classes/{class_id}", headers={"If-None-Match": etag}).status_code, 304)
+
+        self.external("UPDATE classes SET capacity = 50 WHERE id = ?", (class_id,))
+        response = self.client.get(f"/api/classes/{class_id}", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["capacity"], 50)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_schedule_index_sees_external_classes(self):
+        schedule.create_class(class_record(spec("Own")))
+        row = class_record(spec("External", "11:00", "12:00"))
+        self.external("""
+            INSERT INTO classes (name, level, teacher, days, start_time, end_time, capacity,
+                                 day_mask, start_minute, end_minute)
+            VALUES (?, ?, ?, '["Monday"]', ?, ?, ?, 1, 660, 720)
+        """, (row["name"], row["level"], row["teacher"], row["start_time"], row["end_time"], row["capacity"]))
+        with self.assertRaises(schedule.ScheduleConflict):
+            schedule.create_class(class_record(spec("Clash", "11:30", "12:30")))
+        # Own writes keep the index current without reloading it
+        version = schedule.get_schedule_index().version
+        schedule.create_class(class_record(spec("Later", "13:00", "14:00")))
+        self.assertEqual(schedule.get_schedule_index().version, version + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
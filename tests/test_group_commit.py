@@ -0,0 +1,87 @@
+"""Group commit: bounded batching delay, and no over-enrollment under concurrency"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / "api"))
+
+import database
+from enrollment import GroupCommitEnroller
+from group_commit import GroupCommitQueue
+
+
+class RecordingQueue(GroupCommitQueue):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = []
+
+    def _commit_batch(self, batch):
+        now = time.monotonic()
+        self.waits.append(now - batch[0][0])
+        for _, future in batch:
+            future.set_result(now)
+
+
+class GroupCommitTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = database.DB_PATH
+        database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="learnwa-test-"), "learn_wa.db")
+        database.init_db()
+
+    def tearDown(self):
+        database.close_pools()
+        database.DB_PATH = self.previous
+
+    def test_trickle_does_not_hold_batch_open(self):
+        writer = RecordingQueue(max_wait=0.01)
+        futures = []
+        for _ in range(100):  # one request every ~2 ms, well inside max_wait of each other
+            futures.append(writer.submit(time.monotonic()))
+            time.sleep(0.002)
+        for future in futures:
+            future.result(5)
+        writer.close()
+        self.assertGreater(len(writer.waits), 5)
+        self.assertLess(max(writer.waits), 0.01 + 0.05)
+
+    def test_concurrent_enrollments_respect_capacity(self):
+        capacity, students = 7, 40
+        class_id = database.create_class({
+            "name": "Small", "level": "Beginner", "teacher": "Teacher", "days": ["Monday"],
+            "start_time": "09:00", "end_time": "10:00", "capacity": capacity})
+        enroller = GroupCommitEnroller()
+        barrier = threading.Barrier(students)
+        outcomes = []
+
+        def enroll(n):
+            barrier.wait()
+            # Every student tries twice: duplicates must be rejected too
+            for _ in range(2):
+                try:
+                    enroller.enroll(class_id, f"Student {n}", timeout=10)
+                    outcomes.append(n)
+                except ValueError:
+                    pass
+
+        threads = [threading.Thread(target=enroll, args=(n,)) for n in range(students)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        enroller.close()
+
+        self.assertEqual(len(outcomes), capacity)
+        self.assertEqual(len(set(outcomes)), capacity)
+        with database.get_db() as conn:
+            enrolled = conn.execute("SELECT enrolled_count FROM classes WHERE id = ?", (class_id,)).fetchone()[0]
+            rows = conn.execute("SELECT COUNT(*) FROM enrollments WHERE class_id = ?", (class_id,)).fetchone()[0]
+        self.assertEqual((enrolled, rows), (capacity, capacity))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+"""An evicted shard pool must not keep connections opened through it afterwards"""
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / "api"))
+
+import database
+
+
+class PoolEvictionTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = database.MAX_OPEN_SHARDS
+        self.dir = tempfile.mkdtemp(prefix="learnwa-test-")
+        database.MAX_OPEN_SHARDS = 1
+
+    def tearDown(self):
+        database.MAX_OPEN_SHARDS = self.previous
+        database.close_pools()
+
+    def test_pool_evicted_between_get_and_acquire(self):
+        first = database.get_pool(os.path.join(self.dir, "a.db"))
+        # Another thread opens a second shard before this one acquires
+        database.get_pool(os.path.join(self.dir, "b.db"))
+        self.assertNotIn(first.path, database._pools)
+
+        first.release(first.acquire())
+        stats = first.stats()
+        self.assertEqual((stats["idle"], stats["in_use"]), (0, 0))
+        self.assertEqual(stats["closed"], stats["opened"])
+
+    def test_live_pool_keeps_connections(self):
+        pool = database.get_pool(os.path.join(self.dir, "a.db"))
+        pool.release(pool.acquire())
+        self.assertEqual(pool.stats()["idle"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
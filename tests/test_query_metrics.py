@@ -0,0 +1,46 @@
+"""Rows read by iterating a cursor are counted like fetched ones"""
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / "api"))
+
+import database
+import metrics
+
+
+def total_rows():
+    return sum(metrics.db_rows._values.values())
+
+
+class IteratedRowsTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = database.DB_PATH
+        database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="learnwa-test-"), "learn_wa.db")
+        database.create_classes([
+            {"name": f"Class {n}", "level": "Beginner", "teacher": f"Teacher {n}", "days": ["Monday"],
+             "start_time": "09:00", "end_time": "10:00", "capacity": 5} for n in range(80)])
+
+    def tearDown(self):
+        database.close_pools()
+        database.DB_PATH = self.previous
+
+    def test_iterated_rows_are_counted(self):
+        before = total_rows()
+        self.assertEqual(len(database.get_all_classes.uncached(limit=50)), 50)
+        self.assertEqual(total_rows() - before, 50)
+
+    def test_partial_iteration_is_counted_on_next_statement(self):
+        with database.get_db() as conn:
+            cursor = conn.execute("SELECT id FROM classes")
+            next(cursor), next(cursor)
+            before = total_rows()
+            cursor.execute("SELECT 1")
+            self.assertEqual(total_rows() - before, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
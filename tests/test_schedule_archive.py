@@ -0,0 +1,79 @@
+"""Concurrent class imports and term archival must not deadlock on the schedule index"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT / "api"))
+
+import database
+import schedule
+from english_classes import class_record
+
+
+def spec(n, teacher="Teacher"):
+    start = 7 * 60 + (n % 48) * 15
+    return {"name": f"Class {n}", "level": "Beginner", "teacher": f"{teacher} {n // 48}",
+            "days": ["Monday"], "start_time": f"{start // 60:02d}:{start % 60:02d}",
+            "end_time": f"{(start + 15) // 60:02d}:{(start + 15) % 60:02d}", "capacity": 5}
+
+
+class ArchiveWhileImportingTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = database.DB_PATH
+        database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="learnwa-test-"), "learn_wa.db")
+        old, _ = database.create_classes([spec(n, "Old") for n in range(300)])
+        with database.transaction() as conn:
+            conn.execute("UPDATE classes SET created_at = '2000-01-01'")
+        self.old_ids = [row["id"] for row in old]
+        schedule.get_schedule_index()  # built, so the archive's write listener has an index to update
+
+    def tearDown(self):
+        database.close_pools()
+        database.DB_PATH = self.previous
+
+    def test_streamed_import_alongside_archival(self):
+        errors, results = [], {}
+
+        def specs():
+            for n in range(300):
+                time.sleep(0.001)  # an upstream file read between specs
+                yield spec(n, "New")
+
+        def run(name, func):
+            try:
+                results[name] = func()
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(exc)
+
+        threads = [
+            threading.Thread(target=run, args=("import", lambda: schedule.create_classes(
+                specs(), validate=class_record, chunk_size=1))),
+            threading.Thread(target=run, args=("archive", lambda: database.archive_classes(
+                "2001-01-01", batch_size=1))),
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        self.assertFalse(any(thread.is_alive() for thread in threads), "import or archival hung")
+        self.assertEqual(errors, [])
+        self.assertLess(time.perf_counter() - started, 20)
+
+        created, rejected = results["import"]
+        self.assertEqual((len(created), rejected), (300, []))
+        self.assertEqual(results["archive"]["archived"], 300)
+        # The archived slots were released once their moves committed
+        index = schedule.get_schedule_index()
+        self.assertEqual(len(index), 300)
+        self.assertEqual(index.find_conflicts("Old 0", ["Monday"], 7 * 60, 8 * 60), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Teachers are never double-booked, however class creations interleave"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT / "api"))
+
+import database
+import schedule
+from english_classes import class_record
+
+
+def spec(name, teacher="Teacher", start="09:00", end="10:00", day="Monday"):
+    return {"name": name, "level": "Beginner", "teacher": teacher, "days": [day],
+            "start_time": start, "end_time": end, "capacity": 5}
+
+
+class ScheduleConflictTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = database.DB_PATH
+        database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="learnwa-test-"), "learn_wa.db")
+        database.init_db()
+        import server
+        self.app = server.app
+
+    def tearDown(self):
+        database.close_pools()
+        database.DB_PATH = self.previous
+
+    def test_concurrent_posts_for_one_slot(self):
+        threads_per_round, rounds = 8, 5
+        for n in range(rounds):
+            barrier = threading.Barrier(threads_per_round)
+            statuses = []
+
+            def post(i):
+                client = self.app.test_client()
+                barrier.wait()
+                statuses.append(client.post("/api/classes", json=spec(f"Class {n}.{i}", f"Teacher {n}")).status_code)
+
+            threads = [threading.Thread(target=post, args=(i,)) for i in range(threads_per_round)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(30)
+            self.assertEqual(sorted(statuses), [201] + [409] * (threads_per_round - 1))
+        response = self.app.test_client().get("/api/schedule/conflicts")
+        self.assertEqual(response.json["conflicts"], [])
+
+    def test_rejected_row_does_not_block_later_rows(self):
+        schedule.create_class(class_record(spec("Existing", start="09:00", end="10:00")))
+        created, rejected = schedule.create_classes([
+            spec("Early", start="07:00", end="08:00"),
+            spec("Clashes with existing", start="09:30", end="10:30"),
+            spec("Overlaps only the rejected row", start="10:00", end="11:00"),
+            spec("Clashes within the batch", start="10:30", end="11:30"),
+        ], validate=class_record)
+        self.assertEqual([row["name"] for row in created], ["Early", "Overlaps only the rejected row"])
+        self.assertEqual([item["index"] for item in rejected], [1, 3])
+        self.assertIn("(class 1)", rejected[0]["error"])
+        self.assertIn("earlier in this batch", rejected[1]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+"""Waitlist promotion on drops and long-polled status changes"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT / "api"))
+
+import database
+from english_classes import class_record
+from waitlist import watcher
+
+
+def new_class(capacity):
+    return database.create_class(class_record({
+        "name": "Class", "level": "Beginner", "teacher": "Teacher", "days": ["Monday"],
+        "start_time": "09:00", "end_time": "10:00", "capacity": capacity}))
+
+
+def waitlisted(class_id):
+    return [row["name"] for row in database.get_waitlist(class_id)]
+
+
+class WaitlistTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = database.DB_PATH
+        database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="learnwa-test-"), "learn_wa.db")
+        database.init_db()
+
+    def tearDown(self):
+        database.close_pools()
+        database.DB_PATH = self.previous
+
+    def assertSeatsConsistent(self, class_id):
+        with database.get_db() as conn:
+            enrolled = conn.execute("SELECT COUNT(*) FROM enrollments WHERE class_id = ?", (class_id,)).fetchone()[0]
+            both = conn.execute("""
+                SELECT COUNT(*) FROM waitlist w
+                JOIN enrollments e ON e.class_id = w.class_id AND e.student_id = w.student_id
+            """).fetchone()[0]
+        seats = database.get_class_by_id(class_id)
+        self.assertEqual(seats["enrolled_count"], enrolled)
+        self.assertLessEqual(enrolled, seats["capacity"])
+        self.assertEqual(both, 0)
+        return enrolled
+
+    def test_drops_promote_in_queue_order(self):
+        class_id = new_class(2)
+        for name in ("A", "B", "C", "D", "E"):
+            database.join_waitlist(class_id, name)
+        self.assertEqual(waitlisted(class_id), ["C", "D", "E"])
+
+        self.assertEqual(database.unenroll_student(class_id, "B")["promoted"], ["C"])
+        self.assertEqual(waitlisted(class_id), ["D", "E"])
+        # Leaving the queue moves the others up; a later drop takes the new head
+        self.assertTrue(database.leave_waitlist(class_id, "D"))
+        self.assertEqual(database.unenroll_student(class_id, "A")["promoted"], ["E"])
+        self.assertEqual(waitlisted(class_id), [])
+        self.assertEqual(self.assertSeatsConsistent(class_id), 2)
+
+    def test_promotion_rechecks_capacity(self):
+        class_id = new_class(1)
+        for name in ("A", "B", "C", "D"):
+            database.join_waitlist(class_id, name)
+        # New seats fill from the head of the queue; a drop promotes only while seats are free
+        self.assertEqual(database.update_class_capacity(class_id, 3)["promoted"], ["B", "C"])
+        self.assertEqual(database.unenroll_student(class_id, "A")["promoted"], ["D"])
+        self.assertEqual(database.unenroll_student(class_id, "D")["promoted"], [])
+        self.assertEqual(self.assertSeatsConsistent(class_id), 2)
+
+    def test_concurrent_drops_and_joins(self):
+        capacity, queued, joiners = 4, 8, 6
+        class_id = new_class(capacity)
+        for n in range(capacity):
+            database.join_waitlist(class_id, f"Enrolled {n}")
+        for n in range(queued):
+            database.join_waitlist(class_id, f"Queued {n}")
+
+        barrier = threading.Barrier(capacity + joiners)
+        promoted, errors = [], []
+
+        def drop(n):
+            try:
+                barrier.wait()
+                promoted.extend(database.unenroll_student(class_id, f"Enrolled {n}")["promoted"])
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(exc)
+
+        def join(n):
+            try:
+                barrier.wait()
+                database.join_waitlist(class_id, f"Joiner {n}")
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(exc)
+
+        threads = ([threading.Thread(target=drop, args=(n,)) for n in range(capacity)]
+                   + [threading.Thread(target=join, args=(n,)) for n in range(joiners)])
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(errors, [])
+
+        # Each drop hands its seat to exactly one student from the head of the queue;
+        # joiners racing the drops line up behind everyone already waiting
+        self.assertEqual(self.assertSeatsConsistent(class_id), capacity)
+        self.assertEqual(len(promoted), capacity)
+        self.assertEqual(sorted(promoted), [f"Queued {n}" for n in range(capacity)])
+        remaining = waitlisted(class_id)
+        self.assertEqual(remaining[:queued - capacity], [f"Queued {n}" for n in range(capacity, queued)])
+        self.assertEqual(sorted(remaining[queued - capacity:]), [f"Joiner {n}" for n in range(joiners)])
+
+
+class WaitlistLongPollTest(unittest.TestCase):
+    def setUp(self):
+        self.previous = database.DB_PATH
+        database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="learnwa-test-"), "learn_wa.db")
+        database.init_db()
+        import server
+        self.app = server.app
+        self.class_id = new_class(1)
+        database.join_waitlist(self.class_id, "A")
+        database.join_waitlist(self.class_id, "B")
+
+    def tearDown(self):
+        database.close_pools()
+        database.DB_PATH = self.previous
+
+    def long_poll(self, results):
+        def poll():
+            started = time.perf_counter()
+            response = self.app.test_client().get(
+                f"/api/classes/{self.class_id}/waitlist/status",
+                query_string={"student_name": "B", "after": "waitlisted", "wait": 10})
+            results.append((response, time.perf_counter() - started))
+
+        thread = threading.Thread(target=poll)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while not watcher.waiting() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return thread
+
+    def test_drop_wakes_promoted_student(self):
+        results = []
+        thread = self.long_poll(results)
+        self.assertEqual(database.unenroll_student(self.class_id, "A")["promoted"], ["B"])
+        thread.join(15)
+        response, elapsed = results[0]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["status"], "enrolled")
+        self.assertLess(elapsed, 5)
+
+    def test_archived_class_ends_the_poll_with_404(self):
+        with database.transaction() as conn:
+            conn.execute("UPDATE classes SET created_at = '2000-01-01'")
+        results = []
+        thread = self.long_poll(results)
+        self.assertEqual(database.archive_classes("2001-01-01")["archived"], 1)
+        thread.join(15)
+        response, elapsed = results[0]
+        self.assertEqual(response.status_code, 404)
+        self.assertLess(elapsed, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()